@@ -0,0 +1,129 @@
+"""
+archive.py - Move old reservations into the archive database
+
+This module keeps the live reservations table small:
+- Moves reservations for flights before a cutoff date into flights_archive.db
+- Works in small batches, each committed as one transaction
+- Can be stopped at any time and run again to continue where it left off
+
+Usage:
+    python archive.py --before 2024-01-01
+    python archive.py --older-than-days 365 --batch-size 1000
+"""
+import argparse
+import datetime
+
+from audit import reservation_image
+from database import Database, RESERVATION_COLUMNS
+
+# Number of reservations moved per transaction
+DEFAULT_BATCH_SIZE = 500
+
+def archive_reservations(db, cutoff, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Move reservations with a flight date before the cutoff into the archive
+
+    Each batch is copied with INSERT ... SELECT and removed with DELETE in a
+    single transaction, so the write lock is only held for one batch at a
+    time. Copies use INSERT OR IGNORE, which makes a batch that was
+    interrupted half way safe to run again.
+
+    Args:
+        db: Database instance
+        cutoff (str): Flight date (YYYY-MM-DD); earlier reservations are archived
+        batch_size (int): Number of reservations moved per transaction
+        progress: Optional function called with the total moved after each batch
+
+    Returns:
+        int: Number of reservations moved, or -1 if an error occurred
+    """
+    if not db.attach_archive():
+        return -1
+
+    moved = 0
+
+    while True:
+        try:
+            # Next batch of IDs, found through the date index
+            db.cursor.execute('''
+            SELECT id FROM main.reservations
+            WHERE date < ?
+            ORDER BY id
+            LIMIT ?
+            ''', (cutoff, batch_size))
+            ids = [row[0] for row in db.cursor.fetchall()]
+
+            if not ids:
+                break
+
+            placeholders = ", ".join("?" * len(ids))
+
+            db.cursor.execute(f'''
+            INSERT OR IGNORE INTO archive.reservations ({RESERVATION_COLUMNS}, booking_ref)
+            SELECT {RESERVATION_COLUMNS}, booking_ref FROM main.reservations
+            WHERE id IN ({placeholders})
+            ''', ids)
+
+            # Record the move in the audit trail, written by the commit
+            db.cursor.execute(f'''
+            SELECT {RESERVATION_COLUMNS}, booking_ref FROM main.reservations
+            WHERE id IN ({placeholders})
+            ''', ids)
+            for row in db.cursor.fetchall():
+                db.audit.record("archive", before=reservation_image(row))
+
+            db.cursor.execute(f'''
+            DELETE FROM main.reservations
+            WHERE id IN ({placeholders})
+            ''', ids)
+
+            db.commit()
+            moved += len(ids)
+        except Exception as e:
+            db.conn.rollback()
+            db.audit.discard()
+            print(f"Error archiving reservations: {e}")
+            return -1
+
+        if progress:
+            progress(moved)
+
+    return moved
+
+def main():
+    """Run the archival job from the command line"""
+    parser = argparse.ArgumentParser(description="Archive reservations for past flights")
+    cutoff_group = parser.add_mutually_exclusive_group(required=True)
+    cutoff_group.add_argument("--before", help="Archive flights before this date (YYYY-MM-DD)")
+    cutoff_group.add_argument("--older-than-days", type=int,
+                              help="Archive flights older than this many days")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--archive", default="flights_archive.db", help="Archive database file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Reservations moved per transaction")
+    args = parser.parse_args()
+
+    if args.before:
+        cutoff = args.before
+    else:
+        cutoff_date = datetime.date.today() - datetime.timedelta(days=args.older_than_days)
+        cutoff = cutoff_date.strftime("%Y-%m-%d")
+
+    db = Database(args.db, archive_name=args.archive)
+
+    moved = archive_reservations(
+        db,
+        cutoff,
+        batch_size=args.batch_size,
+        progress=lambda total: print(f"Archived {total} reservations...")
+    )
+
+    db.close()
+
+    if moved < 0:
+        print("Archiving stopped because of an error. Run the command again to resume.")
+    else:
+        print(f"Done. {moved} reservations before {cutoff} moved to {args.archive}.")
+
+if __name__ == "__main__":
+    main()
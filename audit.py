@@ -0,0 +1,305 @@
+"""
+audit.py - Hash-chained audit trail of reservation changes
+
+This module records who changed which reservation, when, and how:
+- Every insert, update, delete and archive of a reservation is recorded
+  with the row before and after the change (JSON images)
+- Entries are buffered by AuditLog while a transaction runs and written with
+  one executemany just before it commits, in the same transaction, so a
+  change and its audit entries are stored or lost together
+- Each entry's hash covers its contents and the previous entry's hash, so
+  editing or deleting an entry breaks the chain from that point on
+- The audit_log table is indexed by reservation and by booking reference,
+  so one reservation's history is a short index range scan however long
+  the log grows
+
+Usage:
+    python audit.py history 42
+    python audit.py history K7QX2M
+    python audit.py verify
+"""
+import argparse
+import datetime
+import getpass
+import hashlib
+import json
+import os
+import time
+from collections import namedtuple
+
+from storage import RESERVATION_FIELDS
+
+# Fields of a reservation image
+IMAGE_FIELDS = RESERVATION_FIELDS + ("booking_ref",)
+
+# Hash the first entry is chained to
+GENESIS_HASH = "0" * 64
+
+# Columns of an audit entry
+AUDIT_COLUMNS = "seq, reservation_id, booking_ref, operation, actor, at, before, after, hash"
+
+# One audit_log row; before and after are dicts, or None for an insert and a
+# delete respectively
+AuditEntry = namedtuple("AuditEntry", "seq reservation_id booking_ref operation actor at before after hash")
+
+def default_actor():
+    """
+    Name recorded for changes made by this process
+
+    Returns:
+        str: FLIGHTS_AGENT if set, otherwise the operating system user
+    """
+    actor = os.environ.get("FLIGHTS_AGENT")
+    if actor:
+        return actor
+
+    try:
+        return getpass.getuser()
+    except Exception:
+        return "unknown"
+
+def now():
+    """
+    Current time as recorded in the audit trail
+
+    Returns:
+        str: UTC time in ISO 8601 with microseconds, which sorts as text
+    """
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="microseconds")
+
+def reservation_image(row):
+    """
+    Turn a reservation row into an audit image
+
+    Args:
+        row (tuple): Values of IMAGE_FIELDS
+
+    Returns:
+        dict: Field name -> value
+    """
+    return dict(zip(IMAGE_FIELDS, row))
+
+def entry_hash(previous_hash, seq, reservation_id, booking_ref, operation, actor, at, before, after):
+    """
+    Hash of one entry, chained to the previous one
+
+    Args:
+        previous_hash (str): Hash of the entry before, GENESIS_HASH for the first
+        seq (int): Position of the entry
+        reservation_id, booking_ref, operation, actor, at: Entry fields
+        before (str): JSON image before the change, or None
+        after (str): JSON image after the change, or None
+
+    Returns:
+        str: Hex SHA-256
+    """
+    payload = json.dumps([seq, reservation_id, booking_ref, operation, actor, at, before, after],
+                         separators=(",", ":"))
+
+    return hashlib.sha256((previous_hash + payload).encode("utf-8")).hexdigest()
+
+class AuditLog:
+    def __init__(self, db, actor=None):
+        """
+        Initialize the audit buffer of a database connection
+
+        Args:
+            db: Database whose changes are recorded
+            actor (str): Name recorded with every change, defaults to
+                default_actor()
+        """
+        self.db = db
+        self.actor = actor or default_actor()
+
+        # Entries of the running transaction, written by flush()
+        self.pending = []
+
+    def record(self, operation, before=None, after=None, actor=None, at=None):
+        """
+        Buffer one change
+
+        Args:
+            operation (str): "insert", "update", "delete" or "archive"
+            before (dict): Image before the change, None for an insert
+            after (dict): Image after the change, None for a delete or archive
+            actor (str): Who made the change, defaults to this log's actor
+            at (str): When the change was made, defaults to now (UTC, ISO 8601);
+                sync.py passes the time of the change at the office it came from
+        """
+        image = after or before
+
+        self.pending.append((
+            image["id"],
+            image.get("booking_ref"),
+            operation,
+            actor or self.actor,
+            at or now(),
+            json.dumps(before, separators=(",", ":")) if before else None,
+            json.dumps(after, separators=(",", ":")) if after else None,
+        ))
+
+    def flush(self):
+        """
+        Write the buffered entries in the current transaction
+
+        Called by Database just before it commits; the write lock is held,
+        so the end of the chain cannot move while the entries are written.
+
+        Returns:
+            int: Number of entries written
+        """
+        if not self.pending:
+            return 0
+
+        self.db.cursor.execute('SELECT seq, hash FROM audit_log ORDER BY seq DESC LIMIT 1')
+        last = self.db.cursor.fetchone()
+        seq, previous_hash = last if last else (0, GENESIS_HASH)
+
+        rows = []
+        for entry in self.pending:
+            seq += 1
+            previous_hash = entry_hash(previous_hash, seq, *entry)
+            rows.append((seq,) + entry + (previous_hash,))
+
+        self.db.cursor.executemany(f'''
+        INSERT INTO audit_log ({AUDIT_COLUMNS})
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+
+        self.pending = []
+        return len(rows)
+
+    def discard(self):
+        """Drop the buffered entries of a transaction that was rolled back"""
+        self.pending = []
+
+def to_entry(row):
+    """Turn an audit_log row into an AuditEntry with decoded images"""
+    seq, reservation_id, booking_ref, operation, actor, at, before, after, digest = row
+
+    return AuditEntry(seq, reservation_id, booking_ref, operation, actor, at,
+                      json.loads(before) if before else None,
+                      json.loads(after) if after else None,
+                      digest)
+
+def get_history(db, reservation_id=None, booking_ref=None):
+    """
+    Get the changes of one reservation, oldest first
+
+    Args:
+        db: Database instance
+        reservation_id (int): Reservation ID
+        booking_ref (str): Booking reference, used if no ID is given
+
+    Returns:
+        list: AuditEntry tuples
+    """
+    if reservation_id is not None:
+        db.cursor.execute(f'''
+        SELECT {AUDIT_COLUMNS} FROM audit_log WHERE reservation_id = ? ORDER BY seq
+        ''', (reservation_id,))
+    else:
+        db.cursor.execute(f'''
+        SELECT {AUDIT_COLUMNS} FROM audit_log WHERE booking_ref = ? ORDER BY seq
+        ''', (booking_ref,))
+
+    return [to_entry(row) for row in db.cursor.fetchall()]
+
+def verify_chain(db, batch_size=10000, progress=None):
+    """
+    Check every entry's hash against its contents and the previous entry
+
+    Args:
+        db: Database instance
+        batch_size (int): Entries read at a time
+        progress: Function called with the number of entries checked so far
+
+    Returns:
+        tuple: (number of entries checked, seq of the first entry that does
+            not match or None if the chain is intact)
+    """
+    cursor = db.conn.cursor()
+    cursor.execute(f'SELECT {AUDIT_COLUMNS} FROM audit_log ORDER BY seq')
+
+    previous_hash = GENESIS_HASH
+    previous_seq = 0
+    checked = 0
+
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+
+            for row in rows:
+                seq, digest = row[0], row[-1]
+                # A missing seq means an entry was deleted
+                if seq != previous_seq + 1 or entry_hash(previous_hash, *row[:-1]) != digest:
+                    return checked, seq
+                previous_hash, previous_seq = digest, seq
+                checked += 1
+
+            if progress:
+                progress(checked)
+    finally:
+        cursor.close()
+
+    return checked, None
+
+def format_entry(entry):
+    """
+    Describe one change on one line
+
+    Args:
+        entry (AuditEntry): History entry
+
+    Returns:
+        str: e.g. "2025-10-15T09:12:03 jane update seat_number: 12A -> 14C"
+    """
+    changes = ""
+    if entry.operation == "update":
+        changes = ", ".join(f"{field}: {entry.before.get(field)} -> {value}"
+                            for field, value in entry.after.items() if entry.before.get(field) != value)
+    elif entry.operation == "insert":
+        changes = f"{entry.after['name']} {entry.after['flight_number']} {entry.after['date']} " \
+                  f"seat {entry.after['seat_number']}"
+
+    return f"{entry.at[:19]} {entry.actor} {entry.operation} {changes}".rstrip()
+
+def main():
+    """Show a reservation's history or verify the audit chain from the command line"""
+    # Imported here because database.py imports this module
+    from database import Database, normalize_booking_ref
+
+    parser = argparse.ArgumentParser(description="Reservation audit trail")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    history_parser = subparsers.add_parser("history", help="Show the changes of a reservation")
+    history_parser.add_argument("reservation", help="Reservation ID or booking reference")
+    subparsers.add_parser("verify", help="Check the hash chain of the whole log")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    if args.command == "history":
+        if args.reservation.isdigit():
+            history = get_history(db, int(args.reservation))
+        else:
+            history = get_history(db, booking_ref=normalize_booking_ref(args.reservation))
+
+        for entry in history:
+            print(format_entry(entry))
+        if not history:
+            print("No recorded changes.")
+    else:
+        start = time.perf_counter()
+        checked, broken = verify_chain(db)
+        if broken is None:
+            print(f"Chain intact: {checked:,} entries checked in {time.perf_counter() - start:.1f}s")
+        else:
+            print(f"Chain broken at entry {broken} after {checked:,} valid entries")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
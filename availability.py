@@ -0,0 +1,272 @@
+"""
+availability.py - Route availability calendar for the booking page
+
+Agents pick the travel date from a month calendar whose days are shaded by
+the seats left on the chosen route:
+- Database.get_route_availability reads one month of the route_availability
+  table, which triggers on flights and flight_load keep current, so a month
+  costs one range scan of its primary key
+- AvailabilityCache keeps recently viewed months and drops them when the
+  reservation or schedule changelog moves, and the calendar loads the months
+  before and after the shown one while the agent looks at it, so flipping
+  months does not wait for the database
+- AvailabilityCalendar is a tkcalendar Calendar; tkcalendar is imported on
+  first use so the app starts without loading it
+"""
+import calendar
+import datetime
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+# Months kept by AvailabilityCache, per route
+CACHED_MONTHS = 24
+
+# Share of the sellable seats left below which a day counts as nearly full
+LOW_AVAILABILITY = 0.2
+
+# Background and text color of each availability level
+LEVEL_COLORS = {
+    "open": ("#c8e6c9", "#1b5e20"),
+    "low": ("#ffe0b2", "#e65100"),
+    "full": ("#ffcdd2", "#b71c1c"),
+}
+
+def month_range(year, month):
+    """
+    First and last date of a month
+
+    Args:
+        year (int): Year
+        month (int): Month, 1 to 12
+
+    Returns:
+        tuple: (first, last) as 'YYYY-MM-DD'
+    """
+    last_day = calendar.monthrange(year, month)[1]
+
+    return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last_day:02d}"
+
+def shift_month(year, month, months):
+    """
+    Month a number of months before or after another
+
+    Args:
+        year (int): Year
+        month (int): Month, 1 to 12
+        months (int): Months to move, negative for earlier
+
+    Returns:
+        tuple: (year, month)
+    """
+    index = year * 12 + month - 1 + months
+
+    return index // 12, index % 12 + 1
+
+def availability_level(seats, booked):
+    """
+    Classify the seats left on a day
+
+    Args:
+        seats (int): Sellable seats of the day's flights
+        booked (int): Seats booked
+
+    Returns:
+        str: "open", "low" or "full"
+    """
+    left = seats - booked
+    if left <= 0:
+        return "full"
+    if left < seats * LOW_AVAILABILITY:
+        return "low"
+
+    return "open"
+
+class AvailabilityCache:
+    def __init__(self, db, max_months=CACHED_MONTHS):
+        """
+        Initialize the cache
+
+        Args:
+            db: Reservation store with get_route_availability
+            max_months (int): Number of route months kept, least recently
+                used months are dropped first
+        """
+        self.db = db
+        self.max_months = max_months
+        self.months = OrderedDict()
+        self.cursor = None
+
+    def month(self, departure, destination, year, month):
+        """
+        Get the availability of a route for every day of a month
+
+        Args:
+            departure (str): Departure location
+            destination (str): Destination location
+            year (int): Year
+            month (int): Month, 1 to 12
+
+        Returns:
+            dict: 'YYYY-MM-DD' -> (flights, seats, booked) for the days with
+                scheduled flights
+        """
+        # A booking or a schedule change anywhere makes every month stale;
+        # checking costs two lookups of the last changelog entry
+        latest = (self.db.latest_change(), self.db.latest_flight_change())
+        if latest != self.cursor:
+            self.months.clear()
+            self.cursor = latest
+
+        key = (departure, destination, year, month)
+        days = self.months.get(key)
+
+        if days is None:
+            days = {date: (flights, seats, booked) for date, flights, seats, booked
+                    in self.db.get_route_availability(departure, destination, *month_range(year, month))}
+            self.months[key] = days
+            if len(self.months) > self.max_months:
+                self.months.popitem(last=False)
+        else:
+            self.months.move_to_end(key)
+
+        return days
+
+def load_tkcalendar():
+    """
+    Import tkcalendar on first use
+
+    Returns:
+        module: tkcalendar, or None if it is not installed
+    """
+    try:
+        import tkcalendar
+    except ImportError:
+        return None
+
+    return tkcalendar
+
+class AvailabilityCalendar:
+    def __init__(self, parent, cache, departure, destination, date=None, on_select=None):
+        """
+        Create a month calendar shaded by the seats left on a route
+
+        Args:
+            parent: Tkinter container
+            cache (AvailabilityCache): Source of the availability
+            departure (str): Departure location
+            destination (str): Destination location
+            date (str): Date shown selected (YYYY-MM-DD), defaults to today
+            on_select: Function called with the picked date (YYYY-MM-DD)
+
+        Raises:
+            ImportError: If tkcalendar is not installed
+        """
+        tkcalendar = load_tkcalendar()
+        if tkcalendar is None:
+            raise ImportError("tkcalendar is not installed")
+
+        self.cache = cache
+        self.departure = departure
+        self.destination = destination
+        self.on_select = on_select
+
+        try:
+            selected = datetime.date.fromisoformat(date)
+        except (TypeError, ValueError):
+            selected = datetime.date.today()
+
+        self.frame = tk.Frame(parent, bg="white")
+
+        self.calendar = tkcalendar.Calendar(
+            self.frame,
+            selectmode="day",
+            year=selected.year,
+            month=selected.month,
+            day=selected.day,
+            date_pattern="y-mm-dd",
+            showweeknumbers=False,
+            firstweekday="monday"
+        )
+        self.calendar.pack(fill=tk.BOTH, expand=True)
+
+        for level, (background, foreground) in LEVEL_COLORS.items():
+            self.calendar.tag_config(level, background=background, foreground=foreground)
+
+        self.calendar.bind("<<CalendarSelected>>", self.select)
+        self.calendar.bind("<<CalendarMonthChanged>>", lambda event: self.shade())
+
+        # Summary of the shown month and the legend; hovering a day shows its seats
+        self.status = tk.Label(self.frame, bg="white", anchor=tk.W, font=("Arial", 10))
+        self.status.pack(fill=tk.X, pady=(5, 0))
+
+        self.shade()
+
+    def shade(self):
+        """Color the days of the shown month and load its neighbours in the background"""
+        month, year = self.calendar.get_displayed_month()
+        days = self.cache.month(self.departure, self.destination, year, month)
+
+        self.calendar.calevent_remove("all")
+        for date, (flights, seats, booked) in days.items():
+            left = max(0, seats - booked)
+            self.calendar.calevent_create(
+                datetime.date.fromisoformat(date),
+                f"{flights} flight{'s' if flights > 1 else ''}, {left} of {seats} seats left",
+                availability_level(seats, booked)
+            )
+
+        open_days = sum(1 for _, seats, booked in days.values() if seats > booked)
+        self.status.config(text=f"{self.departure} to {self.destination}: "
+                                f"{open_days} of {len(days)} flight days with seats left. "
+                                "Green: open, orange: nearly full, red: full.")
+
+        # The months the agent is most likely to flip to next
+        self.frame.after_idle(self.prefetch, year, month)
+
+    def prefetch(self, year, month):
+        """Load the months before and after a month into the cache"""
+        if not self.frame.winfo_exists():
+            return
+
+        for months in (1, -1):
+            self.cache.month(self.departure, self.destination, *shift_month(year, month, months))
+
+    def select(self, event=None):
+        """Pass the picked date to on_select"""
+        if self.on_select:
+            self.on_select(self.calendar.selection_get().isoformat())
+
+def open_calendar_dialog(root, cache, departure, destination, date, on_select):
+    """
+    Show the availability calendar in a dialog that closes when a date is picked
+
+    Args:
+        root: Main window
+        cache (AvailabilityCache): Source of the availability
+        departure (str): Departure location
+        destination (str): Destination location
+        date (str): Date in the form, shown selected
+        on_select: Function called with the picked date (YYYY-MM-DD)
+
+    Raises:
+        ImportError: If tkcalendar is not installed
+    """
+    dialog = tk.Toplevel(root)
+    dialog.title(f"Dates - {departure} to {destination}")
+    dialog.transient(root)
+    dialog.configure(bg="white")
+
+    def select(picked):
+        on_select(picked)
+        dialog.destroy()
+
+    try:
+        picker = AvailabilityCalendar(dialog, cache, departure, destination, date, select)
+    except ImportError:
+        dialog.destroy()
+        raise
+
+    picker.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+    ttk.Button(dialog, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=10, pady=(0, 10))
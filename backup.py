@@ -0,0 +1,347 @@
+"""
+backup.py - Online backup and restore of the reservations database
+
+This module copies flights.db while the app keeps running:
+- Uses the SQLite backup API, a few pages per step, pausing between steps
+  so the Tkinter UI and other writers are never blocked for long
+- Verifies every backup with PRAGMA integrity_check and a SHA-256 checksum
+- Keeps only the newest backups (rotation)
+- Restores a backup after checking its checksum and schema version
+
+Usage:
+    python backup.py backup
+    python backup.py schedule --every 60
+    python backup.py list
+    python backup.py verify backups/flights-20250101-120000.db
+    python backup.py restore backups/flights-20250101-120000.db
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from database import SCHEMA_VERSION
+
+# Pages copied per backup step (page size is usually 4 KB)
+DEFAULT_PAGES_PER_STEP = 256
+
+# Pause between steps in seconds, lets the UI thread and writers run
+DEFAULT_STEP_PAUSE = 0.005
+
+# Number of backups kept by rotation
+DEFAULT_KEEP = 7
+
+class BackupCancelled(Exception):
+    """Raised inside the backup progress callback to stop a running backup"""
+
+class BackupManager:
+    def __init__(self, db_name='flights.db', backup_dir='backups',
+                 pages_per_step=DEFAULT_PAGES_PER_STEP, step_pause=DEFAULT_STEP_PAUSE,
+                 keep=DEFAULT_KEEP):
+        """
+        Initialize the backup manager
+
+        Args:
+            db_name (str): Database file to back up
+            backup_dir (str): Directory where backups are written
+            pages_per_step (int): Pages copied per step of the backup API
+            step_pause (float): Seconds to pause between steps
+            keep (int): Number of backups kept after rotation
+        """
+        self.db_name = db_name
+        self.backup_dir = backup_dir
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.keep = keep
+
+        # Prefix of backup file names, e.g. "flights-"
+        self.prefix = os.path.splitext(os.path.basename(db_name))[0] + "-"
+
+    def create_backup(self, progress=None, cancel_event=None):
+        """
+        Create a verified backup of the database
+
+        Opens its own connections, so it can be called from a worker thread.
+
+        Args:
+            progress: Optional function called with (copied_pages, total_pages)
+            cancel_event: Optional threading.Event that stops the backup when set
+
+        Returns:
+            str: Path of the new backup, or None if it failed or was cancelled
+        """
+        os.makedirs(self.backup_dir, exist_ok=True)
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        backup_path = os.path.join(self.backup_dir, f"{self.prefix}{timestamp}.db")
+        partial_path = backup_path + ".part"
+
+        def on_step(status, remaining, total):
+            if cancel_event is not None and cancel_event.is_set():
+                raise BackupCancelled()
+            if progress:
+                progress(total - remaining, total)
+            # Give the UI thread and other writers a turn
+            time.sleep(self.step_pause)
+
+        source = sqlite3.connect(self.db_name)
+        target = sqlite3.connect(partial_path)
+
+        try:
+            source.backup(target, pages=self.pages_per_step, progress=on_step)
+
+            # Make sure the copy is usable before it replaces anything
+            if target.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+                raise sqlite3.DatabaseError("integrity check of the copy failed")
+        except BackupCancelled:
+            print("Backup cancelled")
+            backup_path = None
+        except Exception as e:
+            print(f"Error creating backup: {e}")
+            backup_path = None
+        finally:
+            target.close()
+            source.close()
+
+        if backup_path is None:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return None
+
+        os.replace(partial_path, backup_path)
+        write_checksum(backup_path)
+
+        self.rotate()
+
+        return backup_path
+
+    def list_backups(self):
+        """
+        List existing backups, newest first
+
+        Returns:
+            list: Paths of backup files
+        """
+        if not os.path.isdir(self.backup_dir):
+            return []
+
+        backups = [
+            os.path.join(self.backup_dir, name)
+            for name in os.listdir(self.backup_dir)
+            if name.startswith(self.prefix) and name.endswith(".db")
+        ]
+
+        # Timestamps in the names sort chronologically
+        return sorted(backups, reverse=True)
+
+    def rotate(self):
+        """Delete the oldest backups so that only `keep` remain"""
+        for path in self.list_backups()[self.keep:]:
+            for file_path in (path, path + ".sha256"):
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+
+    def restore(self, backup_path):
+        """
+        Replace the database with a backup
+
+        The app must not be running. The current database is first saved next
+        to it as "<db_name>.before-restore".
+
+        Args:
+            backup_path (str): Backup file to restore
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        problem = verify_backup(backup_path)
+        if problem:
+            print(f"Cannot restore {backup_path}: {problem}")
+            return False
+
+        restore_path = self.db_name + ".restore"
+
+        try:
+            # Keep a consistent copy of the current database, WAL included
+            if os.path.exists(self.db_name):
+                current = sqlite3.connect(self.db_name)
+                previous = sqlite3.connect(self.db_name + ".before-restore")
+                current.backup(previous)
+                previous.close()
+                current.close()
+
+            # Copy next to the target and swap it in with an atomic rename
+            shutil.copyfile(backup_path, restore_path)
+            with open(restore_path, "rb") as restore_file:
+                os.fsync(restore_file.fileno())
+            os.replace(restore_path, self.db_name)
+
+            # A journal left by the old file must not be replayed into the new one
+            for suffix in ("-wal", "-shm", "-journal"):
+                if os.path.exists(self.db_name + suffix):
+                    os.remove(self.db_name + suffix)
+
+            return True
+        except Exception as e:
+            print(f"Error restoring backup: {e}")
+            if os.path.exists(restore_path):
+                os.remove(restore_path)
+            return False
+
+class BackupScheduler:
+    def __init__(self, root, manager, interval_minutes):
+        """
+        Run backups periodically in a worker thread while the app is open
+
+        Args:
+            root: The main Tkinter window
+            manager: BackupManager instance
+            interval_minutes (float): Minutes between backups
+        """
+        self.root = root
+        self.manager = manager
+        self.interval_ms = int(interval_minutes * 60 * 1000)
+        self.thread = None
+        self.cancel_event = threading.Event()
+        self.job = None
+
+    def start(self):
+        """Schedule the first backup"""
+        self.job = self.root.after(self.interval_ms, self.run)
+
+    def run(self):
+        """Start a backup unless the previous one is still running"""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(
+                target=self.manager.create_backup,
+                kwargs={"cancel_event": self.cancel_event},
+                daemon=True
+            )
+            self.thread.start()
+
+        self.job = self.root.after(self.interval_ms, self.run)
+
+    def stop(self):
+        """Cancel scheduled backups and stop a running one"""
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+        self.cancel_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+def file_checksum(path):
+    """
+    Compute the SHA-256 checksum of a file
+
+    Args:
+        path (str): File to read
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def write_checksum(path):
+    """Write the checksum of a backup to "<path>.sha256" """
+    with open(path + ".sha256", "w") as f:
+        f.write(f"{file_checksum(path)}  {os.path.basename(path)}\n")
+
+def verify_backup(path):
+    """
+    Check that a backup is intact and can be opened by this version of the app
+
+    Args:
+        path (str): Backup file to check
+
+    Returns:
+        str: Description of the problem, or None if the backup is valid
+    """
+    if not os.path.exists(path):
+        return "file not found"
+
+    checksum_path = path + ".sha256"
+    if not os.path.exists(checksum_path):
+        return "checksum file missing"
+
+    with open(checksum_path) as f:
+        expected = f.read().split()[0]
+
+    if file_checksum(path) != expected:
+        return "checksum mismatch"
+
+    # Open read-only so a damaged file is never modified
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if conn.execute("PRAGMA integrity_check").fetchone()[0] != "ok":
+            return "integrity check failed"
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            return f"schema version {version} is newer than this app ({SCHEMA_VERSION})"
+
+        has_reservations = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations'"
+        ).fetchone()
+        if not has_reservations:
+            return "reservations table missing"
+    except sqlite3.DatabaseError as e:
+        return f"not a valid database ({e})"
+    finally:
+        conn.close()
+
+    return None
+
+def main():
+    """Run backup commands from the command line"""
+    parser = argparse.ArgumentParser(description="Back up and restore the reservations database")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--dir", default="backups", help="Backup directory")
+    parser.add_argument("--pages-per-step", type=int, default=DEFAULT_PAGES_PER_STEP,
+                        help="Pages copied per backup step")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Number of backups to keep")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("backup", help="Create a backup now")
+    schedule_parser = subparsers.add_parser("schedule", help="Create backups periodically")
+    schedule_parser.add_argument("--every", type=float, default=60, help="Minutes between backups")
+    subparsers.add_parser("list", help="List backups")
+    verify_parser = subparsers.add_parser("verify", help="Verify a backup")
+    verify_parser.add_argument("path")
+    restore_parser = subparsers.add_parser("restore", help="Restore a backup (app must be closed)")
+    restore_parser.add_argument("path")
+    args = parser.parse_args()
+
+    manager = BackupManager(args.db, args.dir, pages_per_step=args.pages_per_step, keep=args.keep)
+
+    if args.command == "backup":
+        path = manager.create_backup()
+        print(f"Backup created: {path}" if path else "Backup failed")
+    elif args.command == "schedule":
+        while True:
+            path = manager.create_backup()
+            print(f"{datetime.datetime.now():%Y-%m-%d %H:%M:%S} backup: {path or 'failed'}")
+            time.sleep(args.every * 60)
+    elif args.command == "list":
+        for path in manager.list_backups():
+            print(path)
+    elif args.command == "verify":
+        problem = verify_backup(args.path)
+        print(f"Invalid backup: {problem}" if problem else "Backup is valid")
+    elif args.command == "restore":
+        if manager.restore(args.path):
+            print(f"Restored {args.path} to {args.db}")
+
+if __name__ == "__main__":
+    main()
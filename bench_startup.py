@@ -0,0 +1,179 @@
+"""
+bench_startup.py - Compare launch times of the source and packaged builds
+
+Launches the app repeatedly with --startup-probe, which makes it exit as
+soon as its window is up, and reports for each build:
+- cold: the first launch (with --drop-caches on Linux as root, after the
+  operating system's file cache was emptied, as after a reboot)
+- warm: the median of the following launches
+- app: the median time main.py itself took, so the rest is the Python
+  interpreter start and, for packaged builds, the bootloader (a one-file
+  build unpacks the whole bundle to a temporary directory on every launch)
+
+Every build runs in a temporary directory on a copy of the app's flights.db
+(or an empty database with --fresh-db), so the launches never touch the real
+file.
+
+Builds that are not present are skipped. Create the packaged builds with
+create_linux_executable.sh (--onedir and --onefile) or create_windows_exe.bat.
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 10 --drop-caches
+    python bench_startup.py --fresh-db
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Directory of the app, holding the flights.db that launches get a copy of
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EXE = ".exe" if sys.platform == "win32" else ""
+
+# Name and command of every build
+BUILDS = (
+    ("source", [sys.executable, os.path.join(APP_DIR, "main.py")]),
+    ("onedir", [os.path.join(APP_DIR, "dist", "main", "main" + EXE)]),
+    ("onefile", [os.path.join(APP_DIR, "dist", "main" + EXE)]),
+)
+
+def drop_caches():
+    """
+    Empty the Linux file cache so the next launch reads everything from disk
+
+    Returns:
+        bool: True if the cache was dropped (requires root)
+    """
+    try:
+        subprocess.run(["sync"], check=True)
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except OSError:
+        return False
+
+def copy_database(directory):
+    """
+    Copy the app's flights.db into a directory
+
+    Uses SQLite's backup API, so a database in WAL mode is copied with the
+    commits still in its -wal file.
+
+    Args:
+        directory (str): Directory the launches run in
+
+    Returns:
+        bool: True if there was a database to copy
+    """
+    source_name = os.path.join(APP_DIR, "flights.db")
+    if not os.path.exists(source_name):
+        return False
+
+    source = sqlite3.connect(f"file:{source_name}?mode=ro", uri=True)
+    copy = sqlite3.connect(os.path.join(directory, "flights.db"))
+    try:
+        source.backup(copy)
+    finally:
+        copy.close()
+        source.close()
+
+    return True
+
+def launch(command, directory, timeout=120):
+    """
+    Launch the app once with the startup probe
+
+    Args:
+        command (list): Program and arguments of the build
+        directory (str): Working directory, where the app opens flights.db
+        timeout (float): Seconds before the launch counts as failed
+
+    Returns:
+        tuple: (wall seconds, seconds reported by the app)
+    """
+    probe_file = os.path.join(directory, "probe.txt")
+    if os.path.exists(probe_file):
+        os.remove(probe_file)
+
+    start = time.perf_counter()
+    result = subprocess.run(command + ["--startup-probe", probe_file], cwd=directory,
+                            capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - start
+
+    if result.returncode != 0 or not os.path.exists(probe_file):
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip()
+                           else f"exit code {result.returncode}")
+
+    with open(probe_file) as f:
+        return wall, float(f.read())
+
+def benchmark_build(command, runs=5, cold_cache=False, fresh_db=False):
+    """
+    Measure the cold and warm launch times of one build
+
+    Args:
+        command (list): Program and arguments of the build
+        runs (int): Launches, the first counts as cold
+        cold_cache (bool): Drop the file cache before the first launch
+        fresh_db (bool): Start from an empty database instead of a copy
+            of the app's flights.db
+
+    Returns:
+        dict: cold, warm and app times in seconds, and whether the cache
+            was actually dropped
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        # The first launch creates the tables of a fresh database, so it is
+        # made before the cache is dropped and not timed
+        if fresh_db or not copy_database(directory):
+            launch(command, directory)
+
+        dropped = drop_caches() if cold_cache else False
+
+        cold, cold_app = launch(command, directory)
+        warm = [launch(command, directory) for _ in range(max(1, runs - 1))]
+
+    return {
+        "cold": cold,
+        "warm": statistics.median(wall for wall, _ in warm),
+        "app": statistics.median([cold_app] + [app for _, app in warm]),
+        "cache_dropped": dropped,
+    }
+
+def main():
+    """Run the startup benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Compare launch times of the app builds")
+    parser.add_argument("--runs", type=int, default=5, help="Launches per build")
+    parser.add_argument("--drop-caches", action="store_true",
+                        help="Empty the Linux file cache before each cold launch (root only)")
+    parser.add_argument("--builds", nargs="+", choices=[name for name, _ in BUILDS],
+                        default=[name for name, _ in BUILDS], help="Builds to measure")
+    parser.add_argument("--fresh-db", action="store_true",
+                        help="Launch on an empty database instead of a copy of flights.db")
+    args = parser.parse_args()
+
+    print(f"{'Build':<10}{'cold':>10}{'warm':>10}{'app':>10}")
+    for name, command in BUILDS:
+        if name not in args.builds:
+            continue
+        if not os.path.exists(command[-1]):
+            print(f"{name:<10}not built")
+            continue
+
+        try:
+            result = benchmark_build(command, args.runs, args.drop_caches, args.fresh_db)
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            print(f"{name:<10}failed: {e}")
+            continue
+
+        note = "" if result["cache_dropped"] or not args.drop_caches else "  (cache not dropped, run as root)"
+        print(f"{name:<10}{result['cold']:>9.2f}s{result['warm']:>9.2f}s{result['app']:>9.2f}s{note}")
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,27 @@ booking.py - Flight booking form for the Flight Reservation App
 This module handles the flight booking functionality:
 - Provides a form to enter flight and passenger information
 - Creates reservations in the database
+- Finds direct and connecting flights between two cities (see routes.py)
+- Shows a seat map of the flight to pick a free seat (see seatmap.py)
+- Books groups on adjacent seats in one step (see group_booking.py)
+- Puts passengers on the waitlist of full flights
 """
 import tkinter as tk
 from tkinter import ttk, messagebox
 import datetime
 
+from metrics import instrumented
+
+# main.py builds this page at startup, so the modules behind its features
+# (availability, fares, group_booking, routes, seatmap, validation) are
+# imported by the methods that use them, the first time they are used
+
+# How often an open seat map picks up bookings made elsewhere
+SEAT_MAP_REFRESH_MS = 2000
+
+# Pause in typing after which the fare quote is updated
+QUOTE_DELAY_MS = 250
+
 class BookingPage:
     def __init__(self, root, db, go_back):
         """
@@ -16,7 +32,7 @@ class BookingPage:
         
         Args:
             root: The main Tkinter window
-            db: Database instance
+            db: Reservation store (see storage.py)
             go_back: Function to return to home page
         """
         self.root = root
@@ -24,6 +40,20 @@ class BookingPage:
         self.go_back = go_back
         self.frame = tk.Frame(root)
         
+        # Schedule index for the route search, built on first use
+        self.flight_graph = None
+        
+        # Seats taken on recently viewed flights, created on first use
+        self.occupancy = None
+        
+        # Seats left per day on recently viewed route months, created on first use
+        self.availability = None
+        
+        # Fare quotes of the flight in the form, created when the page is
+        # first shown (stores without fares show none)
+        self.fares = None
+        self.quote_job = None
+        
         # Create and place UI elements
         self.create_widgets()
     
@@ -34,6 +64,9 @@ class BookingPage:
         header_frame = tk.Frame(self.frame, bg="#0288d1", height=60)
         header_frame.pack(fill=tk.X)
         
+        # Kept so main.py can add the booking reference lookup
+        self.header_frame = header_frame
+        
         # Add plane icon and app name to header with a more professional look
         icon_text = "✈"  # Clean plane icon
         icon_label = tk.Label(
@@ -222,18 +255,29 @@ class BookingPage:
         )
         date_label.grid(row=0, column=0, sticky=tk.W, pady=(0, 5))
         
-        # Create a simple entry for date
+        # Date entry with a calendar of the seats left on the route
+        date_frame = tk.Frame(details_frame, bg="white")
+        date_frame.grid(row=1, column=0, sticky=tk.W, padx=(0, 10))
+        
         self.date_entry = tk.Entry(
-            details_frame,
+            date_frame,
             font=("Arial", 12),
-            width=20,
+            width=14,
             bd=1,
             relief=tk.SOLID
         )
         self.date_entry.insert(0, datetime.datetime.now().strftime("%Y-%m-%d"))
-        self.date_entry.grid(row=1, column=0, sticky=tk.W, padx=(0, 10))
+        self.date_entry.pack(side=tk.LEFT)
         self.date_entry.config(highlightthickness=1, highlightbackground="#ddd")
         
+        calendar_btn = ttk.Button(
+            date_frame,
+            text="Dates...",
+            width=7,
+            command=self.open_calendar
+        )
+        calendar_btn.pack(side=tk.LEFT, padx=(5, 0))
+        
         # Seat Number
         seat_label = tk.Label(
             details_frame,
@@ -254,6 +298,48 @@ class BookingPage:
         self.seat_entry.grid(row=1, column=1, sticky=tk.W)
         self.seat_entry.config(highlightthickness=1, highlightbackground="#ddd")
         
+        # Seat map of the entered flight
+        seat_map_btn = ttk.Button(
+            details_frame,
+            text="Choose Seat...",
+            command=self.open_seat_map
+        )
+        seat_map_btn.grid(row=1, column=2, sticky=tk.W, padx=(10, 0))
+        
+        # Passenger type and the live fare quote
+        type_label = tk.Label(
+            details_frame,
+            text="Passenger Type",
+            font=("Arial", 12),
+            bg="white",
+            anchor=tk.W
+        )
+        type_label.grid(row=2, column=0, sticky=tk.W, pady=(15, 5))
+        
+        # The passenger types come from fares.py, loaded by show()
+        self.passenger_type = tk.StringVar()
+        self.type_box = ttk.Combobox(
+            details_frame,
+            textvariable=self.passenger_type,
+            state="readonly",
+            width=12
+        )
+        self.type_box.grid(row=3, column=0, sticky=tk.W)
+        self.type_box.bind("<<ComboboxSelected>>", self.schedule_quote)
+        
+        self.quote_label = tk.Label(
+            details_frame,
+            text="",
+            font=("Arial", 12, "bold"),
+            bg="white",
+            fg="#0288d1",
+            anchor=tk.W
+        )
+        self.quote_label.grid(row=3, column=1, columnspan=2, sticky=tk.W)
+        
+        for entry in (self.flight_entry, self.date_entry):
+            entry.bind("<KeyRelease>", self.schedule_quote)
+        
         # Button row with cancel and book options
         button_frame = tk.Frame(form_inner, bg="white")
         button_frame.grid(row=6, column=0, sticky=tk.E)
@@ -284,7 +370,35 @@ class BookingPage:
             command=self.go_back
         )
         cancel_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # Route search for customers without a flight number
+        routes_btn = ttk.Button(
+            button_frame,
+            text="Find Connections...",
+            style="Cancel.TButton",
+            command=self.open_route_search
+        )
+        routes_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # Several passengers on adjacent seats
+        group_btn = ttk.Button(
+            button_frame,
+            text="Group Booking...",
+            style="Cancel.TButton",
+            command=self.open_group_booking
+        )
+        group_btn.pack(side=tk.RIGHT, padx=(0, 10))
+        
+        # Full flight: wait for a cancellation instead
+        waitlist_btn = ttk.Button(
+            button_frame,
+            text="Join Waitlist",
+            style="Cancel.TButton",
+            command=self.join_waitlist
+        )
+        waitlist_btn.pack(side=tk.RIGHT, padx=(0, 10))
     
+    @instrumented("ui", "booking.book_flight")
     def book_flight(self):
         """Process the flight booking"""
         # Get values from form
@@ -303,13 +417,32 @@ class BookingPage:
             messagebox.showerror("Error", "All fields are required")
             return
         
+        # Seats are stored as normalized by the validation rules (" 12a" -> "12A"),
+        # so compare and save the seat in that form
+        from validation import ValidationError, normalize_seat
+        try:
+            seat_number = normalize_seat(seat_number)
+        except ValidationError:
+            messagebox.showerror("Error", f"Seat {seat_number} is not a valid seat, e.g. 12A")
+            return
+        
+        # Catch clashes before they reach the passenger
+        if seat_number in self.occupied_seats(flight_number, date):
+            messagebox.showerror("Error", f"Seat {seat_number} is already taken on {flight_number}")
+            return
+        
         # Add reservation to database
         success = self.db.add_reservation(
             name, flight_number, departure, destination, date, seat_number
         )
         
         if success:
-            messagebox.showinfo("Success", "Flight booked successfully!")
+            # Tell the customer their booking reference when the store gives one
+            booking_refs = getattr(self.db, "last_booking_refs", None)
+            if booking_refs:
+                messagebox.showinfo("Success", f"Flight booked successfully!\n\nBooking reference: {booking_refs[0]}")
+            else:
+                messagebox.showinfo("Success", "Flight booked successfully!")
             
             # Clear form fields
             self.name_entry.delete(0, tk.END)
@@ -320,15 +453,351 @@ class BookingPage:
             self.date_entry.delete(0, tk.END)
             self.date_entry.insert(0, datetime.datetime.now().strftime("%Y-%m-%d"))
             self.seat_entry.delete(0, tk.END)
+            from fares import DEFAULT_PASSENGER_TYPE
+            self.passenger_type.set(DEFAULT_PASSENGER_TYPE)
+            self.update_quote()
             
             # Go back to home page
             self.go_back()
         else:
-            messagebox.showerror("Error", "Failed to book flight. Please try again.")
+            # A full flight is refused with the seat counts; offer the waitlist
+            error = getattr(self.db, "last_error", None)
+            if error and error.kind == "capacity":
+                messagebox.showerror("Flight Full", f"{error.message}.\n\nUse Join Waitlist to queue the passenger.")
+            else:
+                messagebox.showerror("Error", "Failed to book flight. Please try again.")
+    
+    @instrumented("ui", "booking.join_waitlist")
+    def join_waitlist(self):
+        """Put the passenger in the form on the waitlist of the flight"""
+        name = self.name_entry.get().strip()
+        flight_number = self.flight_entry.get().strip()
+        departure = self.departure_entry.get().strip()
+        destination = self.destination_entry.get().strip()
+        date = self.date_entry.get().strip()
+        
+        if not (name and flight_number and departure and destination and date):
+            messagebox.showerror("Error", "Name, flight, route and date are required")
+            return
+        
+        if not hasattr(self.db, "add_to_waitlist"):
+            messagebox.showerror("Error", "Waitlists are not available with this storage engine.")
+            return
+        
+        # Priority tier 0; higher tiers can be given from waitlist.py
+        if self.db.add_to_waitlist(name, flight_number, departure, destination, date):
+            position = len(self.db.get_waitlist(flight_number, date))
+            messagebox.showinfo(
+                "Waitlist",
+                f"{name} is number {position} on the waitlist of {flight_number} on {date}.\n"
+                "A seat is booked automatically when one is cancelled."
+            )
+            self.name_entry.delete(0, tk.END)
+        else:
+            messagebox.showerror("Error", "Failed to add the passenger to the waitlist")
+    
+    def open_group_booking(self):
+        """Open a dialog to book several passengers on the entered flight"""
+        flight_number = self.flight_entry.get().strip()
+        departure = self.departure_entry.get().strip()
+        destination = self.destination_entry.get().strip()
+        date = self.date_entry.get().strip()
+        
+        if not (flight_number and departure and destination and date):
+            messagebox.showerror("Error", "Enter the flight, route and date first")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Group Booking - {flight_number} {date}")
+        dialog.transient(self.root)
+        
+        tk.Label(
+            dialog,
+            text="One passenger name per line. Adjacent seats are chosen automatically.",
+            padx=10,
+            pady=5
+        ).pack(fill=tk.X)
+        
+        names_text = tk.Text(dialog, width=40, height=12, font=("Arial", 12))
+        names_text.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        # Prefill with the passenger already typed in the form
+        if self.name_entry.get().strip():
+            names_text.insert("1.0", self.name_entry.get().strip() + "\n")
+        
+        def book():
+            from group_booking import book_group, GroupBookingError
+            
+            names = names_text.get("1.0", tk.END).splitlines()
+            
+            try:
+                booked = book_group(self.db, names, flight_number, departure, destination, date)
+            except GroupBookingError as e:
+                messagebox.showerror("Error", str(e), parent=dialog)
+                return
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to book the group: {e}", parent=dialog)
+                return
+            
+            dialog.destroy()
+            messagebox.showinfo(
+                "Success",
+                f"{len(booked)} passengers booked on {flight_number}:\n\n"
+                + "\n".join(f"{seat}  {name}" for name, seat in booked)
+            )
+            self.go_back()
+        
+        button_row = tk.Frame(dialog, padx=10, pady=10)
+        button_row.pack(fill=tk.X)
+        ttk.Button(button_row, text="Book Group", command=book).pack(side=tk.RIGHT)
+        ttk.Button(button_row, text="Cancel", command=dialog.destroy).pack(side=tk.RIGHT, padx=(0, 10))
+    
+    def open_route_search(self):
+        """Open a dialog listing itineraries between the entered cities"""
+        if not hasattr(self.db, "get_schedule"):
+            messagebox.showerror("Error", "The flight schedule is not available with this storage engine.")
+            return
+        
+        from routes import FlightGraph, format_itinerary
+        
+        if self.flight_graph is None:
+            self.flight_graph = FlightGraph(self.db)
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Find Connections")
+        dialog.transient(self.root)
+        
+        query_frame = tk.Frame(dialog, padx=10, pady=10)
+        query_frame.pack(fill=tk.X)
+        
+        # Start from whatever is already typed in the booking form
+        fields = {}
+        for column, (label, initial) in enumerate((
+            ("From", self.departure_entry.get().strip()),
+            ("To", self.destination_entry.get().strip()),
+            ("Date", self.date_entry.get().strip()),
+        )):
+            tk.Label(query_frame, text=label).grid(row=0, column=column, sticky=tk.W)
+            entry = tk.Entry(query_frame, width=18)
+            entry.insert(0, initial)
+            entry.grid(row=1, column=column, padx=(0, 10))
+            fields[label] = entry
+        
+        tk.Label(query_frame, text="Max stops").grid(row=0, column=3, sticky=tk.W)
+        stops_var = tk.IntVar(value=2)
+        ttk.Spinbox(query_frame, from_=0, to=2, width=5, textvariable=stops_var, state="readonly").grid(
+            row=1, column=3, padx=(0, 10))
+        
+        columns = ("departs", "arrives", "duration", "stops", "fare", "flights")
+        results = ttk.Treeview(dialog, columns=columns, show="headings", height=10)
+        for column, width in zip(columns, (130, 130, 80, 50, 70, 260)):
+            results.heading(column, text=column.capitalize())
+            results.column(column, width=width)
+        results.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        status = tk.Label(dialog, anchor=tk.W, padx=10)
+        status.pack(fill=tk.X)
+        
+        itineraries = []
+        
+        def search():
+            results.delete(*results.get_children())
+            itineraries.clear()
+            
+            # Only flights changed since the last search are reloaded
+            self.flight_graph.refresh()
+            itineraries.extend(self.flight_graph.search(
+                fields["From"].get(), fields["To"].get(), fields["Date"].get().strip(),
+                max_stops=stops_var.get()
+            ))
+            
+            for index, itinerary in enumerate(itineraries):
+                hours, minutes = divmod(int(itinerary.duration.total_seconds()) // 60, 60)
+                results.insert("", tk.END, iid=str(index), values=(
+                    f"{itinerary.departs:%Y-%m-%d %H:%M}",
+                    f"{itinerary.arrives:%Y-%m-%d %H:%M}" if itinerary.arrives else "",
+                    f"{hours}h{minutes:02d}m",
+                    itinerary.stops,
+                    f"{itinerary.fare:.2f}",
+                    " + ".join(leg.flight_number for leg in itinerary.legs),
+                ))
+            
+            status.config(text=f"{len(itineraries)} itineraries found" if itineraries else "No itineraries found")
+        
+        def use_selected(event=None):
+            selection = results.selection()
+            if not selection:
+                return
+            
+            itinerary = itineraries[int(selection[0])]
+            first = itinerary.legs[0]
+            
+            # Fill the form with the first flight; the others are booked next
+            for entry, value in ((self.flight_entry, first.flight_number),
+                                 (self.departure_entry, first.departure),
+                                 (self.destination_entry, first.destination),
+                                 (self.date_entry, first.date)):
+                entry.delete(0, tk.END)
+                entry.insert(0, value)
+            
+            self.schedule_quote()
+            dialog.destroy()
+            
+            if len(itinerary.legs) > 1:
+                messagebox.showinfo(
+                    "Connecting Flights",
+                    "The form holds the first flight. Book the connections after it:\n\n"
+                    + format_itinerary(itinerary).replace(" | ", "\n")
+                )
+        
+        results.bind("<Double-1>", use_selected)
+        
+        button_row = tk.Frame(dialog, padx=10, pady=10)
+        button_row.pack(fill=tk.X)
+        ttk.Button(button_row, text="Use Selected", command=use_selected).pack(side=tk.RIGHT)
+        ttk.Button(button_row, text="Search", command=search).pack(side=tk.RIGHT, padx=(0, 10))
+        
+        if fields["From"].get() and fields["To"].get():
+            search()
+    
+    def schedule_quote(self, event=None):
+        """Update the fare quote once the agent pauses typing"""
+        if self.quote_job is not None:
+            self.root.after_cancel(self.quote_job)
+        self.quote_job = self.root.after(QUOTE_DELAY_MS, self.update_quote)
+    
+    @instrumented("ui", "booking.update_quote")
+    def update_quote(self):
+        """Show the fare of the flight, date and passenger type in the form"""
+        self.quote_job = None
+        flight_number = self.flight_entry.get().strip()
+        date = self.date_entry.get().strip()
+        
+        if self.fares is None or not (flight_number and date):
+            self.quote_label.config(text="")
+            return
+        
+        from fares import FareError
+        try:
+            quote = self.fares.quote(flight_number, date, self.passenger_type.get())
+        except FareError as e:
+            self.quote_label.config(text=str(e))
+            return
+        
+        if quote is None:
+            self.quote_label.config(text="No fare: flight not scheduled on this date")
+        else:
+            self.quote_label.config(text=f"Fare {quote.price:.2f} ({quote.load_factor:.0%} booked)")
+    
+    def open_calendar(self):
+        """Pick the date from a calendar shaded by the seats left on the entered route"""
+        departure = self.departure_entry.get().strip()
+        destination = self.destination_entry.get().strip()
+        
+        if not (departure and destination):
+            messagebox.showerror("Error", "Enter the departure and destination first")
+            return
+        
+        if not hasattr(self.db, "get_route_availability"):
+            messagebox.showerror("Error", "The availability calendar is not available with this storage engine.")
+            return
+        
+        def select(date):
+            self.date_entry.delete(0, tk.END)
+            self.date_entry.insert(0, date)
+            self.schedule_quote()
+        
+        from availability import AvailabilityCache, open_calendar_dialog
+        if self.availability is None:
+            self.availability = AvailabilityCache(self.db)
+        
+        try:
+            open_calendar_dialog(self.root, self.availability, departure, destination,
+                                 self.date_entry.get().strip(), select)
+        except ImportError:
+            messagebox.showerror("Error", "The calendar needs the tkcalendar package (pip install tkcalendar).")
+    
+    def open_seat_map(self):
+        """Open the seat map of the entered flight and date"""
+        flight_number = self.flight_entry.get().strip()
+        date = self.date_entry.get().strip()
+        
+        if not (flight_number and date):
+            messagebox.showerror("Error", "Enter the flight number and date first")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Seats - {flight_number} {date}")
+        dialog.transient(self.root)
+        dialog.configure(bg="white")
+        
+        legend = tk.Label(
+            dialog,
+            text="Click a free seat. Grey seats are taken.",
+            bg="white",
+            padx=10,
+            pady=5
+        )
+        legend.pack(fill=tk.X)
+        
+        def select(seat):
+            self.seat_entry.delete(0, tk.END)
+            self.seat_entry.insert(0, seat)
+        
+        from seatmap import SeatMap, flight_layout
+        seat_map = SeatMap(dialog, flight_layout(self.db, flight_number, date), on_select=select)
+        seat_map.frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        
+        # Show the seat already in the form as selected
+        current = self.seat_entry.get().strip().upper() or None
+        
+        def refresh():
+            if not dialog.winfo_exists():
+                return
+            
+            # Served from the cache until a reservation is written. A seat
+            # taken by someone else meanwhile is no longer offered.
+            occupied = self.occupied_seats(flight_number, date)
+            selected = seat_map.selected if seat_map.selected not in occupied else None
+            seat_map.update(occupied, selected)
+            dialog.after(SEAT_MAP_REFRESH_MS, refresh)
+        
+        seat_map.update(self.occupied_seats(flight_number, date), current)
+        dialog.after(SEAT_MAP_REFRESH_MS, refresh)
+        
+        ttk.Button(dialog, text="Done", command=dialog.destroy).pack(side=tk.RIGHT, padx=10, pady=(0, 10))
+    
+    def occupied_seats(self, flight_number, date):
+        """
+        Get the seats taken on a flight from the occupancy cache
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            frozenset: Seat numbers
+        """
+        if self.occupancy is None:
+            from seatmap import OccupancyCache
+            self.occupancy = OccupancyCache(self.db)
+        
+        return self.occupancy.occupied(flight_number, date)
     
     def show(self):
         """Display the booking page"""
         self.frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Fares and passenger types are loaded the first time the page is shown
+        if not self.type_box["values"]:
+            from fares import FareEngine, PASSENGER_TYPES, DEFAULT_PASSENGER_TYPE
+            self.type_box.config(values=list(PASSENGER_TYPES))
+            self.passenger_type.set(DEFAULT_PASSENGER_TYPE)
+            if hasattr(self.db, "get_fare_inputs"):
+                self.fares = FareEngine(self.db)
+        
+        # Bookings made since the page was last shown change the fare
+        self.update_quote()
     
     def hide(self):
         """Hide the booking page"""
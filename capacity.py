@@ -0,0 +1,153 @@
+"""
+capacity.py - Seat capacity, overbooking limits and counter consistency
+
+Every booking of a scheduled flight is checked against the flight's capacity
+plus its overbooking limit (see Database.check_capacity):
+- The check reads the booked count of the flight_load table, which triggers
+  on the reservations table keep up to date in the same transaction as
+  every insert, update and delete, so it never counts reservations
+- Bookings take the write lock before the check (BEGIN IMMEDIATE), so two
+  agents cannot both get the last seat
+- A refused booking changes nothing; Database.last_error has the kind
+  "capacity" and a message with the seat counts
+
+Since the counters are derived data, this module can compare them with the
+reservations table and rebuild them if they drifted, e.g. after a database
+file was edited by hand or restored from an old backup.
+
+Usage:
+    python capacity.py check
+    python capacity.py check --repair
+    python capacity.py show FL100 2025-10-15
+    python capacity.py overbook FL100 2025-10-15 5
+"""
+import argparse
+import time
+
+from database import Database
+
+def find_drift(db):
+    """
+    Compare the flight_load counters with a count of the reservations
+
+    Args:
+        db: Database instance
+
+    Returns:
+        list: (flight_number, date, counted, stored) for every flight whose
+            stored count is wrong; stored is None if the counter is missing
+    """
+    db.cursor.execute('''
+    SELECT r.flight_number, r.date, COUNT(*) AS counted, l.booked
+    FROM reservations AS r
+    LEFT JOIN flight_load AS l ON l.flight_number = r.flight_number AND l.date = r.date
+    GROUP BY r.flight_number, r.date
+    HAVING l.booked IS NULL OR l.booked != counted
+    UNION ALL
+    SELECT l.flight_number, l.date, 0, l.booked
+    FROM flight_load AS l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM reservations AS r
+        WHERE r.flight_number = l.flight_number AND r.date = l.date
+    )
+    ORDER BY 1, 2
+    ''')
+
+    return db.cursor.fetchall()
+
+def find_overbooked(db):
+    """
+    Find scheduled flights with more bookings than they allow, e.g. booked
+    before their capacity was lowered
+
+    Args:
+        db: Database instance
+
+    Returns:
+        list: (flight_number, date, capacity, overbook_limit, booked)
+    """
+    db.cursor.execute('''
+    SELECT f.flight_number, f.date, f.capacity, f.overbook_limit, l.booked
+    FROM flights AS f
+    JOIN flight_load AS l ON l.flight_number = f.flight_number AND l.date = f.date
+    WHERE l.booked > f.capacity + f.overbook_limit
+    ORDER BY f.date, f.flight_number
+    ''')
+
+    return db.cursor.fetchall()
+
+def check_counters(db, repair=False):
+    """
+    Check the capacity counters and optionally rebuild them
+
+    The check and the repair run in one transaction holding the write lock,
+    so no booking can change the counts in between.
+
+    Args:
+        db: Database instance
+        repair (bool): Rebuild the counters if any drifted
+
+    Returns:
+        list: Drifted counters found, see find_drift()
+    """
+    with db.transaction(immediate=True):
+        drift = find_drift(db)
+        if drift and repair:
+            db.rebuild_summaries(commit=False)
+
+    return drift
+
+def main():
+    """Check counters or manage overbooking limits from the command line"""
+    parser = argparse.ArgumentParser(description="Flight capacity and overbooking")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    check_parser = subparsers.add_parser("check", help="Compare the seat counters with the reservations")
+    check_parser.add_argument("--repair", action="store_true", help="Rebuild the counters if they drifted")
+
+    show_parser = subparsers.add_parser("show", help="Show the seat counts of a flight")
+    show_parser.add_argument("flight_number")
+    show_parser.add_argument("date")
+
+    overbook_parser = subparsers.add_parser("overbook", help="Set the overbooking limit of a flight")
+    overbook_parser.add_argument("flight_number")
+    overbook_parser.add_argument("date")
+    overbook_parser.add_argument("limit", type=int, help="Seats allowed beyond the capacity")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    if args.command == "check":
+        start = time.perf_counter()
+        drift = check_counters(db, args.repair)
+        for flight_number, date, counted, stored in drift:
+            print(f"{flight_number} {date}: {counted} reservations, counter says "
+                  f"{'nothing' if stored is None else stored}")
+        if drift:
+            print(f"{len(drift)} counters drifted" + (", rebuilt" if args.repair else ", run with --repair"))
+        else:
+            print(f"Counters consistent ({time.perf_counter() - start:.2f}s)")
+
+        for flight_number, date, capacity, overbook_limit, booked in find_overbooked(db):
+            print(f"{flight_number} {date} is overbooked: {booked} booked, "
+                  f"{capacity} seats + {overbook_limit} overbooking allowed")
+    elif args.command == "show":
+        availability = db.get_flight_availability(args.flight_number, args.date)
+        if availability is None:
+            print(f"{args.flight_number} on {args.date} is not scheduled")
+        else:
+            capacity, overbook_limit, booked = availability
+            print(f"{args.flight_number} on {args.date}: {booked} booked, {capacity} seats, "
+                  f"overbooking limit {overbook_limit}, "
+                  f"{max(0, capacity + overbook_limit - booked)} left to sell")
+    else:
+        if db.set_overbook_limit(args.flight_number, args.date, args.limit):
+            print(f"{args.flight_number} on {args.date} may now be overbooked by {max(0, args.limit)} seats")
+        else:
+            print(f"{args.flight_number} on {args.date} is not scheduled")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,23 @@ echo ========================================
 echo.
 echo This script will create a standalone Windows executable for the Flight Reservation App.
 echo.
+echo Usage: create_windows_exe.bat [--onedir^|--onefile]
+echo   --onedir   (default) a folder with main.exe and its libraries; starts fast
+echo   --onefile  a single main.exe; unpacks itself to a temporary folder on every launch
+echo.
+
+set MODE=%1
+if "%MODE%"=="" set MODE=--onedir
+if not "%MODE%"=="--onedir" if not "%MODE%"=="--onefile" (
+    echo Unknown mode: %MODE%
+    goto :EOF
+)
+
+REM Modules the app never imports; leaving them out makes the bundle smaller
+REM and quicker to load. pillow is pinned in requirements.txt but not used by
+REM the app. tkcalendar (availability calendar) is bundled; it formats dates
+REM with babel, whose locale data module is loaded dynamically.
+set EXCLUDES=--exclude-module PIL --exclude-module unittest --exclude-module pydoc --exclude-module doctest --exclude-module lib2to3 --exclude-module xmlrpc --hidden-import babel.numbers
 
 REM Check if Python is installed
 where python >nul 2>nul
@@ -26,12 +43,17 @@ echo.
 echo Creating executable file...
 echo.
 
-pyinstaller --onefile --windowed --clean main.py
+pyinstaller %MODE% --windowed --noconfirm --clean %EXCLUDES% main.py
 
 echo.
 if %ERRORLEVEL% EQU 0 (
     echo Success! The executable has been created in the dist folder.
-    echo You can find it at: %cd%\dist\main.exe
+    if "%MODE%"=="--onedir" (
+        echo You can find it at: %cd%\dist\main\main.exe - ship the whole dist\main folder
+    ) else (
+        echo You can find it at: %cd%\dist\main.exe
+    )
+    echo Compare launch times with: python bench_startup.py
 ) else (
     echo There was an error creating the executable.
     echo Please check the output above for more information.
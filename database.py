@@ -5,35 +5,172 @@ This module handles all database operations for the Flight Reservation System:
 - Creating and connecting to the database
 - Creating necessary tables
 - CRUD operations for flights and reservations
+Database is the SQLite implementation of storage.ReservationStore.
 """
 import sqlite3
 import os
+import secrets
+from collections import Counter, namedtuple
+from contextlib import contextmanager
 
-class Database:
-    def __init__(self, db_name='flights.db'):
+from audit import AuditLog, reservation_image, get_history
+from db_profiles import resolve_profile, apply_profile
+from metrics import ERRORS, instrumented
+from name_search import index_names, rebuild_name_index, fuzzy_search_reservations
+from storage import ReservationStore, RESERVATION_FIELDS
+
+# Version of the schema created by create_tables(), stored in PRAGMA user_version.
+# Bump it whenever a table, index or trigger is added so that existing
+# databases are upgraded the next time they are opened.
+SCHEMA_VERSION = 14
+
+# Default number of change records kept in the changelog in addition to the
+# latest record of every live reservation
+DEFAULT_CHANGELOG_RETENTION = 10000
+
+# Columns returned for a reservation by every listing method
+RESERVATION_COLUMNS = ", ".join(RESERVATION_FIELDS)
+
+# Columns returned for a scheduled flight
+FLIGHT_COLUMNS = "id, flight_number, departure, destination, date, departs_at, arrives_at, fare, capacity"
+
+# Seconds a statement waits for another connection's lock before failing
+# with "database is locked"
+DEFAULT_BUSY_TIMEOUT = 5.0
+
+# Failure of the last write method, see Database.last_error. kind is
+# "locked" (another connection held the lock past the busy timeout),
+# "capacity" (the flight is full), "constraint" or "error".
+OperationError = namedtuple("OperationError", "operation kind message")
+
+class CapacityError(Exception):
+    """Raised inside a write when a flight has no seat left; nothing was saved"""
+
+# Seats on a flight added without an explicit capacity
+DEFAULT_CAPACITY = 180
+
+# Booking references are drawn from letters and digits that cannot be
+# confused when read over the phone (no 0/O, 1/I/L). 6 characters from 31
+# symbols give about 887 million codes.
+BOOKING_REF_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+BOOKING_REF_LENGTH = 6
+
+def new_booking_ref():
+    """
+    Generate a random booking reference
+    
+    Returns:
+        str: e.g. "K7QX2M"
+    """
+    return "".join(secrets.choice(BOOKING_REF_ALPHABET) for _ in range(BOOKING_REF_LENGTH))
+
+def error_kind(error):
+    """
+    Classify a database exception
+    
+    Args:
+        error (Exception): Exception raised by sqlite3
+        
+    Returns:
+        str: "locked", "capacity", "constraint" or "error"
+    """
+    if isinstance(error, sqlite3.OperationalError) and (
+            "locked" in str(error) or "busy" in str(error)):
+        return "locked"
+    if isinstance(error, sqlite3.IntegrityError):
+        return "constraint"
+    if isinstance(error, CapacityError):
+        return "capacity"
+    return "error"
+
+def normalize_booking_ref(booking_ref):
+    """
+    Clean up a booking reference typed by an agent, e.g. " k7q-x2m" -> "K7QX2M"
+    
+    Args:
+        booking_ref (str): Raw reference
+        
+    Returns:
+        str: Normalized reference
+    """
+    return "".join(char for char in str(booking_ref).upper() if char.isalnum())
+
+class Database(ReservationStore):
+    def __init__(self, db_name='flights.db', changelog_retention=DEFAULT_CHANGELOG_RETENTION,
+                 archive_name='flights_archive.db', profile=None, busy_timeout=DEFAULT_BUSY_TIMEOUT,
+                 actor=None):
         """
         Initialize database connection
         
         Args:
             db_name (str): Name of the database file
+            changelog_retention (int): Number of change records to keep when
+                the changelog is pruned
+            archive_name (str): Name of the database file holding archived
+                reservations, attached only when archived rows are requested
+            profile (str): Performance profile from db_profiles.PROFILES,
+                defaults to FLIGHTS_DB_PROFILE or flights.ini
+            busy_timeout (float): Seconds to wait for another connection's
+                lock before giving up with "database is locked"
+            actor (str): Name recorded in the audit trail for changes made
+                through this connection, defaults to FLIGHTS_AGENT or the
+                operating system user
         """
         # Store database name
         self.db_name = db_name
+        self.changelog_retention = changelog_retention
+        self.archive_name = archive_name
+        self.archive_attached = False
+        
+        # Depth of nested transaction() blocks; commits are deferred while > 0
+        self.transaction_depth = 0
+        
+        # Waitlist entry promoted by the last delete or update, see promote_waitlist()
+        self.last_promotion = None
         
-        # Check if database exists, if not create tables
-        db_exists = os.path.exists(db_name)
+        # Booking references given by the last insert, see insert_reservations()
+        self.last_booking_refs = []
+        
+        # Why the last write method returned False, see record_error()
+        self.last_error = None
+        
+        # Audit entries of the running transaction, written when it commits
+        self.audit = AuditLog(self, actor)
         
         # Create connection to database
-        self.conn = sqlite3.connect(db_name)
+        self.busy_timeout = busy_timeout
+        self.conn = sqlite3.connect(db_name, timeout=busy_timeout)
         self.cursor = self.conn.cursor()
         
-        # Create tables if they don't exist
-        if not db_exists:
+        # Let maintenance release free pages in small steps. Only takes effect
+        # on a new database; maintenance.py can convert an existing one.
+        self.cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        
+        # Apply cache, journal and sync settings before any table is created
+        self.profile = resolve_profile(profile)
+        apply_profile(self.conn, self.profile)
+        
+        # Create or upgrade tables if the schema is older than this version
+        self.cursor.execute('PRAGMA user_version')
+        if self.cursor.fetchone()[0] < SCHEMA_VERSION:
             self.create_tables()
+            
+            # Give reservations made before booking references existed a code,
+            # one committed batch at a time
+            while self.backfill_booking_refs():
+                pass
+        
+        # Remember the data version so data_changed() can detect other writers
+        self._data_version = self.get_data_version()
+        self._total_changes = self.conn.total_changes
     
     def create_tables(self):
         """Create necessary tables in the database if they don't exist"""
         
+        # Schema version of the file before this upgrade (0 for a new file)
+        self.cursor.execute('PRAGMA user_version')
+        previous_version = self.cursor.fetchone()[0]
+        
         # Create reservations table according to requirements
         self.cursor.execute('''
         CREATE TABLE IF NOT EXISTS reservations (
@@ -47,9 +184,430 @@ class Database:
         )
         ''')
         
+        # Booking reference given to the customer. Added with ALTER TABLE so
+        # existing databases keep their rows; NULL until backfilled.
+        self.cursor.execute('PRAGMA table_info(reservations)')
+        if 'booking_ref' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute('ALTER TABLE reservations ADD COLUMN booking_ref TEXT')
+        self.cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_booking_ref
+        ON reservations (booking_ref)
+        ''')
+        
+        # Index used to find reservations to archive by flight date
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservations_date
+        ON reservations (date)
+        ''')
+        
+        # Index for per-flight lookups such as passenger manifests
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservations_flight_date
+        ON reservations (flight_number, date, seat_number)
+        ''')
+        
+        # Key/value store for bookkeeping such as the changelog horizon
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS db_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+        ''')
+        
+        # Change log of reservation writes, appended to by the triggers below.
+        # op is 'I' (insert), 'U' (update) or 'D' (delete) and version counts
+        # the writes made to one reservation.
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservation_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            reservation_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservation_changes_reservation
+        ON reservation_changes (reservation_id, version)
+        ''')
+        
+        # Triggers run for every writer, including other processes and tools
+        # that bypass this class, so the log never misses a change
+        for op, event, row in (('I', 'INSERT', 'NEW'), ('U', 'UPDATE', 'NEW'), ('D', 'DELETE', 'OLD')):
+            self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reservations_log_{event.lower()}
+            AFTER {event} ON reservations
+            BEGIN
+                INSERT INTO reservation_changes (op, reservation_id, version)
+                VALUES (
+                    '{op}',
+                    {row}.id,
+                    COALESCE((SELECT MAX(version) FROM reservation_changes
+                              WHERE reservation_id = {row}.id), 0) + 1
+                );
+            END
+            ''')
+        
+        # Summary tables for the home page dashboard, kept current by triggers
+        # so reading them costs O(groups) instead of O(reservations)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS flight_load (
+            flight_number TEXT NOT NULL,
+            date TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            booked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (flight_number, date)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_flight_load_date
+        ON flight_load (date)
+        ''')
+        
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS route_summary (
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (departure, destination)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_route_summary_bookings
+        ON route_summary (bookings)
+        ''')
+        
+        # Number of bookings made per calendar day (not per flight date)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_bookings (
+            day TEXT PRIMARY KEY,
+            bookings INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # SQL fragments adding (sign = '+') or removing (sign = '-') one
+        # reservation row from the summaries
+        def count_row(row, sign):
+            return f'''
+                INSERT INTO flight_load (flight_number, date, departure, destination, booked)
+                VALUES ({row}.flight_number, {row}.date, {row}.departure, {row}.destination, {sign}1)
+                ON CONFLICT (flight_number, date) DO UPDATE SET booked = booked {sign} 1;
+                DELETE FROM flight_load
+                WHERE flight_number = {row}.flight_number AND date = {row}.date AND booked <= 0;
+                INSERT INTO route_summary (departure, destination, bookings)
+                VALUES ({row}.departure, {row}.destination, {sign}1)
+                ON CONFLICT (departure, destination) DO UPDATE SET bookings = bookings {sign} 1;
+                DELETE FROM route_summary
+                WHERE departure = {row}.departure AND destination = {row}.destination AND bookings <= 0;
+            '''
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reservations_summary_insert
+        AFTER INSERT ON reservations
+        BEGIN
+            {count_row('NEW', '+')}
+            INSERT INTO daily_bookings (day, bookings)
+            VALUES (date('now', 'localtime'), 1)
+            ON CONFLICT (day) DO UPDATE SET bookings = bookings + 1;
+        END
+        ''')
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reservations_summary_update
+        AFTER UPDATE OF flight_number, date, departure, destination ON reservations
+        BEGIN
+            {count_row('OLD', '-')}
+            {count_row('NEW', '+')}
+        END
+        ''')
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS reservations_summary_delete
+        AFTER DELETE ON reservations
+        BEGIN
+            {count_row('OLD', '-')}
+        END
+        ''')
+        
+        # Flight schedule. departs_at and arrives_at are 'YYYY-MM-DD HH:MM' in
+        # one reference time zone so connection times can be compared;
+        # arrives_at is NULL when the arrival time is unknown.
+        self.cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS flights (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            flight_number TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            date TEXT NOT NULL,
+            departs_at TEXT NOT NULL,
+            arrives_at TEXT,
+            fare REAL NOT NULL DEFAULT 0,
+            capacity INTEGER NOT NULL DEFAULT {DEFAULT_CAPACITY},
+            overbook_limit INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (flight_number, date)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_flights_departure
+        ON flights (departure, departs_at)
+        ''')
+        
+        # Seats that may be sold beyond the capacity, see check_capacity()
+        self.cursor.execute('PRAGMA table_info(flights)')
+        if 'overbook_limit' not in [column[1] for column in self.cursor.fetchall()]:
+            self.cursor.execute('ALTER TABLE flights ADD COLUMN overbook_limit INTEGER NOT NULL DEFAULT 0')
+        
+        # Seats sold and sellable per route and day for the availability
+        # calendar (see availability.py), kept current by triggers on flights
+        # and flight_load so a month is one range scan of the primary key.
+        # seats is capacity plus overbooking limit of the scheduled flights.
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS route_availability (
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            date TEXT NOT NULL,
+            flights INTEGER NOT NULL DEFAULT 0,
+            seats INTEGER NOT NULL DEFAULT 0,
+            booked INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (departure, destination, date)
+        )
+        ''')
+        
+        # SQL fragment adding (sign = '+') or removing (sign = '-') one
+        # scheduled flight, with the seats already booked on it
+        def count_flight(row, sign):
+            return f'''
+                INSERT INTO route_availability (departure, destination, date, flights, seats, booked)
+                VALUES (
+                    {row}.departure, {row}.destination, {row}.date, {sign}1,
+                    {sign}({row}.capacity + {row}.overbook_limit),
+                    {sign}COALESCE((SELECT booked FROM flight_load
+                                    WHERE flight_number = {row}.flight_number AND date = {row}.date), 0)
+                )
+                ON CONFLICT (departure, destination, date) DO UPDATE SET
+                    flights = flights + excluded.flights,
+                    seats = seats + excluded.seats,
+                    booked = booked + excluded.booked;
+                DELETE FROM route_availability
+                WHERE departure = {row}.departure AND destination = {row}.destination
+                  AND date = {row}.date AND flights <= 0;
+            '''
+        
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS flights_availability_insert
+        AFTER INSERT ON flights
+        BEGIN
+            {count_flight('NEW', '+')}
+        END
+        ''')
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS flights_availability_update
+        AFTER UPDATE OF flight_number, departure, destination, date, capacity, overbook_limit ON flights
+        BEGIN
+            {count_flight('OLD', '-')}
+            {count_flight('NEW', '+')}
+        END
+        ''')
+        self.cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS flights_availability_delete
+        AFTER DELETE ON flights
+        BEGIN
+            {count_flight('OLD', '-')}
+        END
+        ''')
+        
+        # Bookings move the booked count of the route of the scheduled flight
+        # (reservations of unscheduled flights match no route and are ignored)
+        def count_load(row, delta):
+            return f'''
+                UPDATE route_availability SET booked = booked + ({delta})
+                WHERE date = {row}.date AND (departure, destination) = (
+                    SELECT departure, destination FROM flights
+                    WHERE flight_number = {row}.flight_number AND date = {row}.date
+                );
+            '''
+        
+        for event, delta, row in (('INSERT', 'NEW.booked', 'NEW'),
+                                  ('UPDATE OF booked', 'NEW.booked - OLD.booked', 'NEW'),
+                                  ('DELETE', '-OLD.booked', 'OLD')):
+            self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS flight_load_availability_{event.split()[0].lower()}
+            AFTER {event} ON flight_load
+            BEGIN
+                {count_load(row, delta)}
+            END
+            ''')
+        
+        # Change log of the schedule so routes.FlightGraph can update its
+        # in-memory index instead of reloading every flight
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS flight_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            flight_id INTEGER NOT NULL
+        )
+        ''')
+        for op, event, row in (('I', 'INSERT', 'NEW'), ('U', 'UPDATE', 'NEW'), ('D', 'DELETE', 'OLD')):
+            self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS flights_log_{event.lower()}
+            AFTER {event} ON flights
+            BEGIN
+                INSERT INTO flight_changes (op, flight_id) VALUES ('{op}', {row}.id);
+            END
+            ''')
+        
+        # Passengers waiting for a seat on a flight. The queue of a flight is
+        # ordered by priority tier (higher first), then by arrival (id);
+        # the index makes finding its head a single seek.
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS waitlist (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            flight_number TEXT NOT NULL,
+            departure TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            date TEXT NOT NULL,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'waiting',
+            reservation_id INTEGER,
+            added_at TEXT NOT NULL DEFAULT (datetime('now')),
+            promoted_at TEXT
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_waitlist_queue
+        ON waitlist (flight_number, date, status, priority DESC, id)
+        ''')
+        
+        # Typo-tolerant name search (see name_search.py): every distinct
+        # passenger name once, linked to its words, and every distinct word
+        # once with its phonetic code and trigrams
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservations_name
+        ON reservations (name)
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS name_index (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS name_word (
+            word TEXT NOT NULL,
+            name_id INTEGER NOT NULL,
+            PRIMARY KEY (word, name_id)
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS word_phonetic (
+            word TEXT PRIMARY KEY,
+            code TEXT NOT NULL
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_word_phonetic_code
+        ON word_phonetic (code)
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS word_trigram (
+            gram TEXT NOT NULL,
+            word TEXT NOT NULL,
+            PRIMARY KEY (gram, word)
+        )
+        ''')
+        
+        # Names are added by the write methods, which compute the codes in
+        # Python. A name is dropped once its last reservation is gone; its
+        # name_word rows no longer join and are cleared by a rebuild.
+        for event, columns in (('DELETE', ''), ('UPDATE', ' OF name')):
+            self.cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reservations_names_{event.lower()}
+            AFTER {event}{columns} ON reservations
+            BEGIN
+                DELETE FROM name_index
+                WHERE name = OLD.name
+                  AND NOT EXISTS (SELECT 1 FROM reservations WHERE name = OLD.name);
+            END
+            ''')
+        
+        # Audit trail of reservation changes, appended by audit.AuditLog.
+        # seq is assigned by the log so it can be covered by the hash chain.
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_log (
+            seq INTEGER PRIMARY KEY,
+            reservation_id INTEGER NOT NULL,
+            booking_ref TEXT,
+            operation TEXT NOT NULL,
+            actor TEXT NOT NULL,
+            at TEXT NOT NULL,
+            before TEXT,
+            after TEXT,
+            hash TEXT NOT NULL
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_audit_reservation
+        ON audit_log (reservation_id, seq)
+        ''')
+        self.cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_audit_booking_ref
+        ON audit_log (booking_ref, seq)
+        ''')
+        
+        # Sync position with every other office, see sync.py: the last local
+        # audit entry exported to the office and its last entry applied here
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            site_id TEXT PRIMARY KEY,
+            exported_seq INTEGER NOT NULL DEFAULT 0,
+            imported_seq INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        
+        # Booking references are only unique within one office, so synced
+        # reservations are known by the office that created them (home) and
+        # their reference there. Reservations created here have no row.
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_keys (
+            reservation_id INTEGER PRIMARY KEY,
+            home TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            UNIQUE (home, ref)
+        )
+        ''')
+        
+        # Changeset records that could not be applied because their booking
+        # reference is taken here by another office's reservation
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_conflicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            home TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            origin TEXT NOT NULL,
+            at TEXT NOT NULL,
+            record TEXT NOT NULL,
+            local_id INTEGER,
+            detected_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        ''')
+        
+        # Databases created before the summaries existed need a first fill
+        if previous_version < 3:
+            self.rebuild_summaries(commit=False)
+        elif previous_version < 13:
+            self.rebuild_route_availability()
+        
+        # Index the names of existing reservations (commits the upgrade so far)
+        if 0 < previous_version < 9:
+            rebuild_name_index(self)
+        
+        # Record the schema version
+        self.cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        
         # Commit changes
         self.conn.commit()
     
+    @instrumented("db")
     def add_reservation(self, name, flight_number, departure, destination, date, seat_number):
         """
         Add a new reservation
@@ -65,118 +623,1379 @@ class Database:
         Returns:
             bool: True if successful, False otherwise
         """
+        self.last_error = None
+        
         try:
-            self.cursor.execute('''
-            INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (name, flight_number, departure, destination, date, seat_number))
+            # Take the write lock first so the seat count cannot change
+            # between the capacity check and the insert
+            with self.transaction(immediate=True):
+                self.insert_reservations([(name, flight_number, departure, destination, date, seat_number)])
             
-            self.conn.commit()
             return True
         except Exception as e:
-            print(f"Error adding reservation: {e}")
+            self.record_error("add_reservation", e)
             return False
     
-    def get_all_reservations(self):
+    @instrumented("db")
+    def add_reservations(self, reservations):
         """
-        Get all reservations
+        Add several reservations in a single transaction
         
+        Args:
+            reservations (list): Tuples of (name, flight_number, departure,
+                destination, date, seat_number)
+            
         Returns:
-            list: List of tuples containing reservation information
+            bool: True if all were added, False if none were
         """
-        self.cursor.execute('''
-        SELECT id, name, flight_number, departure, destination, date, seat_number 
-        FROM reservations
-        ''')
+        self.last_error = None
         
-        return self.cursor.fetchall()
+        try:
+            with self.transaction(immediate=True):
+                self.insert_reservations(reservations)
+            
+            return True
+        except Exception as e:
+            self.record_error("add_reservations", e)
+            return False
     
-    def get_reservation_by_id(self, reservation_id):
+    def insert_reservations(self, reservations):
         """
-        Get a reservation by its ID
+        Insert reservations with new booking references, without committing
         
         Args:
-            reservation_id (int): ID of the reservation
+            reservations (list): Tuples of (name, flight_number, departure,
+                destination, date, seat_number)
             
         Returns:
-            tuple: Reservation information
+            list: Booking references in the order of the reservations, also
+                kept in last_booking_refs
+            
+        Raises:
+            CapacityError: If a scheduled flight does not have enough seats left
         """
-        self.cursor.execute('''
-        SELECT id, name, flight_number, departure, destination, date, seat_number
-        FROM reservations
-        WHERE id = ?
-        ''', (reservation_id,))
+        reservations = list(reservations)
+        self.check_capacity(Counter((reservation[1], reservation[4]) for reservation in reservations))
+        refs = self.new_booking_refs(len(reservations))
         
-        return self.cursor.fetchone()
+        self.cursor.executemany('''
+        INSERT INTO reservations (name, flight_number, departure, destination, date, seat_number, booking_ref)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [tuple(reservation) + (ref,) for reservation, ref in zip(reservations, refs)])
+        
+        index_names(self.cursor, (reservation[0] for reservation in reservations))
+        
+        # Read the new rows back by reference for their IDs
+        for start in range(0, len(refs), 500):
+            chunk = refs[start:start + 500]
+            self.cursor.execute(f'''
+            SELECT {RESERVATION_COLUMNS}, booking_ref FROM reservations
+            WHERE booking_ref IN ({", ".join("?" * len(chunk))})
+            ORDER BY id
+            ''', chunk)
+            for row in self.cursor.fetchall():
+                self.audit.record("insert", after=reservation_image(row))
+        
+        self.last_booking_refs = refs
+        return refs
     
-    def update_reservation(self, reservation_id, name, flight_number, departure, destination, date, seat_number):
+    def new_booking_refs(self, count):
         """
-        Update reservation information
+        Generate booking references that are not used yet
+        
+        Codes are checked against the unique index in chunks and the few
+        that clash are drawn again, so large batches never fail on a collision.
+        Archived reservations keep their code, so the archive is checked too
+        when it is attached (transaction() attaches an existing archive).
         
         Args:
-            reservation_id (int): ID of the reservation to update
-            name (str): Passenger name
-            flight_number (str): Flight identifier
-            departure (str): Departure location
-            destination (str): Destination location
-            date (str): Flight date
-            seat_number (str): Seat identifier
+            count (int): Number of references
             
         Returns:
-            bool: True if successful, False otherwise
+            list: Distinct unused references
         """
-        try:
-            self.cursor.execute('''
-            UPDATE reservations
-            SET name = ?, flight_number = ?, departure = ?, destination = ?, date = ?, seat_number = ?
-            WHERE id = ?
-            ''', (name, flight_number, departure, destination, date, seat_number, reservation_id))
+        refs = set()
+        
+        tables = ["main.reservations"]
+        if self.archive_attached:
+            tables.append("archive.reservations")
+        
+        while len(refs) < count:
+            fresh = list({new_booking_ref() for _ in range(count - len(refs))} - refs)
             
-            self.conn.commit()
-            return True
-        except Exception as e:
-            print(f"Error updating reservation: {e}")
-            return False
+            for start in range(0, len(fresh), 500):
+                chunk = fresh[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                self.cursor.execute(" UNION ALL ".join(
+                    f"SELECT booking_ref FROM {table} WHERE booking_ref IN ({placeholders})"
+                    for table in tables
+                ), chunk * len(tables))
+                used = {row[0] for row in self.cursor.fetchall()}
+                refs.update(ref for ref in chunk if ref not in used)
+        
+        return list(refs)
     
-    def delete_reservation(self, reservation_id):
+    def backfill_booking_refs(self, batch_size=1000):
         """
-        Delete a reservation
+        Give one batch of reservations without a booking reference a code
+        
+        Every code given is recorded as an update in the audit trail.
         
         Args:
-            reservation_id (int): ID of the reservation to delete
+            batch_size (int): Reservations updated and committed together
             
         Returns:
-            bool: True if successful, False otherwise
+            int: Number of reservations updated, 0 when none are left
         """
         try:
-            self.cursor.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+            self.ensure_archive()
             
-            self.conn.commit()
-            return True
+            self.cursor.execute(f'''
+            SELECT {RESERVATION_COLUMNS}, booking_ref FROM reservations WHERE booking_ref IS NULL LIMIT ?
+            ''', (batch_size,))
+            rows = self.cursor.fetchall()
+            refs = self.new_booking_refs(len(rows))
+            
+            self.cursor.executemany('UPDATE reservations SET booking_ref = ? WHERE id = ?',
+                                    zip(refs, (row[0] for row in rows)))
+            
+            for row, ref in zip(rows, refs):
+                before = reservation_image(row)
+                self.audit.record("update", before=before, after=dict(before, booking_ref=ref))
+            
+            self.commit()
+            return len(rows)
         except Exception as e:
-            print(f"Error deleting reservation: {e}")
-            return False
+            self.record_error("backfill_booking_refs", e)
+            ERRORS.labels("db", "backfill_booking_refs").inc()
+            return 0
     
-    def search_reservations(self, search_term):
+    @instrumented("db")
+    def get_reservation_by_ref(self, booking_ref):
         """
-        Search for reservations with a given search term
+        Get a reservation by its booking reference, with one index seek
         
         Args:
-            search_term (str): Term to search for in name, flight_number, departure, destination
+            booking_ref (str): Booking reference, in any case and spacing
             
         Returns:
-            list: List of matching reservations
+            tuple: Reservation information, or None if not found
         """
-        search_pattern = f"%{search_term}%"
+        self.cursor.execute(f'''
+        SELECT {RESERVATION_COLUMNS} FROM reservations WHERE booking_ref = ?
+        ''', (normalize_booking_ref(booking_ref),))
         
-        self.cursor.execute('''
-        SELECT id, name, flight_number, departure, destination, date, seat_number 
-        FROM reservations
-        WHERE name LIKE ? OR flight_number LIKE ? OR departure LIKE ? OR destination LIKE ?
-        ''', (search_pattern, search_pattern, search_pattern, search_pattern))
+        return self.cursor.fetchone()
+    
+    def get_booking_ref(self, reservation_id):
+        """
+        Get the booking reference of a reservation
+        
+        Args:
+            reservation_id (int): ID of the reservation
+            
+        Returns:
+            str: Booking reference, or None
+        """
+        self.cursor.execute('SELECT booking_ref FROM reservations WHERE id = ?', (reservation_id,))
+        row = self.cursor.fetchone()
+        
+        return row[0] if row else None
+    
+    @instrumented("db")
+    def get_reservations_page(self, after_id=0, limit=100, include_archive=False):
+        """
+        Get one page of reservations ordered by ID
+        
+        Uses the ID of the last row seen rather than an offset, so every page
+        is a primary key range scan however deep it is.
+        
+        Args:
+            after_id (int): ID of the last reservation of the previous page
+            limit (int): Maximum number of reservations to return
+            include_archive (bool): Also return archived reservations
+            
+        Returns:
+            list: List of reservation tuples
+        """
+        query = f'SELECT {RESERVATION_COLUMNS} FROM main.reservations WHERE id > ?'
+        params = (after_id,)
+        
+        if include_archive and self.ensure_archive():
+            query += f' UNION ALL SELECT {RESERVATION_COLUMNS} FROM archive.reservations WHERE id > ?'
+            params += (after_id,)
+        
+        self.cursor.execute(f'{query} ORDER BY id LIMIT ?', params + (limit,))
         
         return self.cursor.fetchall()
     
+    @instrumented("db")
+    def get_all_reservations(self, include_archive=False):
+        """
+        Get all reservations
+        
+        Args:
+            include_archive (bool): Also return archived reservations
+            
+        Returns:
+            list: List of tuples containing reservation information
+        """
+        query = f'SELECT {RESERVATION_COLUMNS} FROM main.reservations'
+        
+        if include_archive and self.ensure_archive():
+            query += f' UNION ALL SELECT {RESERVATION_COLUMNS} FROM archive.reservations'
+        
+        self.cursor.execute(query)
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def get_reservation_by_id(self, reservation_id):
+        """
+        Get a reservation by its ID
+        
+        Args:
+            reservation_id (int): ID of the reservation
+            
+        Returns:
+            tuple: Reservation information
+        """
+        self.cursor.execute('''
+        SELECT id, name, flight_number, departure, destination, date, seat_number
+        FROM reservations
+        WHERE id = ?
+        ''', (reservation_id,))
+        
+        return self.cursor.fetchone()
+    
+    def get_reservation_image(self, reservation_id):
+        """
+        Get a reservation as recorded in the audit trail
+        
+        Args:
+            reservation_id (int): ID of the reservation
+            
+        Returns:
+            dict: Field name -> value including booking_ref, or None if not found
+        """
+        self.cursor.execute(f'''
+        SELECT {RESERVATION_COLUMNS}, booking_ref FROM reservations WHERE id = ?
+        ''', (reservation_id,))
+        row = self.cursor.fetchone()
+        
+        return reservation_image(row) if row else None
+    
+    @instrumented("db")
+    def get_reservation_history(self, reservation_id=None, booking_ref=None):
+        """
+        Get the recorded changes of a reservation, oldest first
+        
+        Args:
+            reservation_id (int): ID of the reservation
+            booking_ref (str): Booking reference, used if no ID is given
+            
+        Returns:
+            list: audit.AuditEntry tuples
+        """
+        if booking_ref is not None:
+            booking_ref = normalize_booking_ref(booking_ref)
+        
+        return get_history(self, reservation_id, booking_ref)
+    
+    @instrumented("db")
+    def update_reservation(self, reservation_id, name, flight_number, departure, destination, date, seat_number):
+        """
+        Update reservation information
+        
+        Args:
+            reservation_id (int): ID of the reservation to update
+            name (str): Passenger name
+            flight_number (str): Flight identifier
+            departure (str): Departure location
+            destination (str): Destination location
+            date (str): Flight date
+            seat_number (str): Seat identifier
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.last_promotion = None
+        self.last_error = None
+        
+        try:
+            with self.transaction(immediate=True):
+                old = self.get_reservation_image(reservation_id)
+                
+                # Moving to another flight takes a seat there
+                if old and (old["flight_number"], old["date"]) != (flight_number, date):
+                    self.check_capacity({(flight_number, date): 1})
+                
+                self.cursor.execute('''
+                UPDATE reservations
+                SET name = ?, flight_number = ?, departure = ?, destination = ?, date = ?, seat_number = ?
+                WHERE id = ?
+                ''', (name, flight_number, departure, destination, date, seat_number, reservation_id))
+                index_names(self.cursor, [name])
+                
+                if old:
+                    new = dict(old, name=name, flight_number=flight_number, departure=departure,
+                               destination=destination, date=date, seat_number=seat_number)
+                    self.audit.record("update", before=old, after=new)
+                
+                # Moving to another flight, date or seat frees the old seat;
+                # only leaving the flight or date frees a place on it
+                old_seat = (old["flight_number"], old["date"], old["seat_number"]) if old else None
+                if old_seat and old_seat != (flight_number, date, seat_number):
+                    left = old_seat[:2] != (flight_number, date)
+                    self.promote_waitlist(*old_seat, place_freed=left)
+            
+            return True
+        except Exception as e:
+            self.last_promotion = None
+            self.record_error("update_reservation", e)
+            return False
+    
+    @instrumented("db")
+    def delete_reservation(self, reservation_id):
+        """
+        Delete a reservation
+        
+        Args:
+            reservation_id (int): ID of the reservation to delete
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.last_promotion = None
+        self.last_error = None
+        
+        try:
+            with self.transaction():
+                old = self.get_reservation_image(reservation_id)
+                
+                self.cursor.execute('DELETE FROM reservations WHERE id = ?', (reservation_id,))
+                
+                # Offer the freed seat to the head of the flight's waitlist
+                if old:
+                    self.audit.record("delete", before=old)
+                    self.promote_waitlist(old["flight_number"], old["date"], old["seat_number"])
+            
+            return True
+        except Exception as e:
+            self.last_promotion = None
+            self.record_error("delete_reservation", e)
+            return False
+    
+    @instrumented("db")
+    def search_reservations(self, search_term, include_archive=False):
+        """
+        Search for reservations with a given search term
+        
+        Args:
+            search_term (str): Term to search for in name, flight_number, departure, destination
+            include_archive (bool): Also search archived reservations
+            
+        Returns:
+            list: List of matching reservations
+        """
+        search_pattern = f"%{search_term}%"
+        condition = 'name LIKE ? OR flight_number LIKE ? OR departure LIKE ? OR destination LIKE ?'
+        params = (search_pattern, search_pattern, search_pattern, search_pattern)
+        
+        query = f'SELECT {RESERVATION_COLUMNS} FROM main.reservations WHERE {condition}'
+        
+        if include_archive and self.ensure_archive():
+            query += f' UNION ALL SELECT {RESERVATION_COLUMNS} FROM archive.reservations WHERE {condition}'
+            params += params
+        
+        self.cursor.execute(query, params)
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def search_reservations_fuzzy(self, search_term, limit=200):
+        """
+        Search reservations by a possibly misspelled passenger name
+        
+        Args:
+            search_term (str): Name as typed, e.g. "Mohamed Smyth"
+            limit (int): Maximum number of reservations
+            
+        Returns:
+            list: Reservation tuples, closest names first
+        """
+        return fuzzy_search_reservations(self, search_term, limit)
+    
+    def iter_reservations(self, batch_size=1000, include_archive=False):
+        """
+        Stream all reservations in batches without loading the whole table
+        
+        Uses a dedicated cursor, so other methods can be called between batches.
+        
+        Args:
+            batch_size (int): Number of rows per batch
+            include_archive (bool): Also return archived reservations
+            
+        Yields:
+            list: Next batch of reservation tuples
+        """
+        query = f'SELECT {RESERVATION_COLUMNS} FROM main.reservations'
+        
+        if include_archive and self.ensure_archive():
+            query += f' UNION ALL SELECT {RESERVATION_COLUMNS} FROM archive.reservations'
+        
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query)
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            cursor.close()
+    
+    @instrumented("db")
+    def count_reservations(self, include_archive=False):
+        """
+        Count live reservations using the route summary table
+        
+        Args:
+            include_archive (bool): Also count archived reservations
+            
+        Returns:
+            int: Number of reservations
+        """
+        self.cursor.execute('SELECT COALESCE(SUM(bookings), 0) FROM route_summary')
+        count = self.cursor.fetchone()[0]
+        
+        if include_archive and self.ensure_archive():
+            self.cursor.execute('SELECT COUNT(*) FROM archive.reservations')
+            count += self.cursor.fetchone()[0]
+        
+        return count
+    
+    @instrumented("db")
+    def get_flight_passengers(self, flight_number, date):
+        """
+        Get the reservations of one flight, ordered by seat row then letter
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            list: Reservation tuples followed by their booking reference
+        """
+        self.cursor.execute(f'''
+        SELECT {RESERVATION_COLUMNS}, booking_ref
+        FROM reservations
+        WHERE flight_number = ? AND date = ?
+        ORDER BY CAST(seat_number AS INTEGER), seat_number
+        ''', (flight_number, date))
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def get_occupied_seats(self, flight_number, date):
+        """
+        Get the seats taken on one flight
+        
+        Answered from idx_reservations_flight_date alone, without reading
+        the reservation rows.
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            list: Seat numbers
+        """
+        self.cursor.execute('''
+        SELECT seat_number FROM reservations WHERE flight_number = ? AND date = ?
+        ''', (flight_number, date))
+        
+        return [row[0] for row in self.cursor.fetchall()]
+    
+    def check_capacity(self, bookings):
+        """
+        Make sure scheduled flights have room for new bookings
+        
+        Reads the booked count kept by the flight_load triggers, so the check
+        costs one seek per flight instead of counting its reservations. Call
+        it with the write lock held (transaction(immediate=True)) so no other
+        connection can book in between. Flights that are not in the schedule
+        have no known capacity and are not checked.
+        
+        Args:
+            bookings (dict): (flight_number, date) -> number of new seats
+            
+        Raises:
+            CapacityError: If a flight would go past its capacity plus its
+                overbooking allowance
+        """
+        for (flight_number, date), seats in bookings.items():
+            availability = self.get_flight_availability(flight_number, date)
+            if availability is None:
+                continue
+            
+            capacity, overbook_limit, booked = availability
+            if booked + seats > capacity + overbook_limit:
+                raise CapacityError(
+                    f"{flight_number} on {date} is full: {booked} of {capacity} seats booked"
+                    + (f" (+{overbook_limit} overbooking)" if overbook_limit else "")
+                    + (f", {seats} requested" if seats > 1 else "")
+                )
+    
+    def get_flight_availability(self, flight_number, date):
+        """
+        Get the seat counts of a scheduled flight
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            tuple: (capacity, overbook_limit, booked), or None if the flight
+                is not scheduled
+        """
+        self.cursor.execute('''
+        SELECT f.capacity, f.overbook_limit, COALESCE(l.booked, 0)
+        FROM flights AS f
+        LEFT JOIN flight_load AS l ON l.flight_number = f.flight_number AND l.date = f.date
+        WHERE f.flight_number = ? AND f.date = ?
+        ''', (flight_number, date))
+        
+        return self.cursor.fetchone()
+    
+    @instrumented("db")
+    def get_route_availability(self, departure, destination, start, end):
+        """
+        Get the seats left on a route for every day of a period
+        
+        One range scan of the route_availability primary key, whatever the
+        number of flights or reservations.
+        
+        Args:
+            departure (str): Departure location
+            destination (str): Destination location
+            start (str): First date (YYYY-MM-DD)
+            end (str): Last date, included
+            
+        Returns:
+            list: (date, flights, seats, booked) tuples for the days with
+                scheduled flights, by date
+        """
+        self.cursor.execute('''
+        SELECT date, flights, seats, booked
+        FROM route_availability
+        WHERE departure = ? AND destination = ? AND date BETWEEN ? AND ?
+        ORDER BY date
+        ''', (departure, destination, start, end))
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def set_overbook_limit(self, flight_number, date, overbook_limit):
+        """
+        Allow selling seats beyond a flight's capacity
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            overbook_limit (int): Extra seats allowed, 0 to sell only the capacity
+            
+        Returns:
+            bool: True if the flight is scheduled and was updated, False otherwise
+        """
+        self.last_error = None
+        
+        try:
+            self.cursor.execute('''
+            UPDATE flights SET overbook_limit = ? WHERE flight_number = ? AND date = ?
+            ''', (max(0, int(overbook_limit)), flight_number, date))
+            updated = self.cursor.rowcount == 1
+            
+            self.commit()
+            return updated
+        except Exception as e:
+            self.record_error("set_overbook_limit", e)
+            return False
+    
+    @instrumented("db")
+    def get_flights(self):
+        """
+        Get every flight and date that has reservations
+        
+        Returns:
+            list: List of (flight_number, date, departure, destination, booked) tuples
+        """
+        self.cursor.execute('''
+        SELECT flight_number, date, departure, destination, booked
+        FROM flight_load
+        ORDER BY date, flight_number
+        ''')
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def add_to_waitlist(self, name, flight_number, departure, destination, date, priority=0):
+        """
+        Put a passenger on the waitlist of a flight
+        
+        Args:
+            name (str): Passenger name
+            flight_number (str): Flight identifier
+            departure (str): Departure location
+            destination (str): Destination location
+            date (str): Flight date
+            priority (int): Priority tier, higher tiers are served first
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.last_error = None
+        
+        try:
+            self.cursor.execute('''
+            INSERT INTO waitlist (name, flight_number, departure, destination, date, priority)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ''', (name, flight_number, departure, destination, date, priority))
+            
+            self.commit()
+            return True
+        except Exception as e:
+            self.record_error("add_to_waitlist", e)
+            return False
+    
+    @instrumented("db")
+    def get_waitlist(self, flight_number, date):
+        """
+        Get the passengers waiting for a flight, head of the queue first
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            list: (id, name, priority, added_at) tuples
+        """
+        self.cursor.execute('''
+        SELECT id, name, priority, added_at
+        FROM waitlist
+        WHERE flight_number = ? AND date = ? AND status = 'waiting'
+        ORDER BY priority DESC, id
+        ''', (flight_number, date))
+        
+        return self.cursor.fetchall()
+    
+    @instrumented("db")
+    def remove_from_waitlist(self, waitlist_id):
+        """
+        Take a passenger off a waitlist
+        
+        Args:
+            waitlist_id (int): ID of the waitlist entry
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.last_error = None
+        
+        try:
+            self.cursor.execute('''
+            UPDATE waitlist SET status = 'removed' WHERE id = ? AND status = 'waiting'
+            ''', (waitlist_id,))
+            
+            self.commit()
+            return True
+        except Exception as e:
+            self.record_error("remove_from_waitlist", e)
+            return False
+    
+    def promote_waitlist(self, flight_number, date, seat_number, place_freed=True):
+        """
+        Book a freed seat for the passenger at the head of a flight's waitlist
+        
+        Called by delete_reservation and update_reservation inside their
+        transaction, so the seat is never free for another booking in between.
+        The promotion is recorded in last_promotion.
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            seat_number (str): Seat that was freed
+            place_freed (bool): Whether a passenger left the flight; a seat
+                change within the flight frees a seat number but not a place
+            
+        Returns:
+            int: ID of the new reservation, or None if nobody was waiting or
+                the flight has no room
+        """
+        # Without a known capacity only a passenger leaving makes room
+        availability = self.get_flight_availability(flight_number, date)
+        if availability is None:
+            if not place_freed:
+                return None
+        elif availability[2] >= availability[0] + availability[1]:
+            return None
+        
+        self.cursor.execute('''
+        SELECT id, name, departure, destination
+        FROM waitlist
+        WHERE flight_number = ? AND date = ? AND status = 'waiting'
+        ORDER BY priority DESC, id
+        LIMIT 1
+        ''', (flight_number, date))
+        head = self.cursor.fetchone()
+        
+        if head is None:
+            return None
+        
+        waitlist_id, name, departure, destination = head
+        
+        booking_ref, = self.insert_reservations([(name, flight_number, departure, destination, date, seat_number)])
+        self.cursor.execute('SELECT id FROM reservations WHERE booking_ref = ?', (booking_ref,))
+        reservation_id = self.cursor.fetchone()[0]
+        
+        self.cursor.execute('''
+        UPDATE waitlist
+        SET status = 'promoted', reservation_id = ?, promoted_at = datetime('now')
+        WHERE id = ?
+        ''', (reservation_id, waitlist_id))
+        
+        self.last_promotion = (waitlist_id, reservation_id, name, seat_number)
+        return reservation_id
+    
+    @instrumented("db")
+    def add_flight(self, flight_number, departure, destination, date, fare,
+                   departs_at=None, arrives_at=None, capacity=DEFAULT_CAPACITY, overbook_limit=0):
+        """
+        Add a flight to the schedule, replacing the same flight on the same date
+        
+        Args:
+            flight_number (str): Flight identifier
+            departure (str): Departure location
+            destination (str): Destination location
+            date (str): Flight date (YYYY-MM-DD)
+            fare (float): Base fare
+            departs_at (str): Departure time 'YYYY-MM-DD HH:MM', defaults to
+                09:00 on the flight date
+            arrives_at (str): Arrival time 'YYYY-MM-DD HH:MM', or None if unknown
+            capacity (int): Number of seats
+            overbook_limit (int): Seats that may be sold beyond the capacity
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if departs_at is None:
+            departs_at = f"{date} 09:00"
+        
+        self.last_error = None
+        
+        try:
+            self.cursor.execute('''
+            INSERT INTO flights (flight_number, departure, destination, date,
+                                 departs_at, arrives_at, fare, capacity, overbook_limit)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (flight_number, date) DO UPDATE SET
+                departure = excluded.departure,
+                destination = excluded.destination,
+                departs_at = excluded.departs_at,
+                arrives_at = excluded.arrives_at,
+                fare = excluded.fare,
+                capacity = excluded.capacity,
+                overbook_limit = excluded.overbook_limit
+            ''', (flight_number, departure, destination, date, departs_at, arrives_at, fare, capacity,
+                  max(0, int(overbook_limit))))
+            
+            self.commit()
+            return True
+        except Exception as e:
+            self.record_error("add_flight", e)
+            return False
+    
+    @instrumented("db")
+    def delete_flight(self, flight_number, date):
+        """
+        Remove a flight from the schedule
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        self.last_error = None
+        
+        try:
+            self.cursor.execute('DELETE FROM flights WHERE flight_number = ? AND date = ?',
+                                (flight_number, date))
+            
+            self.commit()
+            return True
+        except Exception as e:
+            self.record_error("delete_flight", e)
+            return False
+    
+    def get_flight(self, flight_number, date):
+        """
+        Get one scheduled flight
+        
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            
+        Returns:
+            tuple: (id, flight_number, departure, destination, date, departs_at,
+                arrives_at, fare, capacity), or None if not scheduled
+        """
+        self.cursor.execute(f'''
+        SELECT {FLIGHT_COLUMNS} FROM flights WHERE flight_number = ? AND date = ?
+        ''', (flight_number, date))
+        
+        return self.cursor.fetchone()
+    
+    def get_flights_by_ids(self, flight_ids):
+        """
+        Get scheduled flights by ID
+        
+        Args:
+            flight_ids (list): Flight IDs
+            
+        Returns:
+            list: Flight tuples (see get_flight) of the IDs that still exist
+        """
+        flights = []
+        flight_ids = list(flight_ids)
+        
+        # Stay well below SQLite's limit on the number of parameters
+        for start in range(0, len(flight_ids), 500):
+            chunk = flight_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            self.cursor.execute(f'''
+            SELECT {FLIGHT_COLUMNS} FROM flights WHERE id IN ({placeholders})
+            ''', chunk)
+            flights.extend(self.cursor.fetchall())
+        
+        return flights
+    
+    @instrumented("db")
+    def get_fare_inputs(self, flights):
+        """
+        Get what a fare depends on for many flights at once (see fares.py)
+        
+        Args:
+            flights (list): (flight_number, date) pairs
+            
+        Returns:
+            list: (flight_number, date, fare, capacity, booked) tuples of the
+                pairs that are scheduled
+        """
+        rows = []
+        flights = list(flights)
+        
+        # Two parameters per flight, well below SQLite's limit
+        for start in range(0, len(flights), 250):
+            chunk = flights[start:start + 250]
+            values = ", ".join("(?, ?)" for _ in chunk)
+            self.cursor.execute(f'''
+            WITH wanted (flight_number, date) AS (VALUES {values})
+            SELECT f.flight_number, f.date, f.fare, f.capacity, COALESCE(l.booked, 0)
+            FROM wanted AS w
+            JOIN flights AS f ON f.flight_number = w.flight_number AND f.date = w.date
+            LEFT JOIN flight_load AS l ON l.flight_number = f.flight_number AND l.date = f.date
+            ''', [value for flight in chunk for value in flight])
+            rows.extend(self.cursor.fetchall())
+        
+        return rows
+    
+    def get_schedule(self):
+        """
+        Get every scheduled flight
+        
+        Returns:
+            list: Flight tuples (see get_flight) ordered by departure time
+        """
+        self.cursor.execute(f'SELECT {FLIGHT_COLUMNS} FROM flights ORDER BY departs_at')
+        
+        return self.cursor.fetchall()
+    
+    def latest_flight_change(self):
+        """
+        Get the sequence number of the most recent schedule change
+        
+        Returns:
+            int: Cursor to pass to flight_changes_since(), 0 if none
+        """
+        self.cursor.execute('SELECT MAX(seq) FROM flight_changes')
+        
+        return self.cursor.fetchone()[0] or 0
+    
+    def flight_changes_since(self, cursor, limit=1000):
+        """
+        Get the IDs of flights added, changed or removed after a cursor
+        
+        Args:
+            cursor (int): Sequence number returned by a previous call
+            limit (int): Maximum number of changes to return
+            
+        Returns:
+            tuple: (flight IDs, cursor to pass to the next call)
+        """
+        self.cursor.execute('''
+        SELECT seq, flight_id FROM flight_changes WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (cursor, limit))
+        
+        changes = self.cursor.fetchall()
+        if changes:
+            cursor = changes[-1][0]
+        
+        return [flight_id for _, flight_id in changes], cursor
+    
+    def attach_archive(self):
+        """
+        Attach the archive database as schema "archive", creating it if needed
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self.archive_attached:
+            return True
+        
+        try:
+            # ATTACH is not allowed inside a transaction
+            self.conn.commit()
+            self.cursor.execute('ATTACH DATABASE ? AS archive', (self.archive_name,))
+            
+            # Same columns as the live table plus the time the row was archived.
+            # Archived IDs keep their original value so they never clash.
+            self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive.reservations (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                flight_number TEXT NOT NULL,
+                departure TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                date TEXT NOT NULL,
+                seat_number TEXT NOT NULL,
+                archived_at TEXT NOT NULL DEFAULT (datetime('now')),
+                booking_ref TEXT
+            )
+            ''')
+            
+            # Archives created before booking references existed
+            self.cursor.execute('PRAGMA archive.table_info(reservations)')
+            if 'booking_ref' not in [column[1] for column in self.cursor.fetchall()]:
+                self.cursor.execute('ALTER TABLE archive.reservations ADD COLUMN booking_ref TEXT')
+            self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS archive.idx_archive_reservations_date
+            ON reservations (date)
+            ''')
+            
+            # new_booking_refs() checks new codes against the archive
+            self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS archive.idx_archive_reservations_booking_ref
+            ON reservations (booking_ref)
+            ''')
+            
+            self.conn.commit()
+            self.archive_attached = True
+            return True
+        except Exception as e:
+            self.record_error("attach_archive", e)
+            ERRORS.labels("db", "attach_archive").inc()
+            return False
+    
+    def ensure_archive(self):
+        """
+        Attach the archive database if it exists
+        
+        Returns:
+            bool: True if archived reservations can be queried
+        """
+        if self.archive_attached:
+            return True
+        
+        if not os.path.exists(self.archive_name):
+            return False
+        
+        return self.attach_archive()
+    
+    def rebuild_summaries(self, commit=True):
+        """
+        Recompute the dashboard summary tables from the reservations table
+        
+        Args:
+            commit (bool): Commit the rebuild, False when part of a larger transaction
+        """
+        self.cursor.execute('DELETE FROM flight_load')
+        self.cursor.execute('''
+        INSERT INTO flight_load (flight_number, date, departure, destination, booked)
+        SELECT flight_number, date, MAX(departure), MAX(destination), COUNT(*)
+        FROM reservations
+        GROUP BY flight_number, date
+        ''')
+        
+        self.cursor.execute('DELETE FROM route_summary')
+        self.cursor.execute('''
+        INSERT INTO route_summary (departure, destination, bookings)
+        SELECT departure, destination, COUNT(*)
+        FROM reservations
+        GROUP BY departure, destination
+        ''')
+        
+        self.rebuild_route_availability()
+        
+        if commit:
+            self.conn.commit()
+    
+    def rebuild_route_availability(self):
+        """Recompute route_availability from the schedule and flight_load, without committing"""
+        self.cursor.execute('DELETE FROM route_availability')
+        self.cursor.execute('''
+        INSERT INTO route_availability (departure, destination, date, flights, seats, booked)
+        SELECT f.departure, f.destination, f.date, COUNT(*),
+               SUM(f.capacity + f.overbook_limit), COALESCE(SUM(l.booked), 0)
+        FROM flights AS f
+        LEFT JOIN flight_load AS l ON l.flight_number = f.flight_number AND l.date = f.date
+        GROUP BY f.departure, f.destination, f.date
+        ''')
+    
+    @instrumented("db")
+    def get_dashboard(self, today, limit=5):
+        """
+        Get the figures shown on the home page dashboard
+        
+        Reads only the summary tables, so the cost does not grow with the
+        number of reservations.
+        
+        Args:
+            today (str): Current date (YYYY-MM-DD)
+            limit (int): Number of routes and departures to return
+            
+        Returns:
+            dict: bookings_today, total_bookings, top_routes as
+                (departure, destination, bookings) tuples and upcoming as
+                (flight_number, date, departure, destination, booked) tuples
+        """
+        self.cursor.execute('SELECT bookings FROM daily_bookings WHERE day = ?', (today,))
+        row = self.cursor.fetchone()
+        bookings_today = row[0] if row else 0
+        
+        total_bookings = self.count_reservations()
+        
+        self.cursor.execute('''
+        SELECT departure, destination, bookings
+        FROM route_summary
+        ORDER BY bookings DESC
+        LIMIT ?
+        ''', (limit,))
+        top_routes = self.cursor.fetchall()
+        
+        self.cursor.execute('''
+        SELECT flight_number, date, departure, destination, booked
+        FROM flight_load
+        WHERE date >= ?
+        ORDER BY date, flight_number
+        LIMIT ?
+        ''', (today, limit))
+        upcoming = self.cursor.fetchall()
+        
+        return {
+            "bookings_today": bookings_today,
+            "total_bookings": total_bookings,
+            "top_routes": top_routes,
+            "upcoming": upcoming,
+        }
+    
+    def latest_change(self):
+        """
+        Get the sequence number of the most recent change
+        
+        Returns:
+            int: Cursor to pass to changes_since(), 0 if nothing was logged
+        """
+        self.cursor.execute('SELECT MAX(seq) FROM reservation_changes')
+        
+        return self.cursor.fetchone()[0] or 0
+    
+    @instrumented("db")
+    def changes_since(self, cursor, limit=1000):
+        """
+        Get the reservation changes made after a cursor
+        
+        Args:
+            cursor (int): Sequence number returned by a previous call, or by
+                latest_change()
+            limit (int): Maximum number of changes to return
+            
+        Returns:
+            tuple: (changes, cursor) where changes is a list of
+                (seq, op, reservation_id, version, changed_at) tuples and cursor
+                is the value to pass to the next call. changes is None when the
+                log was pruned past the cursor and the caller has to reload.
+        """
+        if cursor < self.get_changelog_horizon():
+            return None, self.latest_change()
+        
+        self.cursor.execute('''
+        SELECT seq, op, reservation_id, version, changed_at
+        FROM reservation_changes
+        WHERE seq > ?
+        ORDER BY seq
+        LIMIT ?
+        ''', (cursor, limit))
+        
+        changes = self.cursor.fetchall()
+        if changes:
+            cursor = changes[-1][0]
+        
+        return changes, cursor
+    
+    def get_data_version(self):
+        """
+        Get the SQLite data version of this connection
+        
+        The value changes whenever another connection, possibly in another
+        process, commits a change to the database file.
+        
+        Returns:
+            int: Current PRAGMA data_version
+        """
+        self.cursor.execute('PRAGMA data_version')
+        
+        return self.cursor.fetchone()[0]
+    
+    def data_changed(self):
+        """
+        Check cheaply whether the database changed since the last call
+        
+        Covers commits made through this connection as well as commits made by
+        other connections or processes, without querying any table.
+        
+        Returns:
+            bool: True if anything was written since the previous call
+        """
+        data_version = self.get_data_version()
+        total_changes = self.conn.total_changes
+        
+        changed = (data_version != self._data_version
+                   or total_changes != self._total_changes)
+        
+        self._data_version = data_version
+        self._total_changes = total_changes
+        
+        return changed
+    
+    def get_meta(self, key, default=None):
+        """
+        Get a bookkeeping value from the db_meta table
+        
+        Args:
+            key (str): Name of the value
+            default: Value returned if the key is not set
+            
+        Returns:
+            str: Stored value, or default
+        """
+        self.cursor.execute('SELECT value FROM db_meta WHERE key = ?', (key,))
+        row = self.cursor.fetchone()
+        
+        return row[0] if row else default
+    
+    def set_meta(self, key, value, commit=True):
+        """
+        Store a bookkeeping value in the db_meta table
+        
+        Args:
+            key (str): Name of the value
+            value (str): Value to store
+            commit (bool): Commit immediately, False when part of a larger transaction
+        """
+        self.cursor.execute('''
+        INSERT INTO db_meta (key, value) VALUES (?, ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        ''', (key, value))
+        
+        if commit:
+            self.conn.commit()
+    
+    def get_changelog_horizon(self):
+        """
+        Get the highest sequence number removed by pruning
+        
+        Returns:
+            int: Cursors below this value can no longer be served
+        """
+        return int(self.get_meta('changelog_horizon', 0))
+    
+    def prune_changes(self, retention=None):
+        """
+        Remove old change records from the changelog
+        
+        The most recent record of every live reservation is always kept so
+        that version numbers keep increasing after a prune.
+        
+        Args:
+            retention (int): Number of recent records to keep, defaults to the
+                value given to the constructor
+            
+        Returns:
+            int: Number of records removed
+        """
+        try:
+            horizon = self.advance_changelog_horizon(retention)
+            if horizon is None:
+                return 0
+            
+            removed, _ = self.delete_pruned_changes(horizon)
+            return removed
+        except Exception as e:
+            self.record_error("prune_changes", e)
+            ERRORS.labels("db", "prune_changes").inc()
+            return 0
+    
+    def advance_changelog_horizon(self, retention=None):
+        """
+        Move the changelog horizon to retention records behind the latest change
+        
+        The horizon is committed before any record is removed, so a reader
+        whose cursor is behind it reloads instead of missing removed records.
+        
+        Args:
+            retention (int): Number of recent records to keep, defaults to the
+                value given to the constructor
+            
+        Returns:
+            int: New horizon, or None if it did not move
+        """
+        if retention is None:
+            retention = self.changelog_retention
+        
+        horizon = self.latest_change() - retention
+        if horizon <= self.get_changelog_horizon():
+            return None
+        
+        self.set_meta('changelog_horizon', str(horizon))
+        return horizon
+    
+    def delete_pruned_changes(self, horizon, after=0, limit=None):
+        """
+        Remove the change records up to the horizon that a newer record of
+        the same reservation supersedes, in one committed batch
+        
+        Args:
+            horizon (int): Highest sequence number that may be removed
+            after (int): Sequence number the previous batch stopped at
+            limit (int): Most records removed by this batch, None for all
+            
+        Returns:
+            tuple: (records removed, sequence number to pass as after to the
+                next batch); the second value is the horizon once done
+        """
+        prunable = '''
+        seq > ? AND seq <= ?
+        AND (op = 'D' OR seq < (SELECT MAX(seq) FROM reservation_changes AS newer
+                                WHERE newer.reservation_id = reservation_changes.reservation_id))
+        '''
+        
+        # The batch ends at its last removable record, so the next one
+        # starts there instead of scanning the kept records again
+        end = horizon
+        if limit is not None:
+            self.cursor.execute(f'''
+            SELECT seq FROM reservation_changes WHERE {prunable} ORDER BY seq LIMIT 1 OFFSET ?
+            ''', (after, horizon, limit - 1))
+            row = self.cursor.fetchone()
+            if row:
+                end = row[0]
+        
+        self.cursor.execute(f'DELETE FROM reservation_changes WHERE {prunable}', (after, end))
+        removed = self.cursor.rowcount
+        self.commit()
+        
+        return removed, end
+    
+    def record_error(self, operation, error):
+        """
+        Remember why a write method failed
+        
+        Outside transaction() the failed statement's transaction is rolled
+        back, so a write that timed out on the lock does not keep the locks
+        it already holds.
+        
+        Args:
+            operation (str): Name of the write method
+            error (Exception): Exception it caught
+        """
+        self.last_error = OperationError(operation, error_kind(error), str(error))
+        
+        if self.transaction_depth == 0:
+            self.audit.discard()
+            try:
+                self.conn.rollback()
+            except sqlite3.Error:
+                pass
+    
+    @contextmanager
+    def transaction(self, immediate=False):
+        """
+        Group several write methods into one atomic transaction
+        
+        Write methods called inside the block do not commit on their own.
+        Everything is committed when the outermost block ends, or rolled back
+        if it raises.
+        
+        Args:
+            immediate (bool): Take the write lock when the block starts, so
+                rows read inside it cannot be changed by another connection
+                before the block's own writes (read-then-write decisions)
+        """
+        if self.transaction_depth == 0 and not self.conn.in_transaction:
+            # ATTACH is not allowed once the transaction has begun, and new
+            # booking references must not clash with archived ones
+            self.ensure_archive()
+            
+            if immediate:
+                self.cursor.execute('BEGIN IMMEDIATE')
+        
+        self.transaction_depth += 1
+        try:
+            yield self
+            
+            # Audit entries are written last, in the same transaction
+            if self.transaction_depth == 1:
+                self.audit.flush()
+        except Exception:
+            if self.transaction_depth == 1:
+                self.conn.rollback()
+                self.audit.discard()
+            raise
+        else:
+            if self.transaction_depth == 1:
+                self.conn.commit()
+        finally:
+            self.transaction_depth -= 1
+    
+    def commit(self):
+        """Commit the current transaction unless inside transaction()"""
+        if self.transaction_depth == 0:
+            self.audit.flush()
+            self.conn.commit()
+    
+    def clone(self):
+        """
+        Open another connection to the same database
+        
+        Returns:
+            Database: New instance, e.g. for use in a worker thread
+        """
+        return Database(self.db_name, self.changelog_retention, self.archive_name, self.profile,
+                        self.busy_timeout, self.audit.actor)
+    
     def close(self):
         """Close the database connection"""
+        self.prune_changes()
         self.conn.close()
@@ -0,0 +1,248 @@
+"""
+db_profiles.py - SQLite performance profiles
+
+This module defines named sets of connection settings for the database:
+- "safe": rollback journal and synchronous=FULL, survives power loss
+- "balanced": WAL with synchronous=NORMAL, larger cache and memory-mapped I/O
+- "throughput": WAL with synchronous=OFF and large caches, for bulk work
+The profile is chosen by the Database constructor, the FLIGHTS_DB_PROFILE
+environment variable or the [database] section of flights.ini, in that order.
+Without any of them the database keeps the rollback journal and full sync it
+always had: WAL needs shared memory, so it must not be switched on for a file
+opened over a network file system, and is only used when a profile asks for it.
+
+It also provides a calibration command that benchmarks every profile on the
+disk holding the database and recommends the fastest one that still meets
+the configured durability floor.
+
+Usage:
+    python db_profiles.py calibrate
+    python db_profiles.py calibrate --db /data/flights.db --floor balanced --write-config
+"""
+import argparse
+import configparser
+import os
+import time
+
+# Settings applied at connect time. Negative cache_size is in KiB.
+# page_size only takes effect on a new database file.
+PROFILES = {
+    "safe": {
+        "durability": 3,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -8192,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "page_size": 4096,
+        "journal_size_limit": -1,
+    },
+    "balanced": {
+        "durability": 2,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32768,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "page_size": 4096,
+        "journal_size_limit": 64 * 1024 * 1024,
+    },
+    "throughput": {
+        "durability": 1,
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -131072,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "page_size": 8192,
+        "journal_size_limit": 256 * 1024 * 1024,
+    },
+}
+
+# Profile used when none is configured
+DEFAULT_PROFILE = "safe"
+
+# Least durable profile calibrate() may recommend when no floor is configured
+DEFAULT_DURABILITY_FLOOR = "balanced"
+
+# Configuration file read next to the working directory
+CONFIG_FILE = "flights.ini"
+
+def read_config(config_file=CONFIG_FILE):
+    """
+    Read the [database] section of the configuration file
+
+    Args:
+        config_file (str): Path of the configuration file
+
+    Returns:
+        dict: Settings found in the file (empty if there is none)
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    if not config.has_section("database"):
+        return {}
+
+    return dict(config.items("database"))
+
+def resolve_profile(profile=None, config_file=CONFIG_FILE):
+    """
+    Pick the profile name to use
+
+    Args:
+        profile (str): Explicit profile name, takes precedence when given
+        config_file (str): Configuration file to fall back on
+
+    Returns:
+        str: Profile name
+    """
+    name = (
+        profile
+        or os.environ.get("FLIGHTS_DB_PROFILE")
+        or read_config(config_file).get("profile")
+        or DEFAULT_PROFILE
+    )
+
+    if name not in PROFILES:
+        raise ValueError(f"Unknown database profile '{name}', expected one of {', '.join(PROFILES)}")
+
+    return name
+
+def apply_profile(conn, name):
+    """
+    Apply a profile's settings to an open connection
+
+    Args:
+        conn: sqlite3 connection, before any table is created if page_size
+            should take effect
+        name (str): Profile name
+    """
+    settings = PROFILES[name]
+
+    # page_size has to be set before the journal mode switches to WAL
+    conn.execute(f"PRAGMA page_size = {settings['page_size']}")
+
+    # The journal mode is stored in the file; only switch it when the profile
+    # wants another one, as switching takes an exclusive lock
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    if journal_mode.upper() != settings["journal_mode"]:
+        conn.execute(f"PRAGMA journal_mode = {settings['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {settings['synchronous']}")
+    conn.execute(f"PRAGMA cache_size = {settings['cache_size']}")
+    conn.execute(f"PRAGMA mmap_size = {settings['mmap_size']}")
+    conn.execute(f"PRAGMA temp_store = {settings['temp_store']}")
+    conn.execute(f"PRAGMA journal_size_limit = {settings['journal_size_limit']}")
+
+def benchmark_profile(name, directory, writes=200, reads=2000):
+    """
+    Measure booking-like write and read latencies for one profile
+
+    Args:
+        name (str): Profile name
+        directory (str): Directory on the disk to measure
+        writes (int): Number of single-reservation write transactions
+        reads (int): Number of lookups by ID
+
+    Returns:
+        dict: Median and 95th percentile latencies in milliseconds
+    """
+    # Imported here because database.py imports this module, and the app
+    # only needs the profiles, not the benchmark
+    import statistics
+    import tempfile
+    from database import Database
+
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        db = Database(os.path.join(temp_dir, "calibrate.db"), profile=name)
+
+        write_times = []
+        for i in range(writes):
+            start = time.perf_counter()
+            db.add_reservation(f"Passenger {i}", f"FL{i % 50}", "Paris", "Tokyo",
+                               "2030-01-01", f"{i % 30 + 1}{'ABCDEF'[i % 6]}")
+            write_times.append((time.perf_counter() - start) * 1000)
+
+        read_times = []
+        for i in range(reads):
+            start = time.perf_counter()
+            db.get_reservation_by_id(i % writes + 1)
+            db.search_reservations(f"FL{i % 50}")
+            read_times.append((time.perf_counter() - start) * 1000)
+
+        db.close()
+
+    return {
+        "write_p50": statistics.median(write_times),
+        "write_p95": statistics.quantiles(write_times, n=20)[18],
+        "read_p50": statistics.median(read_times),
+        "read_p95": statistics.quantiles(read_times, n=20)[18],
+    }
+
+def calibrate(db_name="flights.db", floor=None, config_file=CONFIG_FILE):
+    """
+    Benchmark every profile and recommend one
+
+    Args:
+        db_name (str): Database whose disk should be measured
+        floor (str): Least durable profile that is acceptable, defaults to
+            durability_floor in the configuration file, then "balanced"
+        config_file (str): Configuration file holding durability_floor
+
+    Returns:
+        tuple: (recommended profile name, dict of results per profile)
+    """
+    floor = floor or read_config(config_file).get("durability_floor") or DEFAULT_DURABILITY_FLOOR
+    min_durability = PROFILES[floor]["durability"]
+
+    directory = os.path.dirname(os.path.abspath(db_name))
+    results = {name: benchmark_profile(name, directory) for name in PROFILES}
+
+    # Lowest booking latency among the profiles that are durable enough
+    candidates = [name for name in PROFILES if PROFILES[name]["durability"] >= min_durability]
+    recommended = min(candidates, key=lambda name: (results[name]["write_p95"],
+                                                    results[name]["read_p95"]))
+
+    return recommended, results
+
+def write_config(profile, config_file=CONFIG_FILE):
+    """Store the chosen profile in the configuration file"""
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    if not config.has_section("database"):
+        config.add_section("database")
+    config.set("database", "profile", profile)
+
+    with open(config_file, "w") as f:
+        config.write(f)
+
+def main():
+    """Run the calibration from the command line"""
+    parser = argparse.ArgumentParser(description="SQLite performance profiles")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = subparsers.add_parser("calibrate", help="Benchmark profiles on this disk")
+    calibrate_parser.add_argument("--db", default="flights.db", help="Database file to calibrate for")
+    calibrate_parser.add_argument("--floor", choices=list(PROFILES),
+                                  help="Least durable profile that is acceptable")
+    calibrate_parser.add_argument("--write-config", action="store_true",
+                                  help=f"Save the recommendation to {CONFIG_FILE}")
+    args = parser.parse_args()
+
+    recommended, results = calibrate(args.db, args.floor)
+
+    print(f"{'Profile':<12}{'write p50':>12}{'write p95':>12}{'read p50':>12}{'read p95':>12}")
+    for name, result in results.items():
+        print(f"{name:<12}"
+              f"{result['write_p50']:>10.2f}ms{result['write_p95']:>10.2f}ms"
+              f"{result['read_p50']:>10.2f}ms{result['read_p95']:>10.2f}ms")
+
+    print(f"\nRecommended profile: {recommended}")
+
+    if args.write_config:
+        write_config(recommended)
+        print(f"Saved to {CONFIG_FILE}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+dedup.py - Find and merge duplicate reservations
+
+This module cleans up reservations that were entered more than once:
+- Normalizes name, flight, route and date so that differences in spacing,
+  case or accents do not hide duplicates
+- Groups exact duplicates by their normalized fields, using an index in a
+  scratch SQLite file so large tables do not have to fit in memory
+- Optionally finds near duplicates ("Jon Smith" / "John Smith") by comparing
+  names only within blocks of the same flight, date and name initials,
+  instead of comparing every pair of reservations
+- Writes a merge plan that can be reviewed, then applied in one transaction
+
+Usage:
+    python dedup.py plan merge_plan.json
+    python dedup.py plan merge_plan.json --similarity 0.9
+    python dedup.py apply merge_plan.json
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+from database import Database
+from validation import normalize_date, ValidationError
+
+# Rows read from the database per batch
+BATCH_SIZE = 10000
+
+# Largest block compared pairwise for near duplicates
+MAX_BLOCK_SIZE = 200
+
+def normalize_key_text(value):
+    """
+    Reduce text to a comparison form: no accents, punctuation or case
+
+    Args:
+        value (str): Raw text
+
+    Returns:
+        str: Normalized text, words separated by single spaces
+    """
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    value = "".join(char if char.isalnum() else " " for char in value.casefold())
+
+    return " ".join(value.split())
+
+@lru_cache(maxsize=65536)
+def normalize_key_date(date):
+    """
+    Convert a date to YYYY-MM-DD, cached because dates repeat across rows
+
+    Args:
+        date (str): Raw date
+
+    Returns:
+        str: ISO date, or the trimmed input if it cannot be parsed
+    """
+    try:
+        return normalize_date(date)
+    except ValidationError:
+        return str(date).strip()
+
+def reservation_key(row):
+    """
+    Normalize the fields that identify a booking
+
+    Args:
+        row (tuple): Reservation tuple
+
+    Returns:
+        tuple: (name, flight_number, departure, destination, date)
+    """
+    return (
+        normalize_key_text(row[1]),
+        "".join(str(row[2]).split()).upper(),
+        normalize_key_text(row[3]),
+        normalize_key_text(row[4]),
+        normalize_key_date(row[5]),
+    )
+
+def find_duplicates(db, similarity=None):
+    """
+    Build a merge plan for duplicate reservations
+
+    The normalized keys are spilled to a scratch SQLite file with an index
+    on the key and on the block, so exact duplicates are grouped and near
+    duplicates compared one block at a time, and memory use does not grow
+    with the number of reservations.
+
+    Args:
+        db: Reservation store
+        similarity (float): Minimum name similarity (0-1) for near duplicates,
+            or None to only report exact duplicates
+
+    Returns:
+        list: Groups as dicts with keep (row), remove (rows), reason and score
+    """
+    plan = []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scratch = sqlite3.connect(os.path.join(temp_dir, "dedup.db"))
+        try:
+            # Nothing here needs to survive a crash
+            scratch.execute("PRAGMA journal_mode = OFF")
+            scratch.execute("PRAGMA synchronous = OFF")
+            scratch.execute('''
+            CREATE TABLE rows (
+                id INTEGER PRIMARY KEY,
+                name TEXT, flight_number TEXT, departure TEXT, destination TEXT, date TEXT, seat_number TEXT,
+                key TEXT, block TEXT, key_name TEXT
+            )
+            ''')
+
+            for batch in db.iter_reservations(BATCH_SIZE):
+                staged = []
+                for row in batch:
+                    key = reservation_key(row)
+                    name, flight_number, departure, destination, date = key
+                    initials = "".join(sorted(word[0] for word in name.split()))
+                    block = "\x1f".join((flight_number, date, departure, destination, initials))
+                    staged.append(tuple(row[:7]) + ("\x1f".join(key), block, name))
+                scratch.executemany("INSERT INTO rows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", staged)
+
+            scratch.execute("CREATE INDEX rows_key ON rows (key, id)")
+
+            # Exact duplicates: every row with a key seen before, grouped
+            # under the first reservation holding it
+            groups = scratch.execute('''
+            SELECT first.keep_id, rows.id, rows.name, rows.flight_number, rows.departure,
+                   rows.destination, rows.date, rows.seat_number
+            FROM rows
+            JOIN (SELECT key, MIN(id) AS keep_id FROM rows GROUP BY key HAVING COUNT(*) > 1) AS first
+                USING (key)
+            ORDER BY first.keep_id, rows.id
+            ''')
+            group = None
+            for keep_id, *row in groups:
+                if row[0] == keep_id:
+                    group = {"keep": row, "remove": [], "reason": "exact", "score": 1.0}
+                    plan.append(group)
+                else:
+                    group["remove"].append(row)
+
+            if similarity is not None:
+                scratch.execute("CREATE INDEX rows_block ON rows (block, id)")
+
+                # Near duplicates among the first reservation of every key,
+                # one block in memory at a time
+                survivors = scratch.execute('''
+                SELECT block, key_name, id, name, flight_number, departure, destination, date, seat_number
+                FROM rows
+                WHERE id IN (SELECT MIN(id) FROM rows GROUP BY key)
+                ORDER BY block, id
+                ''')
+                for _, members in itertools.groupby(survivors, key=lambda survivor: survivor[0]):
+                    members = [(survivor[1], survivor[2:]) for survivor in members]
+                    if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+                        continue
+                    plan.extend(similar_groups(members, similarity))
+        finally:
+            scratch.close()
+
+    return plan
+
+def similar_groups(members, similarity):
+    """
+    Group reservations in one block whose names are similar
+
+    Args:
+        members (list): (normalized name, row) pairs, in ID order
+        similarity (float): Minimum similarity ratio
+
+    Returns:
+        list: Merge plan groups
+    """
+    groups = []
+    merged = set()
+
+    for i, (name, keep) in enumerate(members):
+        if keep[0] in merged:
+            continue
+
+        matcher = SequenceMatcher(None, name)
+        duplicates = []
+        best = 0.0
+
+        for other_name, other in members[i + 1:]:
+            if other[0] in merged:
+                continue
+
+            matcher.set_seq2(other_name)
+            # quick_ratio is an upper bound and much cheaper than ratio
+            if matcher.quick_ratio() < similarity:
+                continue
+
+            score = matcher.ratio()
+            if score >= similarity:
+                duplicates.append(list(other))
+                merged.add(other[0])
+                best = max(best, score)
+
+        if duplicates:
+            groups.append({
+                "keep": list(keep),
+                "remove": duplicates,
+                "reason": "similar",
+                "score": round(best, 3),
+            })
+
+    return groups
+
+def apply_plan(db, plan):
+    """
+    Delete the duplicates listed in a merge plan, in one transaction
+
+    A reservation is only deleted if it still holds exactly the values
+    recorded in the plan, and a group is only applied if the reservation it
+    keeps is still there unchanged, so edits made after review are never
+    lost and no booking loses every copy.
+
+    Args:
+        db: Database instance
+        plan (list): Merge plan from find_duplicates()
+
+    Returns:
+        tuple: (number deleted, number skipped because they or the kept
+            reservation changed)
+    """
+    deleted = 0
+    skipped = 0
+
+    with db.transaction():
+        for group in plan:
+            keep = db.get_reservation_by_id(group["keep"][0])
+            if keep is None or list(keep) != group["keep"]:
+                skipped += len(group["remove"])
+                continue
+
+            for row in group["remove"]:
+                current = db.get_reservation_by_id(row[0])
+                if current is None or list(current) != row:
+                    skipped += 1
+                    continue
+
+                if not db.delete_reservation(row[0]):
+                    raise RuntimeError(f"could not delete reservation {row[0]}")
+                deleted += 1
+
+    return deleted, skipped
+
+def main():
+    """Plan or apply a duplicate merge from the command line"""
+    parser = argparse.ArgumentParser(description="Find and merge duplicate reservations")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    plan_parser = subparsers.add_parser("plan", help="Write a merge plan for review")
+    plan_parser.add_argument("plan", help="Output JSON file")
+    plan_parser.add_argument("--similarity", type=float,
+                             help="Also report near duplicates with at least this name similarity (0-1)")
+    apply_parser = subparsers.add_parser("apply", help="Apply a reviewed merge plan")
+    apply_parser.add_argument("plan", help="Merge plan JSON file")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    if args.command == "plan":
+        plan = find_duplicates(db, args.similarity)
+        with open(args.plan, "w", encoding="utf-8") as f:
+            json.dump(plan, f, indent=1, ensure_ascii=False)
+
+        removals = sum(len(group["remove"]) for group in plan)
+        print(f"{len(plan)} duplicate groups, {removals} reservations to remove. "
+              f"Review {args.plan}, then run: python dedup.py apply {args.plan}")
+    else:
+        with open(args.plan, encoding="utf-8") as f:
+            plan = json.load(f)
+
+        try:
+            deleted, skipped = apply_plan(db, plan)
+            print(f"Deleted {deleted} duplicates, skipped {skipped} that changed since the plan.")
+        except Exception as e:
+            print(f"Error applying merge plan, nothing was changed: {e}")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ This module allows users to:
 import tkinter as tk
 from tkinter import ttk, messagebox
 
+from metrics import instrumented
+
 class EditReservationPage:
     def __init__(self, root, db, go_to_reservations):
         """
@@ -16,7 +18,7 @@ class EditReservationPage:
 
         Args:
             root: The main Tkinter window
-            db: Database instance
+            db: Reservation store (see storage.py)
             go_to_reservations: Function to return to reservations page
         """
         self.root = root
@@ -37,6 +39,9 @@ class EditReservationPage:
         header_frame = tk.Frame(self.frame, bg="#0288d1", height=60)
         header_frame.pack(fill=tk.X)
         
+        # Kept so main.py can add the booking reference lookup
+        self.header_frame = header_frame
+        
         # Add plane icon and app name to header with a more professional look
         icon_text = "✈"  # Clean plane icon
         icon_label = tk.Label(
@@ -95,14 +100,14 @@ class EditReservationPage:
         title_frame = tk.Frame(content_frame, bg="white")
         title_frame.pack(fill=tk.X, padx=40, pady=(40, 20))
         
-        title_label = tk.Label(
+        self.title_label = tk.Label(
             title_frame,
             text="Edit Reservation",
             font=("Arial", 24, "bold"),
             fg="#0288d1",
             bg="white"
         )
-        title_label.pack(anchor=tk.W)
+        self.title_label.pack(anchor=tk.W)
         
         # Create a card-like form with a shadow effect
         form_card_shadow = tk.Frame(
@@ -314,6 +319,10 @@ class EditReservationPage:
             self.go_to_reservations()
             return
         
+        # Show the booking reference the customer quotes
+        booking_ref = self.db.get_booking_ref(reservation_id) if hasattr(self.db, "get_booking_ref") else None
+        self.title_label.config(text=f"Edit Reservation {booking_ref}" if booking_ref else "Edit Reservation")
+        
         # Fill form fields with reservation details
         # Expected order: id, name, flight_number, departure, destination, date, seat
         self.name_entry.delete(0, tk.END)
@@ -334,6 +343,7 @@ class EditReservationPage:
         self.seat_entry.delete(0, tk.END)
         self.seat_entry.insert(0, reservation[6])
     
+    @instrumented("ui", "edit_reservation.update_reservation")
     def update_reservation(self):
         """Save changes to the reservation"""
         # Validate all fields
@@ -360,11 +370,21 @@ class EditReservationPage:
         )
         
         if success:
-            messagebox.showinfo("Success", "Reservation updated successfully")
+            message = "Reservation updated successfully"
+            # Tell the agent when the freed seat went to a waitlisted passenger
+            promotion = getattr(self.db, "last_promotion", None)
+            if promotion:
+                message += f"\n\nSeat {promotion[3]} was given to {promotion[2]} from the waitlist."
+            messagebox.showinfo("Success", message)
             self.go_to_reservations()
         else:
-            messagebox.showerror("Error", "Failed to update reservation")
+            error = getattr(self.db, "last_error", None)
+            if error and error.kind == "capacity":
+                messagebox.showerror("Flight Full", f"{error.message}. The reservation was not changed.")
+            else:
+                messagebox.showerror("Error", "Failed to update reservation")
     
+    @instrumented("ui", "edit_reservation.delete_reservation")
     def delete_reservation(self):
         """Delete the current reservation"""
         # Confirm deletion
@@ -377,7 +397,12 @@ class EditReservationPage:
             success = self.db.delete_reservation(self.reservation_id)
             
             if success:
-                messagebox.showinfo("Success", "Reservation deleted successfully")
+                message = "Reservation deleted successfully"
+                # Tell the agent when the freed seat went to a waitlisted passenger
+                promotion = getattr(self.db, "last_promotion", None)
+                if promotion:
+                    message += f"\n\nSeat {promotion[3]} was given to {promotion[2]} from the waitlist."
+                messagebox.showinfo("Success", message)
                 self.go_to_reservations()
             else:
                 messagebox.showerror("Error", "Failed to delete reservation")
@@ -0,0 +1,177 @@
+"""
+exporters.py - Export reservations to files
+
+This module writes reservations out of the database:
+- CSV and JSON Lines exports of all reservations
+- Printable passenger manifests per flight and date, sorted by seat
+Rows are streamed from the database in fixed-size batches, so memory use does
+not depend on the number of reservations. Every export reports progress and
+can be cancelled.
+
+Usage:
+    python exporters.py csv reservations.csv
+    python exporters.py jsonl reservations.jsonl --include-archive
+    python exporters.py manifest manifest.txt --flight FL100 --date 2025-10-15
+    python exporters.py manifest manifests.txt
+"""
+import argparse
+import csv
+import json
+
+from database import Database
+
+# Rows fetched from the database per batch
+DEFAULT_BATCH_SIZE = 5000
+
+# Column names used as CSV header and JSON keys
+EXPORT_FIELDS = ("id", "name", "flight_number", "departure", "destination", "date", "seat_number")
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled"""
+
+def export_csv(db, path, batch_size=DEFAULT_BATCH_SIZE, include_archive=False,
+               progress=None, cancel_event=None):
+    """
+    Export reservations to a CSV file
+
+    Args:
+        db: Database instance
+        path (str): Output file
+        batch_size (int): Rows fetched and written per batch
+        include_archive (bool): Also export archived reservations
+        progress: Optional function called with the number of rows written
+        cancel_event: Optional threading.Event that cancels the export when set
+
+    Returns:
+        int: Number of rows written
+    """
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_FIELDS)
+
+        written = 0
+        for batch in db.iter_reservations(batch_size, include_archive):
+            check_cancelled(cancel_event)
+            writer.writerows(batch)
+            written += len(batch)
+            if progress:
+                progress(written)
+
+    return written
+
+def export_jsonl(db, path, batch_size=DEFAULT_BATCH_SIZE, include_archive=False,
+                 progress=None, cancel_event=None):
+    """
+    Export reservations to a JSON Lines file, one object per reservation
+
+    Args:
+        db: Database instance
+        path (str): Output file
+        batch_size (int): Rows fetched and written per batch
+        include_archive (bool): Also export archived reservations
+        progress: Optional function called with the number of rows written
+        cancel_event: Optional threading.Event that cancels the export when set
+
+    Returns:
+        int: Number of rows written
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        for batch in db.iter_reservations(batch_size, include_archive):
+            check_cancelled(cancel_event)
+            f.write("".join(dumps(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in batch))
+            written += len(batch)
+            if progress:
+                progress(written)
+
+    return written
+
+def export_manifest(db, path, flight_number=None, date=None, progress=None, cancel_event=None):
+    """
+    Write printable passenger manifests, sorted by seat
+
+    Args:
+        db: Database instance
+        path (str): Output file
+        flight_number (str): Flight to print, or None for every flight
+        date (str): Flight date, required when flight_number is given
+        progress: Optional function called with the number of passengers written
+        cancel_event: Optional threading.Event that cancels the export when set
+
+    Returns:
+        int: Number of passengers written
+    """
+    if flight_number:
+        flights = [(flight_number, date)]
+    else:
+        # One passenger query per flight keeps memory bounded by the largest flight
+        flights = [(flight[0], flight[1]) for flight in db.get_flights()]
+
+    with open(path, "w", encoding="utf-8") as f:
+        written = 0
+        for flight_number, date in flights:
+            check_cancelled(cancel_event)
+
+            passengers = db.get_flight_passengers(flight_number, date)
+            if not passengers:
+                continue
+
+            departure, destination = passengers[0][3], passengers[0][4]
+            f.write(f"PASSENGER MANIFEST - {flight_number} - {date}\n")
+            f.write(f"{departure} -> {destination}    Passengers: {len(passengers)}\n")
+            f.write("=" * 60 + "\n")
+            f.write(f"{'Seat':<8}{'Passenger Name':<40}{'Ref':>12}\n")
+            f.write("-" * 60 + "\n")
+            # Agents and gate staff know a booking by its reference, not its ID
+            f.writelines(f"{res[6]:<8}{res[1]:<40}{res[7] or '':>12}\n" for res in passengers)
+            # Form feed starts each flight on a new printed page
+            f.write("\n\f")
+
+            written += len(passengers)
+            if progress:
+                progress(written)
+
+    return written
+
+def check_cancelled(cancel_event):
+    """Raise ExportCancelled if the cancel event is set"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise ExportCancelled()
+
+def main():
+    """Run an export from the command line"""
+    parser = argparse.ArgumentParser(description="Export reservations")
+    parser.add_argument("format", choices=("csv", "jsonl", "manifest"), help="Export format")
+    parser.add_argument("output", help="Output file")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Rows fetched per batch")
+    parser.add_argument("--include-archive", action="store_true",
+                        help="Also export archived reservations")
+    parser.add_argument("--flight", help="Flight number for a single manifest")
+    parser.add_argument("--date", help="Flight date for a single manifest (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.flight and not args.date:
+        parser.error("--flight requires --date")
+
+    db = Database(args.db)
+
+    def report(count):
+        print(f"\rExported {count} rows...", end="", flush=True)
+
+    if args.format == "csv":
+        count = export_csv(db, args.output, args.batch_size, args.include_archive, report)
+    elif args.format == "jsonl":
+        count = export_jsonl(db, args.output, args.batch_size, args.include_archive, report)
+    else:
+        count = export_manifest(db, args.output, args.flight, args.date, report)
+
+    db.close()
+
+    print(f"\nDone. {count} rows written to {args.output}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+fares.py - Fare quotes by flight, date and passenger type
+
+A quote starts from the base fare of the scheduled flight (flights.fare) and
+is adjusted by:
+- the passenger type (adult, child, infant, senior), a share of the fare
+- the load factor of the flight (seats booked / capacity), in bands: seats
+  are cheaper on empty flights and dearer as the flight fills up
+
+Both tables can be changed in the [fares] and [fare_bands] sections of
+flights.ini, e.g.
+
+    [fares]
+    child = 0.7
+
+    [fare_bands]
+    0.9 = 1.4
+
+The rules are compiled once per version of the file. FareEngine keeps the
+base fare, capacity and bookings of recently quoted flights in an LRU cache
+that is dropped whenever the reservation or schedule changelog moves, so a
+booking anywhere is priced in at the next quote. quote_batch() prices many
+flight/date/passenger combinations with one query for the flights not in the
+cache, for bulk repricing.
+
+Usage:
+    python fares.py quote FL100 2025-10-15 --type child
+    python fares.py benchmark --flights 2000 --quotes 100000
+"""
+import argparse
+import bisect
+import configparser
+import os
+import time
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+
+from db_profiles import CONFIG_FILE
+
+# Share of the fare paid by each passenger type
+PASSENGER_TYPES = {
+    "adult": 1.0,
+    "child": 0.75,
+    "infant": 0.1,
+    "senior": 0.9,
+}
+
+DEFAULT_PASSENGER_TYPE = "adult"
+
+# (lowest load factor, fare multiplier) of each band, by load factor
+LOAD_FACTOR_BANDS = (
+    (0.0, 0.9),
+    (0.5, 1.0),
+    (0.8, 1.25),
+    (0.95, 1.5),
+)
+
+# Flights whose fare inputs are kept by FareEngine
+CACHED_FLIGHTS = 4096
+
+# Rules ready for pricing: passenger type -> multiplier, and the band floors
+# and multipliers as parallel tuples for bisect
+FareRules = namedtuple("FareRules", "passenger_types band_floors band_multipliers")
+
+# One priced combination; multiplier is the passenger type times the band
+Quote = namedtuple("Quote", "flight_number date passenger_type base_fare load_factor multiplier price")
+
+class FareError(Exception):
+    """Raised for an unknown passenger type or invalid fare rules"""
+
+def compile_rules(passenger_types=None, bands=None):
+    """
+    Check fare tables and turn them into FareRules
+
+    Args:
+        passenger_types (dict): Passenger type -> share of the fare,
+            defaults to PASSENGER_TYPES
+        bands (iterable): (lowest load factor, multiplier) pairs, defaults to
+            LOAD_FACTOR_BANDS
+
+    Returns:
+        FareRules: Compiled rules
+
+    Raises:
+        FareError: If a value is negative or no band starts at load factor 0
+    """
+    passenger_types = dict(PASSENGER_TYPES if passenger_types is None else passenger_types)
+    bands = sorted(LOAD_FACTOR_BANDS if bands is None else bands)
+
+    if not bands or bands[0][0] > 0:
+        raise FareError("The first load factor band must start at 0")
+    if any(value < 0 for value in passenger_types.values()) or any(multiplier < 0 for _, multiplier in bands):
+        raise FareError("Fare multipliers cannot be negative")
+
+    return FareRules(
+        passenger_types,
+        tuple(floor for floor, _ in bands),
+        tuple(multiplier for _, multiplier in bands),
+    )
+
+@lru_cache(maxsize=8)
+def compile_config(config_file, modified):
+    """
+    Compile the fare tables of a configuration file
+
+    Args:
+        config_file (str): Path of the configuration file
+        modified (float): Modification time of the file, part of the cache
+            key so an edited file is compiled again
+
+    Returns:
+        FareRules: Default tables with the file's [fares] and [fare_bands] applied
+    """
+    config = configparser.ConfigParser()
+    config.read(config_file)
+
+    passenger_types = dict(PASSENGER_TYPES)
+    bands = dict(LOAD_FACTOR_BANDS)
+
+    try:
+        if config.has_section("fares"):
+            passenger_types.update((name, float(value)) for name, value in config.items("fares"))
+        if config.has_section("fare_bands"):
+            bands.update((float(floor), float(value)) for floor, value in config.items("fare_bands"))
+    except ValueError as e:
+        raise FareError(f"Invalid fare table in {config_file}: {e}") from e
+
+    return compile_rules(passenger_types, bands.items())
+
+def load_rules(config_file=CONFIG_FILE):
+    """
+    Get the fare rules, compiled again only when the file changed
+
+    Args:
+        config_file (str): Configuration file holding [fares] and [fare_bands]
+
+    Returns:
+        FareRules: Compiled rules
+    """
+    try:
+        modified = os.path.getmtime(config_file)
+    except OSError:
+        modified = None
+
+    return compile_config(config_file, modified)
+
+def load_factor(capacity, booked):
+    """
+    Share of the seats booked
+
+    Args:
+        capacity (int): Seats on the flight
+        booked (int): Seats booked
+
+    Returns:
+        float: booked / capacity, 1.0 for a flight without seats
+    """
+    return booked / capacity if capacity > 0 else 1.0
+
+def fare_multiplier(rules, factor, passenger_type):
+    """
+    Multiplier of the base fare
+
+    Args:
+        rules (FareRules): Compiled rules
+        factor (float): Load factor of the flight
+        passenger_type (str): Passenger type
+
+    Returns:
+        float: Passenger type share times the load factor band multiplier
+
+    Raises:
+        FareError: If the passenger type is unknown
+    """
+    try:
+        share = rules.passenger_types[passenger_type]
+    except KeyError:
+        raise FareError(f"Unknown passenger type: {passenger_type}") from None
+
+    return share * rules.band_multipliers[bisect.bisect_right(rules.band_floors, factor) - 1]
+
+class FareEngine:
+    def __init__(self, db, rules=None, max_flights=CACHED_FLIGHTS):
+        """
+        Initialize the engine
+
+        Args:
+            db: Reservation store with get_fare_inputs
+            rules (FareRules): Fare rules, defaults to load_rules()
+            max_flights (int): Number of flights kept, least recently quoted
+                flights are dropped first
+        """
+        self.db = db
+        self.rules = rules or load_rules()
+        self.max_flights = max_flights
+        self.flights = OrderedDict()
+        self.cursor = None
+
+    def refresh(self):
+        """Drop the cached flights if a reservation or the schedule changed since they were read"""
+        latest = (self.db.latest_change(), self.db.latest_flight_change())
+        if latest != self.cursor:
+            self.flights.clear()
+            self.cursor = latest
+
+    def fetch(self, keys):
+        """
+        Get the fare inputs of flights, reading the missing ones in one query
+
+        Args:
+            keys (iterable): (flight_number, date) pairs
+
+        Returns:
+            dict: (flight_number, date) -> (fare, capacity, booked), or None
+                if the flight is not scheduled
+        """
+        found = {}
+        missing = []
+
+        for key in set(keys):
+            if key in self.flights:
+                self.flights.move_to_end(key)
+                found[key] = self.flights[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            loaded = dict.fromkeys(missing)
+            for flight_number, date, fare, capacity, booked in self.db.get_fare_inputs(missing):
+                loaded[(flight_number, date)] = (fare, capacity, booked)
+
+            found.update(loaded)
+            self.flights.update(loaded)
+            while len(self.flights) > self.max_flights:
+                self.flights.popitem(last=False)
+
+        return found
+
+    def price(self, flight_number, date, passenger_type, inputs):
+        """
+        Price one combination from its fare inputs
+
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            passenger_type (str): Passenger type
+            inputs (tuple): (fare, capacity, booked) from fetch(), or None
+
+        Returns:
+            Quote: The quote, or None if the flight is not scheduled
+        """
+        if inputs is None:
+            return None
+
+        fare, capacity, booked = inputs
+        factor = load_factor(capacity, booked)
+        multiplier = fare_multiplier(self.rules, factor, passenger_type)
+
+        return Quote(flight_number, date, passenger_type, fare, factor, multiplier, round(fare * multiplier, 2))
+
+    def quote(self, flight_number, date, passenger_type=DEFAULT_PASSENGER_TYPE):
+        """
+        Price one passenger on one flight
+
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+            passenger_type (str): One of the passenger types of the rules
+
+        Returns:
+            Quote: The quote, or None if the flight is not scheduled
+
+        Raises:
+            FareError: If the passenger type is unknown
+        """
+        self.refresh()
+        key = (flight_number, date)
+
+        return self.price(flight_number, date, passenger_type, self.fetch([key])[key])
+
+    def quote_batch(self, requests):
+        """
+        Price many combinations against one snapshot of the bookings
+
+        Args:
+            requests (list): (flight_number, date, passenger_type) tuples
+
+        Returns:
+            list: Quote, or None for flights that are not scheduled, in the
+                order of the requests
+
+        Raises:
+            FareError: If a passenger type is unknown
+        """
+        requests = list(requests)
+
+        self.refresh()
+        inputs = self.fetch((flight_number, date) for flight_number, date, _ in requests)
+
+        return [self.price(flight_number, date, passenger_type, inputs[(flight_number, date)])
+                for flight_number, date, passenger_type in requests]
+
+def benchmark_quotes(flights=2000, quotes=100000, profile=None):
+    """
+    Measure bulk repricing on a generated schedule
+
+    Args:
+        flights (int): Scheduled flights, each partly booked
+        quotes (int): Combinations priced per batch
+        profile (str): Database performance profile
+
+    Returns:
+        dict: cold and warm seconds (first batch reads every flight, the
+            second is served from the cache) and quotes per second of each
+    """
+    # Imported here so the booking page does not load them at startup
+    import random
+    import tempfile
+    from database import Database
+
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "fares.db"), profile=profile)
+
+        schedule = [(f"FL{number:04d}", f"2030-01-{number % 28 + 1:02d}") for number in range(flights)]
+        with db.transaction():
+            for flight_number, date in schedule:
+                db.add_flight(flight_number, "Paris", "London", date, rng.randint(80, 400), capacity=100)
+        db.add_reservations([
+            (f"Passenger {seat}", flight_number, "Paris", "London", date, f"{seat}A")
+            for flight_number, date in schedule for seat in range(rng.randint(0, 99))
+        ])
+
+        requests = [schedule[rng.randrange(flights)] + (rng.choice(tuple(PASSENGER_TYPES)),)
+                    for _ in range(quotes)]
+
+        engine = FareEngine(db, rules=compile_rules(), max_flights=max(CACHED_FLIGHTS, flights))
+        times = []
+        for _ in range(2):
+            start = time.perf_counter()
+            engine.quote_batch(requests)
+            times.append(time.perf_counter() - start)
+
+        db.close()
+
+    return {
+        "cold": times[0],
+        "warm": times[1],
+        "cold_per_second": quotes / times[0],
+        "warm_per_second": quotes / times[1],
+    }
+
+def main():
+    """Quote a fare or run the repricing benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Fare quotes")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quote_parser = subparsers.add_parser("quote", help="Price one passenger on a flight")
+    quote_parser.add_argument("flight_number")
+    quote_parser.add_argument("date")
+    quote_parser.add_argument("--type", default=DEFAULT_PASSENGER_TYPE, help="Passenger type")
+
+    bench_parser = subparsers.add_parser("benchmark", help="Measure bulk repricing")
+    bench_parser.add_argument("--flights", type=int, default=2000, help="Scheduled flights")
+    bench_parser.add_argument("--quotes", type=int, default=100000, help="Combinations per batch")
+    bench_parser.add_argument("--profile", help="Database performance profile")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        result = benchmark_quotes(args.flights, args.quotes, args.profile)
+        print(f"{args.quotes:,} quotes: first batch {result['cold']:.2f}s "
+              f"({result['cold_per_second']:,.0f}/s), cached {result['warm']:.2f}s "
+              f"({result['warm_per_second']:,.0f}/s)")
+        return
+
+    from database import Database
+
+    db = Database(args.db)
+
+    try:
+        quote = FareEngine(db).quote(args.flight_number, args.date, args.type)
+        if quote is None:
+            print(f"{args.flight_number} on {args.date} is not scheduled")
+        else:
+            print(f"{quote.flight_number} {quote.date} {quote.passenger_type}: {quote.price:.2f} "
+                  f"(base {quote.base_fare:.2f} x {quote.multiplier:.2f}, {quote.load_factor:.0%} booked)")
+    except FareError as e:
+        print(f"Error: {e}")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+group_booking.py - Book a group of passengers on adjacent seats
+
+This module books families and tour groups in one step:
+- Reads the flight's taken seats and picks the best block of adjacent free
+  seats (see seatmap.allocate_block)
+- Inserts every reservation of the group in one transaction, so either the
+  whole group is booked or nobody is
+- With the SQLite database the write lock is taken before the seats are
+  read, so no other booking can take one of the chosen seats in between
+"""
+from seatmap import allocate_block, flight_layout
+
+class GroupBookingError(Exception):
+    """Raised when a group cannot be booked; nothing was saved"""
+
+def book_group(db, names, flight_number, departure, destination, date):
+    """
+    Book several passengers on adjacent seats of one flight
+
+    Args:
+        db: Reservation store
+        names (list): Passenger names, in the order seats are handed out
+        flight_number (str): Flight identifier
+        departure (str): Departure location
+        destination (str): Destination location
+        date (str): Flight date
+
+    Returns:
+        list: (name, seat number) pairs of the booked passengers
+
+    Raises:
+        GroupBookingError: If there are not enough free seats or the
+            reservations could not be saved
+    """
+    names = [name.strip() for name in names if name.strip()]
+    if not names:
+        raise GroupBookingError("The group has no passengers")
+
+    layout = flight_layout(db, flight_number, date)
+
+    def allocate_and_insert():
+        seats = allocate_block(layout, db.get_occupied_seats(flight_number, date), len(names))
+        if seats is None:
+            raise GroupBookingError(f"Not enough free seats on {flight_number} for {len(names)} passengers")
+
+        if not db.add_reservations([
+            (name, flight_number, departure, destination, date, seat)
+            for name, seat in zip(names, seats)
+        ]):
+            error = getattr(db, "last_error", None)
+            if error and error.kind == "capacity":
+                raise GroupBookingError(error.message)
+            raise GroupBookingError("The reservations could not be saved")
+
+        return list(zip(names, seats))
+
+    # Stores without transactions still insert the group atomically in
+    # add_reservations, but cannot lock out other bookings while choosing
+    if not hasattr(db, "transaction"):
+        return allocate_and_insert()
+
+    with db.transaction(immediate=True):
+        return allocate_and_insert()
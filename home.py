@@ -6,27 +6,41 @@ It displays options to:
 - Book a new flight
 - View existing reservations
 - Exit the application
+It also shows a live dashboard of booking figures.
 """
 import tkinter as tk
 from tkinter import ttk
+import datetime
+
+from metrics import instrumented
 
 class HomePage:
-    def __init__(self, root, show_booking_page, show_reservations_page):
+    # How often the dashboard checks for changes while visible
+    REFRESH_INTERVAL_MS = 5000
+    
+    def __init__(self, root, db, show_booking_page, show_reservations_page):
         """
         Initialize the home page
         
         Args:
             root: The main Tkinter window
+            db: Reservation store (see storage.py)
             show_booking_page: Function to display the booking page
             show_reservations_page: Function to display the reservations page
         """
         self.root = root
+        self.db = db
         self.frame = tk.Frame(root)
         
         # Store callback functions
         self.show_booking_page = show_booking_page
         self.show_reservations_page = show_reservations_page
         
+        # Changelog cursor and date the dashboard was last computed for
+        self.dashboard_cursor = None
+        self.dashboard_day = None
+        self.refresh_job = None
+        
         # Create and place UI elements
         self.create_widgets()
     
@@ -37,6 +51,9 @@ class HomePage:
         header_frame = tk.Frame(self.frame, bg="#0288d1", height=60)
         header_frame.pack(fill=tk.X)
         
+        # Kept so main.py can add the booking reference lookup
+        self.header_frame = header_frame
+        
         # Add plane icon and app name to header with a more professional look
         icon_text = "✈"  # Clean plane icon
         icon_label = tk.Label(
@@ -96,7 +113,7 @@ class HomePage:
             bg="white",
             fg="#0288d1"
         )
-        title_label.pack(pady=(20, 10))
+        title_label.pack(pady=(10, 5))
         
         # Subtitle
         subtitle_label = tk.Label(
@@ -107,11 +124,11 @@ class HomePage:
             fg="#555555",
             wraplength=600
         )
-        subtitle_label.pack(pady=(0, 30))
+        subtitle_label.pack(pady=(0, 10))
         
         # Create a frame for the two cards
         cards_frame = tk.Frame(content_frame, bg="white")
-        cards_frame.pack(fill=tk.X, padx=20, pady=20)
+        cards_frame.pack(fill=tk.X, padx=20, pady=10)
         
         # Left card - Book a Flight - Add shadow effect with frame
         book_card_shadow = tk.Frame(cards_frame, bg="#dddddd")
@@ -221,11 +238,155 @@ class HomePage:
             command=self.show_reservations_page
         )
         view_button.pack()
+        
+        # Dashboard with live booking figures
+        self.create_dashboard(content_frame)
+    
+    def create_dashboard(self, parent):
+        """Create the dashboard widgets below the navigation cards"""
+        dashboard_frame = tk.Frame(parent, bg="white")
+        dashboard_frame.pack(fill=tk.BOTH, expand=True, padx=30, pady=(10, 0))
+        dashboard_frame.columnconfigure(0, weight=1)
+        dashboard_frame.columnconfigure(1, weight=2)
+        dashboard_frame.columnconfigure(2, weight=3)
+        
+        # Headline figures
+        stats_frame = tk.Frame(dashboard_frame, bg="white")
+        stats_frame.grid(row=0, column=0, sticky=tk.NSEW, padx=(0, 10))
+        
+        self.bookings_today_label = tk.Label(
+            stats_frame,
+            text="0",
+            font=("Arial", 24, "bold"),
+            bg="white",
+            fg="#0288d1"
+        )
+        self.bookings_today_label.pack(anchor=tk.W)
+        
+        tk.Label(
+            stats_frame,
+            text="Bookings today",
+            font=("Arial", 10),
+            bg="white",
+            fg="#555555"
+        ).pack(anchor=tk.W)
+        
+        self.total_bookings_label = tk.Label(
+            stats_frame,
+            text="0",
+            font=("Arial", 16, "bold"),
+            bg="white",
+            fg="#0288d1"
+        )
+        self.total_bookings_label.pack(anchor=tk.W, pady=(10, 0))
+        
+        tk.Label(
+            stats_frame,
+            text="Total bookings",
+            font=("Arial", 10),
+            bg="white",
+            fg="#555555"
+        ).pack(anchor=tk.W)
+        
+        # Top routes
+        routes_frame = tk.Frame(dashboard_frame, bg="white")
+        routes_frame.grid(row=0, column=1, sticky=tk.NSEW, padx=10)
+        
+        tk.Label(
+            routes_frame,
+            text="Top Routes",
+            font=("Arial", 11, "bold"),
+            bg="white",
+            fg="#0288d1"
+        ).pack(anchor=tk.W)
+        
+        self.routes_tree = ttk.Treeview(
+            routes_frame,
+            columns=("route", "bookings"),
+            show="headings",
+            height=5
+        )
+        self.routes_tree.heading("route", text="Route")
+        self.routes_tree.heading("bookings", text="Bookings")
+        self.routes_tree.column("route", width=150)
+        self.routes_tree.column("bookings", width=70, anchor=tk.E)
+        self.routes_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Upcoming departures with their load
+        upcoming_frame = tk.Frame(dashboard_frame, bg="white")
+        upcoming_frame.grid(row=0, column=2, sticky=tk.NSEW, padx=(10, 0))
+        
+        tk.Label(
+            upcoming_frame,
+            text="Upcoming Departures",
+            font=("Arial", 11, "bold"),
+            bg="white",
+            fg="#0288d1"
+        ).pack(anchor=tk.W)
+        
+        self.upcoming_tree = ttk.Treeview(
+            upcoming_frame,
+            columns=("date", "flight", "route", "booked"),
+            show="headings",
+            height=5
+        )
+        self.upcoming_tree.heading("date", text="Date")
+        self.upcoming_tree.heading("flight", text="Flight")
+        self.upcoming_tree.heading("route", text="Route")
+        self.upcoming_tree.heading("booked", text="Booked")
+        self.upcoming_tree.column("date", width=80)
+        self.upcoming_tree.column("flight", width=60)
+        self.upcoming_tree.column("route", width=150)
+        self.upcoming_tree.column("booked", width=60, anchor=tk.E)
+        self.upcoming_tree.pack(fill=tk.BOTH, expand=True)
+    
+    @instrumented("ui", "home.refresh_dashboard")
+    def refresh_dashboard(self):
+        """Reload the dashboard if reservations changed since it was drawn"""
+        today = datetime.date.today().strftime("%Y-%m-%d")
+        cursor = self.db.latest_change()
+        
+        # Nothing moved, keep what is on screen
+        if cursor == self.dashboard_cursor and today == self.dashboard_day:
+            return
+        
+        self.dashboard_cursor = cursor
+        self.dashboard_day = today
+        
+        dashboard = self.db.get_dashboard(today)
+        
+        self.bookings_today_label.config(text=str(dashboard["bookings_today"]))
+        self.total_bookings_label.config(text=str(dashboard["total_bookings"]))
+        
+        self.routes_tree.delete(*self.routes_tree.get_children())
+        for departure, destination, bookings in dashboard["top_routes"]:
+            self.routes_tree.insert("", tk.END, values=(f"{departure} → {destination}", bookings))
+        
+        self.upcoming_tree.delete(*self.upcoming_tree.get_children())
+        for flight_number, date, departure, destination, booked in dashboard["upcoming"]:
+            self.upcoming_tree.insert(
+                "", tk.END,
+                values=(date, flight_number, f"{departure} → {destination}", booked)
+            )
+    
+    def poll_dashboard(self):
+        """Refresh the dashboard periodically while the page is visible"""
+        self.refresh_dashboard()
+        self.refresh_job = self.root.after(self.REFRESH_INTERVAL_MS, self.poll_dashboard)
     
     def show(self):
         """Display the home page"""
         self.frame.pack(fill=tk.BOTH, expand=True)
+        
+        # Start refreshing the dashboard
+        if self.refresh_job is None:
+            self.poll_dashboard()
     
     def hide(self):
         """Hide the home page"""
         self.frame.pack_forget()
+        
+        # Stop refreshing while hidden
+        if self.refresh_job is not None:
+            self.root.after_cancel(self.refresh_job)
+            self.refresh_job = None
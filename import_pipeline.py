@@ -0,0 +1,333 @@
+"""
+import_pipeline.py - Bulk import of reservations from partner files
+
+This module loads large CSV or JSON Lines files into the database:
+- The reader splits the input into chunks of lines
+- A process pool parses, normalizes and validates chunks in parallel
+- Validated chunks come back in input order and go to a single writer thread
+  that inserts them in large transactions
+- Bounded queues between the stages keep memory use flat
+- A line that cannot be parsed or validated, or a row the database refuses
+  (e.g. a full flight), goes to the rejects file; the other rows are imported
+- Throughput of each stage is reported, showing whether parsing or writing
+  is the bottleneck
+
+CSV files need a header row naming the columns name, flight_number,
+departure, destination, date and seat_number (in any order). Quoted values
+must not span lines.
+
+Usage:
+    python import_pipeline.py partner.csv
+    python import_pipeline.py partner.jsonl --workers 8 --rejects rejects.csv
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from database import Database
+from validation import validate_reservation, ValidationError
+
+# Input fields in the order add_reservation expects them
+IMPORT_FIELDS = ("name", "flight_number", "departure", "destination", "date", "seat_number")
+
+DEFAULT_CHUNK_SIZE = 5000
+DEFAULT_TRANSACTION_SIZE = 50000
+
+def parse_chunk(file_format, columns, first_line, lines):
+    """
+    Parse and validate one chunk of input lines (runs in a worker process)
+
+    Args:
+        file_format (str): "csv" or "jsonl"
+        columns (list): CSV column names from the header row
+        first_line (int): Line number of the first line in the chunk
+        lines (list): Raw input lines
+
+    Returns:
+        tuple: (valid rows as (line number, raw line, row), rejects as
+            (line number, error, raw line), seconds spent)
+    """
+    start = time.perf_counter()
+    valid = []
+    rejects = []
+
+    for line_number, raw in enumerate(lines, first_line):
+        raw = raw.rstrip("\n")
+        try:
+            # Each line is parsed on its own so a malformed one is only a reject
+            if not raw.strip():
+                raise ValidationError("empty line")
+            if file_format == "csv":
+                record = dict(zip(columns, next(csv.reader([raw]))))
+            else:
+                record = json.loads(raw)
+            row = validate_reservation(*(record.get(field) or "" for field in IMPORT_FIELDS))
+            valid.append((line_number, raw, row))
+        except (ValidationError, ValueError, AttributeError, csv.Error) as e:
+            rejects.append((line_number, str(e), raw))
+
+    return valid, rejects, time.perf_counter() - start
+
+class ImportStats:
+    def __init__(self):
+        """Counters and timings for each stage of an import"""
+        self.lines_read = 0
+        self.rows_valid = 0
+        self.rows_rejected = 0
+        self.rows_written = 0
+        self.read_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.write_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def report(self):
+        """
+        Describe the throughput of every stage
+
+        Returns:
+            str: Multi-line report
+        """
+        def rate(rows, seconds):
+            return f"{rows / seconds:,.0f} rows/s" if seconds else "-"
+
+        return "\n".join([
+            f"Lines read:     {self.lines_read:,} in {self.read_seconds:.2f}s "
+            f"({rate(self.lines_read, self.read_seconds)})",
+            f"Parse/validate: {self.rows_valid:,} valid, {self.rows_rejected:,} rejected, "
+            f"{self.parse_seconds:.2f}s CPU ({rate(self.lines_read, self.parse_seconds)} per worker)",
+            f"Write:          {self.rows_written:,} rows in {self.write_seconds:.2f}s "
+            f"({rate(self.rows_written, self.write_seconds)})",
+            f"Total:          {self.wall_seconds:.2f}s ({rate(self.rows_written, self.wall_seconds)})",
+        ])
+
+def read_chunks(path, chunk_size, stats):
+    """
+    Read the input file in chunks of lines
+
+    Args:
+        path (str): Input file
+        chunk_size (int): Lines per chunk
+        stats (ImportStats): Receives read counts and timings
+
+    Yields:
+        tuple: (file format, CSV columns, first line number, lines)
+    """
+    file_format = "jsonl" if path.endswith((".jsonl", ".json")) else "csv"
+
+    with open(path, newline="", encoding="utf-8") as f:
+        columns = None
+        line_number = 1
+
+        if file_format == "csv":
+            header = next(csv.reader([f.readline()]), [])
+            columns = [column.strip().lower() for column in header]
+            missing = set(IMPORT_FIELDS) - set(columns)
+            if missing:
+                raise ValueError(f"CSV header is missing: {', '.join(sorted(missing))}")
+            line_number = 2
+
+        while True:
+            start = time.perf_counter()
+            lines = [line for _, line in zip(range(chunk_size), f)]
+            stats.read_seconds += time.perf_counter() - start
+
+            if not lines:
+                break
+
+            stats.lines_read += len(lines)
+            yield file_format, columns, line_number, lines
+            line_number += len(lines)
+
+def write_rows(db, rows, stats, rejects, errors):
+    """
+    Insert rows in one transaction, or find the rows the database refuses
+
+    When the transaction is refused (a full flight, a constraint), the rows
+    are split in halves and retried, so the refused rows are isolated in a
+    few transactions each and every other row is still written, in input
+    order. A lock timeout is not caused by any row and fails the whole batch.
+
+    Args:
+        db (Database): Writer's connection
+        rows (list): (line number, raw line, row) tuples
+        stats (ImportStats): Receives write counts
+        rejects (list): Receives refused rows as (line number, error, raw line)
+        errors (list): Receives an error message if the batch fails as a whole
+    """
+    if db.add_reservations([row for _, _, row in rows]):
+        stats.rows_written += len(rows)
+        return
+
+    error = db.last_error
+    if error is not None and error.kind == "locked":
+        errors.append(f"transaction of {len(rows)} rows failed: {error.message}")
+        return
+
+    if len(rows) == 1:
+        line_number, raw, _ = rows[0]
+        rejects.append((line_number, error.message if error else "could not be saved", raw))
+        return
+
+    middle = len(rows) // 2
+    write_rows(db, rows[:middle], stats, rejects, errors)
+    write_rows(db, rows[middle:], stats, rejects, errors)
+
+def writer_loop(db_name, profile, batches, transaction_size, stats, rejects, errors):
+    """
+    Insert validated rows in large transactions (runs in the writer thread)
+
+    Args:
+        db_name (str): Database file
+        profile (str): Performance profile for the writer's connection
+        batches (queue.Queue): Lists of (line number, raw line, row), None
+            marks the end
+        transaction_size (int): Rows committed per transaction
+        stats (ImportStats): Receives write counts and timings
+        rejects (list): Receives rows the database refused
+        errors (list): Receives an error message if a transaction fails
+    """
+    try:
+        # The connection must be created in the thread that uses it
+        db = Database(db_name, profile=profile)
+    except Exception as e:
+        errors.append(f"cannot open {db_name}: {e}")
+        # Keep consuming so the parsing stage is never blocked
+        while batches.get() is not None:
+            pass
+        return
+
+    pending = []
+
+    def flush():
+        start = time.perf_counter()
+        write_rows(db, pending, stats, rejects, errors)
+        stats.write_seconds += time.perf_counter() - start
+        pending.clear()
+
+    while True:
+        rows = batches.get()
+        if rows is None:
+            break
+
+        pending.extend(rows)
+        if len(pending) >= transaction_size:
+            flush()
+
+    if pending:
+        flush()
+
+    db.close()
+
+def import_file(path, db_name="flights.db", workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                transaction_size=DEFAULT_TRANSACTION_SIZE, profile=None, rejects_path=None):
+    """
+    Import a CSV or JSON Lines file of reservations
+
+    Args:
+        path (str): Input file
+        db_name (str): Database file
+        workers (int): Parser processes, defaults to the number of CPUs
+        chunk_size (int): Lines parsed per task
+        transaction_size (int): Rows inserted per transaction
+        profile (str): Performance profile for the writer's connection
+        rejects_path (str): Optional CSV file receiving rejected lines
+
+    Returns:
+        ImportStats: Counts and timings of the import
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = ImportStats()
+    errors = []
+    write_rejects = []
+    wall_start = time.perf_counter()
+
+    # At most two chunks per worker are parsed ahead of the writer
+    max_in_flight = workers * 2
+    batches = queue.Queue(maxsize=max_in_flight)
+
+    writer = threading.Thread(
+        target=writer_loop,
+        args=(db_name, profile, batches, transaction_size, stats, write_rejects, errors)
+    )
+    writer.start()
+
+    rejects_file = open(rejects_path, "w", newline="", encoding="utf-8") if rejects_path else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+    if rejects_writer:
+        rejects_writer.writerow(("line", "error", "input"))
+
+    def collect(future):
+        valid, rejects, seconds = future.result()
+        stats.parse_seconds += seconds
+        stats.rows_valid += len(valid)
+        stats.rows_rejected += len(rejects)
+        if rejects_writer:
+            rejects_writer.writerows(rejects)
+        # Blocks when the writer falls behind, which stops further reading
+        batches.put(valid)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+
+            for chunk in read_chunks(path, chunk_size, stats):
+                in_flight.append(pool.submit(parse_chunk, *chunk))
+
+                # Hand results over in input order
+                if len(in_flight) >= max_in_flight:
+                    collect(in_flight.popleft())
+
+            while in_flight:
+                collect(in_flight.popleft())
+    finally:
+        batches.put(None)
+        writer.join()
+
+        # Rows refused by the database, known once the writer is done
+        stats.rows_valid -= len(write_rejects)
+        stats.rows_rejected += len(write_rejects)
+        if rejects_writer:
+            rejects_writer.writerows(sorted(write_rejects))
+        if rejects_file:
+            rejects_file.close()
+
+    stats.wall_seconds = time.perf_counter() - wall_start
+
+    for error in errors:
+        print(f"Error importing reservations: {error}")
+
+    return stats
+
+def main():
+    """Run an import from the command line"""
+    parser = argparse.ArgumentParser(description="Import reservations from a CSV or JSON Lines file")
+    parser.add_argument("input", help="CSV or JSON Lines file")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--workers", type=int, help="Parser processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Lines per parse task")
+    parser.add_argument("--transaction-size", type=int, default=DEFAULT_TRANSACTION_SIZE,
+                        help="Rows per write transaction")
+    parser.add_argument("--profile", help="Database performance profile for the import")
+    parser.add_argument("--rejects", help="Write rejected lines to this CSV file")
+    args = parser.parse_args()
+
+    stats = import_file(
+        args.input,
+        args.db,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        transaction_size=args.transaction_size,
+        profile=args.profile,
+        rejects_path=args.rejects
+    )
+
+    print(stats.report())
+
+if __name__ == "__main__":
+    main()
@@ -11,13 +11,17 @@ def initialize_sample_data():
     # Create database connection
     db = Database()
     
-    # Sample flights data
+    # Sample flights data: number, from, to, date, fare, departs, arrives.
+    # FL105/FL106 and FL107/FL102 give connections via London and Dubai.
     flights = [
-        ("FL100", "New York", "London", "2025-10-15", 250),
-        ("FL101", "Paris", "Tokyo", "2025-10-16", 300),
-        ("FL102", "Dubai", "Sydney", "2025-10-17", 280),
-        ("FL103", "Chicago", "Berlin", "2025-10-18", 220),
-        ("FL104", "Toronto", "Mumbai", "2025-10-19", 270)
+        ("FL100", "New York", "London", "2025-10-15", 250, "2025-10-15 18:00", "2025-10-16 06:00"),
+        ("FL101", "Paris", "Tokyo", "2025-10-16", 300, "2025-10-16 11:00", "2025-10-17 05:30"),
+        ("FL102", "Dubai", "Sydney", "2025-10-17", 280, "2025-10-17 02:15", "2025-10-17 16:20"),
+        ("FL103", "Chicago", "Berlin", "2025-10-18", 220, "2025-10-18 16:30", "2025-10-19 02:00"),
+        ("FL104", "Toronto", "Mumbai", "2025-10-19", 270, "2025-10-19 21:00", "2025-10-20 11:30"),
+        ("FL105", "London", "Dubai", "2025-10-16", 210, "2025-10-16 09:30", "2025-10-16 16:30"),
+        ("FL106", "Dubai", "Mumbai", "2025-10-16", 120, "2025-10-16 19:00", "2025-10-16 22:15"),
+        ("FL107", "Paris", "Dubai", "2025-10-16", 230, "2025-10-16 14:00", "2025-10-16 20:30"),
     ]
     
     # Add flights to database
@@ -0,0 +1,341 @@
+"""
+loadgen.py - Concurrent load generator for the SQLite database
+
+This module measures how many agents can share one database file before lock
+contention makes booking unusable:
+- Every worker is a separate process with its own Database connection, like
+  one copy of the app per agent desk
+- Workers run a mix of bookings, searches, lookups, updates and
+  cancellations through the real Database methods, back to back
+- An operation that fails with "database is locked" (the busy timeout ran
+  out) is retried with a short random backoff, as an agent clicking again
+- Each concurrency level runs on a freshly seeded database, once per
+  performance profile; the profiles set the journal mode (rollback journal
+  for "safe", WAL for "balanced" and "throughput", see db_profiles.py)
+
+Throughput, latency percentiles (including retries, as the agent sees them),
+locked errors, retries and operations that gave up are reported per run.
+
+Usage:
+    python loadgen.py
+    python loadgen.py --workers 1 2 4 8 16 --duration 10 --profiles safe balanced
+    python loadgen.py --busy-timeout 0.1 --max-retries 5 --json results.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from multiprocessing import Pool
+
+from database import Database, error_kind, DEFAULT_BUSY_TIMEOUT
+from db_profiles import PROFILES
+
+# Share of each operation in the workload, roughly what a booking desk does
+DEFAULT_MIX = {
+    "add_reservation": 20,
+    "search_reservations": 30,
+    "get_reservation_by_id": 30,
+    "update_reservation": 10,
+    "delete_reservation": 10,
+}
+
+# Reservations in the database before the workers start
+DEFAULT_SEED_ROWS = 5000
+
+# Retries of an operation that failed on a lock, and the first backoff in seconds
+DEFAULT_MAX_RETRIES = 3
+RETRY_BACKOFF = 0.01
+
+# Seconds given to the worker processes to start before the clock runs
+START_DELAY = 1.0
+
+CITIES = ("Paris", "London", "Tokyo", "Dubai", "New York", "Sydney", "Mumbai", "Rome")
+FIRST_NAMES = ("John", "Maria", "Ahmed", "Yuki", "Olga", "Carlos", "Amara", "Li")
+LAST_NAMES = ("Smith", "Garcia", "Khan", "Sato", "Ivanova", "Silva", "Okafor", "Wang")
+
+def random_reservation(rng):
+    """
+    Make up a reservation
+
+    Args:
+        rng (random.Random): Random source
+
+    Returns:
+        tuple: (name, flight_number, departure, destination, date, seat_number)
+    """
+    departure, destination = rng.sample(CITIES, 2)
+
+    return (
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        f"FL{rng.randint(100, 149)}",
+        departure,
+        destination,
+        f"2030-01-{rng.randint(1, 28):02d}",
+        f"{rng.randint(1, 30)}{rng.choice('ABCDEF')}",
+    )
+
+def seed_database(db_name, rows, profile, busy_timeout):
+    """
+    Create the database the workers share
+
+    Args:
+        db_name (str): New database file
+        rows (int): Reservations to add
+        profile (str): Database performance profile
+        busy_timeout (float): Seconds to wait for a lock
+    """
+    db = Database(db_name, profile=profile, busy_timeout=busy_timeout)
+
+    rng = random.Random(0)
+    db.add_reservations([random_reservation(rng) for _ in range(rows)])
+    db.close()
+
+def percentile(values, fraction):
+    """
+    Value below which a fraction of the sorted values fall
+
+    Args:
+        values (list): Sorted numbers
+        fraction (float): e.g. 0.95
+
+    Returns:
+        float: Nearest-rank percentile, or 0 without values
+    """
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def attempt(db, operation, args):
+    """
+    Run one Database method once
+
+    Write methods report failure by returning False and setting last_error;
+    read methods raise.
+
+    Args:
+        db (Database): Worker's connection
+        operation (str): Method name
+        args (tuple): Method arguments
+
+    Returns:
+        str: "ok", "locked", "constraint" or "error"
+    """
+    try:
+        result = getattr(db, operation)(*args)
+    except sqlite3.Error as e:
+        return error_kind(e)
+
+    if result is False:
+        return db.last_error.kind if db.last_error else "error"
+
+    return "ok"
+
+def run_worker(task):
+    """
+    Drive the database from one process until the run ends
+
+    Args:
+        task (dict): Run settings, see run_level()
+
+    Returns:
+        dict: Latencies in ms per operation, and counts of locked errors,
+            retries, operations that gave up and other errors
+    """
+    rng = random.Random(task["worker"])
+
+    # Seeded reservations are split between workers so two workers rarely
+    # cancel the same one
+    ids = list(range(task["worker"] + 1, task["seed_rows"] + 1, task["workers"]))
+    rng.shuffle(ids)
+
+    operations = list(task["mix"])
+    weights = [task["mix"][operation] for operation in operations]
+
+    latencies = {operation: [] for operation in operations}
+    counts = {"locked": 0, "retries": 0, "failed": 0, "errors": 0}
+
+    # Connect with the default timeout so the settings applied on connect
+    # do not fail while the other workers connect; the timeout under test
+    # applies to the workload
+    db = Database(task["db_name"], profile=task["profile"])
+    db.conn.execute(f"PRAGMA busy_timeout = {int(task['busy_timeout'] * 1000)}")
+
+    time.sleep(max(0, task["start_at"] - time.time()))
+    end = task["start_at"] + task["duration"]
+
+    while time.time() < end:
+        operation = rng.choices(operations, weights)[0]
+
+        if operation == "add_reservation":
+            args = random_reservation(rng)
+        elif operation == "search_reservations":
+            args = (rng.choice(LAST_NAMES + CITIES),)
+        elif not ids:
+            continue
+        elif operation == "delete_reservation":
+            args = (ids.pop(),)
+        elif operation == "update_reservation":
+            args = (rng.choice(ids),) + random_reservation(rng)
+        else:
+            args = (rng.choice(ids),)
+
+        start = time.perf_counter()
+        for retry in range(task["max_retries"] + 1):
+            outcome = attempt(db, operation, args)
+            if outcome != "locked":
+                break
+
+            counts["locked"] += 1
+            if retry == task["max_retries"]:
+                counts["failed"] += 1
+                break
+
+            counts["retries"] += 1
+            time.sleep(rng.uniform(0, RETRY_BACKOFF * 2 ** retry))
+
+        if outcome not in ("ok", "locked"):
+            counts["errors"] += 1
+        latencies[operation].append((time.perf_counter() - start) * 1000)
+
+    db.conn.close()
+
+    return {"latencies": latencies, **counts}
+
+def run_level(db_name, workers, duration, profile, busy_timeout=DEFAULT_BUSY_TIMEOUT,
+              max_retries=DEFAULT_MAX_RETRIES, mix=None, seed_rows=DEFAULT_SEED_ROWS):
+    """
+    Run one concurrency level against a seeded database
+
+    Args:
+        db_name (str): Database created by seed_database()
+        workers (int): Number of worker processes
+        duration (float): Seconds of load
+        profile (str): Database performance profile of every connection
+        busy_timeout (float): Seconds each connection waits for a lock
+        max_retries (int): Retries of an operation that failed on a lock
+        mix (dict): Operation name -> weight, defaults to DEFAULT_MIX
+        seed_rows (int): Reservations in the seeded database
+
+    Returns:
+        dict: Throughput, latency percentiles and error counts
+    """
+    start_at = time.time() + START_DELAY
+    tasks = [{
+        "worker": worker,
+        "workers": workers,
+        "db_name": db_name,
+        "profile": profile,
+        "busy_timeout": busy_timeout,
+        "max_retries": max_retries,
+        "mix": mix or DEFAULT_MIX,
+        "seed_rows": seed_rows,
+        "start_at": start_at,
+        "duration": duration,
+    } for worker in range(workers)]
+
+    with Pool(workers) as pool:
+        results = pool.map(run_worker, tasks)
+
+    by_operation = {}
+    for result in results:
+        for operation, values in result["latencies"].items():
+            by_operation.setdefault(operation, []).extend(values)
+
+    every = sorted(value for values in by_operation.values() for value in values)
+
+    return {
+        "profile": profile,
+        "journal_mode": PROFILES[profile]["journal_mode"].lower(),
+        "workers": workers,
+        "operations": len(every),
+        "throughput": len(every) / duration,
+        "p50": percentile(every, 0.50),
+        "p95": percentile(every, 0.95),
+        "p99": percentile(every, 0.99),
+        "operation_p95": {operation: percentile(sorted(values), 0.95)
+                          for operation, values in by_operation.items()},
+        "locked": sum(result["locked"] for result in results),
+        "retries": sum(result["retries"] for result in results),
+        "failed": sum(result["failed"] for result in results),
+        "errors": sum(result["errors"] for result in results),
+    }
+
+def run_load(concurrency=(1, 2, 4, 8), profiles=tuple(PROFILES), duration=5.0,
+             busy_timeout=DEFAULT_BUSY_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES, seed_rows=DEFAULT_SEED_ROWS,
+             directory=None, report=None):
+    """
+    Run every concurrency level with every profile
+
+    Args:
+        concurrency (tuple): Worker counts to run
+        profiles (tuple): Database performance profiles to compare
+        duration (float): Seconds of load per run
+        busy_timeout (float): Seconds each connection waits for a lock
+        max_retries (int): Retries of an operation that failed on a lock
+        seed_rows (int): Reservations added before each run
+        directory (str): Where to create the databases, e.g. on the disk
+            that will hold flights.db; defaults to the temporary directory
+        report: Function called with each run's result as soon as it is done
+
+    Returns:
+        list: Result dicts from run_level()
+    """
+    results = []
+
+    for profile in profiles:
+        for workers in concurrency:
+            with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+                db_name = os.path.join(temp_dir, "load.db")
+                seed_database(db_name, seed_rows, profile, busy_timeout)
+
+                result = run_level(db_name, workers, duration, profile, busy_timeout,
+                                   max_retries, seed_rows=seed_rows)
+
+            results.append(result)
+            if report:
+                report(result)
+
+    return results
+
+def print_result(result):
+    """Print one run as a table row"""
+    print(f"{result['profile']:<12}{result['journal_mode']:<8}{result['workers']:>8}"
+          f"{result['throughput']:>10,.0f}"
+          f"{result['p50']:>10.2f}{result['p95']:>10.2f}{result['p99']:>10.2f}"
+          f"{result['locked']:>8}{result['retries']:>9}{result['failed']:>8}{result['errors']:>8}")
+
+def main():
+    """Run the load generator from the command line"""
+    parser = argparse.ArgumentParser(description="Measure concurrent access to the database")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Concurrency levels (worker processes)")
+    parser.add_argument("--profiles", nargs="+", choices=list(PROFILES), default=list(PROFILES),
+                        help="Database profiles to compare (each sets a journal mode)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds of load per run")
+    parser.add_argument("--busy-timeout", type=float, default=DEFAULT_BUSY_TIMEOUT,
+                        help="Seconds a connection waits for a lock")
+    parser.add_argument("--max-retries", type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries of an operation that failed on a lock")
+    parser.add_argument("--seed-rows", type=int, default=DEFAULT_SEED_ROWS,
+                        help="Reservations added before each run")
+    parser.add_argument("--dir", help="Directory for the test databases (disk to measure)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    print(f"{'profile':<12}{'journal':<8}{'workers':>8}"
+          f"{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'locked':>8}{'retries':>9}{'failed':>8}{'errors':>8}")
+
+    results = run_load(args.workers, args.profiles, args.duration, args.busy_timeout,
+                       args.max_retries, args.seed_rows, args.dir, report=print_result)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -10,7 +10,26 @@ The app is structured with the following components:
 - booking.py: Flight booking form
 - reservations.py: View all reservations
 - edit_reservation.py: Update/Delete functionality
+- backup.py: Scheduled online backups
+- maintenance.py: Database maintenance while the app is idle
+
+Set FLIGHTS_BACKUP_INTERVAL to a number of minutes to back up the database
+periodically while the app is open. Set FLIGHTS_SERVICE to the address of a
+reservation service (see service.py) to use it instead of a local database file,
+or set FLIGHTS_STORAGE=memory to run on an in-memory copy of flights.db that
+is saved back when the app closes (see memory_store.py). Set FLIGHTS_METRICS_DIR to a directory to export
+usage metrics there every FLIGHTS_METRICS_INTERVAL seconds (see metrics.py).
+
+Run with --startup-probe to open the app, report how long it took to come up
+and exit (used by bench_startup.py).
 """
+import time
+
+# When this module started running, for --startup-probe
+STARTED_AT = time.perf_counter()
+
+import argparse
+import os
 import tkinter as tk
 from tkinter import ttk
 
@@ -20,6 +39,12 @@ from home import HomePage
 from booking import BookingPage
 from reservations import ReservationsPage
 from edit_reservation import EditReservationPage
+from metrics import REGISTRY, MetricsExporter, DEFAULT_EXPORT_INTERVAL
+from widgets import RefLookup
+
+# The storage engines, backup.py and maintenance.py are imported where they
+# are used: most launches need only one engine, and the service client alone
+# pulls in asyncio. See bench_startup.py.
 
 class App:
     def __init__(self, root):
@@ -30,7 +55,20 @@ class App:
             root: The main Tkinter window
         """
         self.root = root
-        self.db = Database()
+        
+        # Pick the storage engine: shared service, in-memory copy or local file.
+        # The in-memory copy is saved back to snapshot_file on exit.
+        self.snapshot_file = None
+        service_address = os.environ.get("FLIGHTS_SERVICE")
+        if service_address:
+            from service import RemoteDatabase
+            self.db = RemoteDatabase(service_address)
+        elif os.environ.get("FLIGHTS_STORAGE") == "memory":
+            from memory_store import MemoryDatabase
+            self.snapshot_file = "flights.db"
+            self.db = MemoryDatabase.from_sqlite(self.snapshot_file)
+        else:
+            self.db = Database()
         
         # Configure root window
         self.root.title("Flight Reservation System")
@@ -44,6 +82,58 @@ class App:
         
         # Show home page initially
         self.show_home_page()
+        
+        # Backups and maintenance only run against a local database file,
+        # the reservation service host takes care of its own. They start once
+        # the window is up so they do not delay it.
+        self.backup_scheduler = None
+        self.idle_maintenance = None
+        if isinstance(self.db, Database):
+            self.root.after_idle(self.start_background_tasks)
+        
+        # Export metrics if enabled, whatever the storage engine
+        self.metrics_exporter = None
+        metrics_dir = os.environ.get("FLIGHTS_METRICS_DIR")
+        if metrics_dir:
+            self.start_metrics_export(metrics_dir)
+    
+    def start_background_tasks(self):
+        """Start scheduled backups and idle-time database maintenance"""
+        from backup import BackupManager, BackupScheduler
+        from maintenance import MaintenanceScheduler, IdleMaintenance
+        
+        # Start scheduled backups if enabled
+        backup_interval = os.environ.get("FLIGHTS_BACKUP_INTERVAL")
+        if backup_interval:
+            self.backup_scheduler = BackupScheduler(
+                self.root,
+                BackupManager(self.db.db_name),
+                float(backup_interval)
+            )
+            self.backup_scheduler.start()
+        
+        # Run database maintenance when nobody is using the app
+        self.idle_maintenance = IdleMaintenance(self.root, MaintenanceScheduler(self.db))
+        self.idle_maintenance.start()
+    
+    def start_metrics_export(self, directory):
+        """
+        Write the metrics to files periodically
+        
+        Args:
+            directory (str): Directory receiving flights.prom and flights.json
+        """
+        interval = float(os.environ.get("FLIGHTS_METRICS_INTERVAL", DEFAULT_EXPORT_INTERVAL))
+        self.metrics_exporter = MetricsExporter(directory, interval)
+        
+        # The exporter thread may not use the database connection, but can
+        # look at the file size
+        if isinstance(self.db, Database):
+            db_name = self.db.db_name
+            REGISTRY.gauge("flights_database_size_bytes", "Size of the database file").labels().set_function(
+                lambda: os.path.getsize(db_name))
+        
+        self.metrics_exporter.start()
     
     def setup_style(self):
         """Configure the application style and theme"""
@@ -83,6 +173,7 @@ class App:
         # Create instances of all pages
         self.home_page = HomePage(
             self.root, 
+            self.db,
             self.show_booking_page,
             self.show_reservations_page
         )
@@ -112,6 +203,13 @@ class App:
         # Set the navigation button commands
         self.edit_reservation_page.home_btn.config(command=self.show_home_page)
         self.edit_reservation_page.book_flight_btn.config(command=self.show_booking_page)
+        
+        # Booking reference lookup in the header of every page
+        self.ref_lookups = []
+        for page in (self.home_page, self.booking_page, self.reservations_page, self.edit_reservation_page):
+            lookup = RefLookup(page.header_frame, self.db, self.show_edit_reservation_page)
+            lookup.frame.pack(side=tk.RIGHT, padx=10, pady=10)
+            self.ref_lookups.append(lookup)
     
     def show_home_page(self):
         """Display the home page"""
@@ -212,19 +310,60 @@ def show_splash(root):
     
     return splash
 
+def report_startup_time(destination):
+    """
+    Report how long the app took to come up
+    
+    Args:
+        destination (str): File to write the seconds to, or "-" for stdout
+            (windowed builds on Windows have no stdout)
+    """
+    seconds = f"{time.perf_counter() - STARTED_AT:.4f}"
+    
+    if destination == "-":
+        print(f"startup-probe {seconds}")
+    else:
+        with open(destination, "w") as f:
+            f.write(seconds)
+
 # Main entry point
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flight Reservation App")
+    parser.add_argument("--startup-probe", nargs="?", const="-", metavar="FILE",
+                        help="Exit once the main window is up and report the seconds it took")
+    args = parser.parse_args()
+    
     # Create the main window
     root = tk.Tk()
     
-    # Show splash screen
-    splash = show_splash(root)
+    if args.startup_probe:
+        # Draw the window and run its pending work, then stop
+        app = App(root)
+        root.update()
+        report_startup_time(args.startup_probe)
+    else:
+        # Show splash screen
+        splash = show_splash(root)
+        
+        # Create and run the application
+        app = App(root)
+        
+        # Start the Tkinter event loop
+        root.mainloop()
+    
+    # Stop maintenance and scheduled backups when app closes
+    if app.idle_maintenance:
+        app.idle_maintenance.stop()
+    if app.backup_scheduler:
+        app.backup_scheduler.stop()
     
-    # Create and run the application
-    app = App(root)
+    # Write the final metrics
+    if app.metrics_exporter:
+        app.metrics_exporter.stop()
     
-    # Start the Tkinter event loop
-    root.mainloop()
+    # Write the bookings made in memory back to the database file
+    if app.snapshot_file:
+        app.db.save_to_sqlite(app.snapshot_file)
     
     # Close database connection when app closes
     app.db.close()
\ No newline at end of file
@@ -0,0 +1,333 @@
+"""
+maintenance.py - Background database maintenance
+
+This module keeps flights.db compact and its query plans fresh:
+- PRAGMA optimize and ANALYZE to refresh the planner's statistics
+- Incremental vacuum to return free pages to the file system
+- Quick integrity check, WAL checkpoint and changelog pruning in batches
+- Booking references for rows inserted without one
+Work is split into small slices. A slice that writes never holds the write
+lock longer than the configured time budget, so bookings are not delayed.
+Maintenance runs when the app has been idle for a while, or headless:
+
+Usage:
+    python maintenance.py
+    python maintenance.py --budget-ms 20
+    python maintenance.py --enable-incremental-vacuum
+"""
+import argparse
+import datetime
+import time
+
+from database import Database
+
+# Longest time in milliseconds a slice may hold the write lock
+DEFAULT_BUDGET_MS = 50
+
+# First size of the chunks of work whose size adapts to the budget
+FIRST_PRUNE_BATCH = 256
+FIRST_VACUUM_PAGES = 64
+FIRST_ANALYSIS_LIMIT = 1000
+
+# Queries whose plans are compared before and after maintenance
+PLANNER_QUERIES = {
+    "search": "SELECT id FROM reservations WHERE name LIKE '%a%' OR flight_number LIKE '%a%'",
+    "flight_passengers": "SELECT id FROM reservations WHERE flight_number = 'FL100' AND date = '2025-01-01'",
+    "archive_candidates": "SELECT id FROM reservations WHERE date < '2025-01-01' ORDER BY id LIMIT 500",
+    "upcoming": "SELECT flight_number FROM flight_load WHERE date >= '2025-01-01' ORDER BY date LIMIT 5",
+}
+
+class MaintenanceScheduler:
+    def __init__(self, db, budget_ms=DEFAULT_BUDGET_MS, log=print):
+        """
+        Initialize the maintenance scheduler
+
+        Args:
+            db: Database instance
+            budget_ms (float): Longest time a slice may hold the write lock
+            log: Function called with each log message
+        """
+        self.db = db
+        self.budget = budget_ms / 1000
+        self.log = log
+
+        # Generator producing the remaining slices of the current run
+        self.pending = None
+
+    def collect_stats(self):
+        """
+        Collect file size, free pages and query plans
+
+        Returns:
+            dict: size_bytes, freelist_pages and plans keyed by query name
+        """
+        cursor = self.db.conn.cursor()
+
+        page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+        page_count = cursor.execute("PRAGMA page_count").fetchone()[0]
+        freelist = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+        plans = {}
+        for name, query in PLANNER_QUERIES.items():
+            rows = cursor.execute(f"EXPLAIN QUERY PLAN {query}").fetchall()
+            plans[name] = "; ".join(row[-1] for row in rows)
+
+        cursor.close()
+
+        return {
+            "size_bytes": page_size * page_count,
+            "freelist_pages": freelist,
+            "plans": plans,
+        }
+
+    def resize(self, size, elapsed):
+        """
+        Adjust a chunk size so the next chunk fits in the budget
+
+        Args:
+            size (int): Size of the chunk that just ran
+            elapsed (float): Seconds it took
+
+        Returns:
+            int: Half the size if the chunk went over the budget, double if
+                it used less than a quarter of it
+        """
+        if elapsed > self.budget:
+            return max(1, size // 2)
+        if elapsed < self.budget / 4:
+            return size * 2
+        return size
+
+    def slices(self):
+        """
+        Generate the maintenance work one slice at a time
+
+        Yields:
+            str: Name of the slice that just ran
+        """
+        cursor = self.db.conn.cursor()
+        before = self.collect_stats()
+        self.log(f"Maintenance started: {before['size_bytes']:,} bytes, "
+                 f"{before['freelist_pages']:,} free pages")
+
+        # Trim the changelog to its retention, a batch of records at a time
+        horizon = self.db.advance_changelog_horizon()
+        if horizon is not None:
+            rows = FIRST_PRUNE_BATCH
+            after = 0
+            while after < horizon:
+                start = time.perf_counter()
+                _, after = self.db.delete_pruned_changes(horizon, after, rows)
+                rows = self.resize(rows, time.perf_counter() - start)
+                yield "prune_changes"
+
+        # Rows written by tools that bypass Database get their booking reference here
+        while self.db.backfill_booking_refs(batch_size=200):
+            yield "backfill_booking_refs"
+
+        # One table per slice. The rows ANALYZE samples per index are
+        # bounded, and the bound adapts so each table fits in the budget.
+        analysis_limit = FIRST_ANALYSIS_LIMIT
+        tables = [row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()]
+        for table in tables:
+            start = time.perf_counter()
+            cursor.execute(f"PRAGMA analysis_limit = {analysis_limit}")
+            cursor.execute(f'ANALYZE "{table}"')
+            self.db.conn.commit()
+            analysis_limit = min(FIRST_ANALYSIS_LIMIT, self.resize(analysis_limit, time.perf_counter() - start))
+            yield f"analyze {table}"
+
+        # Every table was just analyzed, so this only records that with the
+        # planner and does not analyze anything again
+        cursor.execute(f"PRAGMA analysis_limit = {analysis_limit}")
+        cursor.execute("PRAGMA optimize")
+        self.db.conn.commit()
+        yield "optimize"
+
+        # Free pages are released a chunk at a time, the chunk is resized so
+        # that each transaction fits in the budget
+        auto_vacuum = cursor.execute("PRAGMA auto_vacuum").fetchone()[0]
+        if auto_vacuum == 2:
+            pages = FIRST_VACUUM_PAGES
+            while cursor.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+                start = time.perf_counter()
+                cursor.execute(f"PRAGMA incremental_vacuum({pages})")
+                cursor.fetchall()
+                self.db.conn.commit()
+                pages = self.resize(pages, time.perf_counter() - start)
+                yield "incremental_vacuum"
+        else:
+            self.log("Incremental vacuum skipped: auto_vacuum is not INCREMENTAL "
+                     "(run with --enable-incremental-vacuum once)")
+
+        # Read-only, so it does not hold the write lock
+        result = cursor.execute("PRAGMA quick_check").fetchone()[0]
+        if result != "ok":
+            self.log(f"Integrity problem found: {result}")
+        yield "quick_check"
+
+        # PASSIVE never waits for readers or writers
+        if cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            busy, log_frames, checkpointed = cursor.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+            self.log(f"WAL checkpoint: {checkpointed}/{log_frames} frames")
+            yield "wal_checkpoint"
+
+        cursor.close()
+
+        after = self.collect_stats()
+        self.log(f"Maintenance finished: {after['size_bytes']:,} bytes "
+                 f"({after['size_bytes'] - before['size_bytes']:+,}), "
+                 f"{after['freelist_pages']:,} free pages")
+        for name, plan in after["plans"].items():
+            if plan != before["plans"][name]:
+                self.log(f"Plan changed for {name}: {before['plans'][name]} -> {plan}")
+
+        self.db.set_meta("maintenance_last_run", datetime.datetime.now().isoformat(timespec="seconds"))
+
+    def run_slice(self):
+        """
+        Run the next slice, starting a new run if none is in progress
+
+        Returns:
+            bool: True if more slices remain, False when the run is complete
+        """
+        if self.pending is None:
+            self.pending = self.slices()
+
+        start = time.perf_counter()
+        try:
+            name = next(self.pending)
+        except StopIteration:
+            self.pending = None
+            return False
+        except Exception as e:
+            self.db.conn.rollback()
+            self.log(f"Maintenance error: {e}")
+            self.pending = None
+            return False
+
+        elapsed = time.perf_counter() - start
+        if elapsed > self.budget:
+            self.log(f"Slice {name} took {elapsed * 1000:.0f} ms (budget {self.budget * 1000:.0f} ms)")
+
+        return True
+
+    def run_all(self, pause=0.0):
+        """
+        Run a complete maintenance pass
+
+        Args:
+            pause (float): Seconds to wait between slices, letting other writers in
+        """
+        while self.run_slice():
+            time.sleep(pause)
+
+    def is_due(self, every_hours):
+        """
+        Check whether the last complete run is older than the given interval
+
+        Args:
+            every_hours (float): Hours between runs
+
+        Returns:
+            bool: True if maintenance should run
+        """
+        last_run = self.db.get_meta("maintenance_last_run")
+        if last_run is None:
+            return True
+
+        elapsed = datetime.datetime.now() - datetime.datetime.fromisoformat(last_run)
+        return elapsed >= datetime.timedelta(hours=every_hours)
+
+class IdleMaintenance:
+    # How often idleness is checked, and the gap between slices while idle
+    CHECK_INTERVAL_MS = 5000
+    SLICE_INTERVAL_MS = 200
+
+    def __init__(self, root, scheduler, idle_seconds=120, every_hours=24):
+        """
+        Run maintenance slices while the user is not using the app
+
+        Args:
+            root: The main Tkinter window
+            scheduler: MaintenanceScheduler instance
+            idle_seconds (float): Seconds without input before maintenance starts
+            every_hours (float): Hours between complete maintenance runs
+        """
+        self.root = root
+        self.scheduler = scheduler
+        self.idle_seconds = idle_seconds
+        self.every_hours = every_hours
+        self.last_activity = time.monotonic()
+        self.job = None
+
+        # Any key press, click or mouse move counts as activity
+        for sequence in ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>"):
+            root.bind_all(sequence, self.on_activity, add="+")
+
+    def on_activity(self, event=None):
+        """Record user activity"""
+        self.last_activity = time.monotonic()
+
+    def start(self):
+        """Start watching for idle periods"""
+        self.job = self.root.after(self.CHECK_INTERVAL_MS, self.tick)
+
+    def tick(self):
+        """Run one slice if the app is idle and maintenance is due"""
+        idle = time.monotonic() - self.last_activity >= self.idle_seconds
+        running = self.scheduler.pending is not None
+
+        if idle and (running or self.scheduler.is_due(self.every_hours)):
+            more = self.scheduler.run_slice()
+            delay = self.SLICE_INTERVAL_MS if more else self.CHECK_INTERVAL_MS
+        else:
+            delay = self.CHECK_INTERVAL_MS
+
+        self.job = self.root.after(delay, self.tick)
+
+    def stop(self):
+        """Stop running maintenance"""
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+def enable_incremental_vacuum(db):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL
+
+    Requires a full VACUUM, which rewrites the file and blocks other writers
+    for its duration, so it is only offered from the command line.
+
+    Args:
+        db: Database instance
+    """
+    db.conn.commit()
+    db.cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    db.cursor.execute("VACUUM")
+
+def main():
+    """Run maintenance from the command line"""
+    parser = argparse.ArgumentParser(description="Run database maintenance")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Longest time a slice may hold the write lock")
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds between slices")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert the database to auto_vacuum=INCREMENTAL (full VACUUM)")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    if args.enable_incremental_vacuum:
+        print("Running full VACUUM to enable incremental vacuum...")
+        enable_incremental_vacuum(db)
+
+    MaintenanceScheduler(db, args.budget_ms).run_all(args.pause)
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
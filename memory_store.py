@@ -0,0 +1,572 @@
+"""
+memory_store.py - In-memory reservation storage engine
+
+This module provides MemoryDatabase, a storage.ReservationStore that keeps
+reservations in memory instead of a SQLite file. It is meant for demo kiosks,
+load tests and UI benchmarks:
+- Reservations are stored column by column in compact arrays, in ID order
+- Hash indexes on ID and on flight/date, and a sorted index on name
+- Dashboard summaries and the change feed are kept up to date on every write
+- Snapshots can be loaded from and saved to a SQLite database file
+
+Saving writes back only the reservations inserted, updated or deleted in
+memory, through Database's own write methods: new reservations get IDs and
+booking references from the file, the name index and the audit trail see
+every change, scheduled flights are checked for capacity, and bookings other
+agents made in the file meanwhile are left alone. main.py saves the store back to
+flights.db when the app closes; anything written while the app runs is lost
+if it does not close normally.
+
+Usage:
+    FLIGHTS_STORAGE=memory python main.py
+"""
+import bisect
+import datetime
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from storage import ReservationStore
+
+# Change records kept for changes_since(); up to twice as many are held
+# between trims
+DEFAULT_CHANGELOG_RETENTION = 10000
+
+# Deleted slots tolerated before the column arrays are compacted
+COMPACT_MIN_DEAD = 1024
+
+def seat_sort_key(seat_number):
+    """
+    Sort key ordering seats by row number, then letter ("2A" before "10A")
+
+    Args:
+        seat_number (str): Seat identifier
+
+    Returns:
+        tuple: (row number, seat identifier)
+    """
+    digits = ""
+    for char in seat_number:
+        if not char.isdigit():
+            break
+        digits += char
+
+    return (int(digits) if digits else 0, seat_number)
+
+class MemoryDatabase(ReservationStore):
+    def __init__(self, changelog_retention=DEFAULT_CHANGELOG_RETENTION):
+        """
+        Initialize an empty in-memory store
+
+        Args:
+            changelog_retention (int): Number of change records kept
+        """
+        self.db_name = None
+        self.changelog_retention = changelog_retention
+        self.lock = threading.RLock()
+        self.next_id = 1
+
+        # Column arrays; slot i holds one reservation and slots are in ID order
+        self.ids = array("q")
+        self.alive = bytearray()
+        self.names = []
+        self.flight_numbers = []
+        self.departures = []
+        self.destinations = []
+        self.dates = []
+        self.seat_numbers = []
+        self.booking_refs = []
+        self.dead_slots = 0
+
+        # Indexes: ID -> slot, (flight_number, date) -> IDs, sorted (name, ID)
+        self.slot_by_id = {}
+        self.ids_by_flight = defaultdict(set)
+        self.name_index = []
+
+        # Dashboard summaries
+        self.flight_load = {}
+        self.route_bookings = Counter()
+        self.daily_bookings = Counter()
+
+        # Change feed: (seq, op, reservation_id, version, changed_at). A list
+        # so changes_since() can slice it; old records are trimmed in bulk.
+        self.changes = []
+        self.versions = {}
+        self.seq = 0
+        self.horizon = 0
+        self.seen_seq = 0
+
+        # Writes not saved to the database file yet: reservation ID -> "I"
+        # (made here), "U" (loaded and changed) or "D" (loaded and deleted).
+        # Kept by log_change() beside the feed, whose retention may drop them.
+        self.pending = {}
+
+    @classmethod
+    def from_sqlite(cls, db_name, batch_size=10000):
+        """
+        Create a store holding a snapshot of a SQLite database
+
+        Args:
+            db_name (str): Database file to load
+            batch_size (int): Rows read per batch
+
+        Returns:
+            MemoryDatabase: Loaded store
+        """
+        # Imported here so that the memory engine does not need SQLite to run
+        from database import Database, RESERVATION_COLUMNS
+
+        store = cls()
+        db = Database(db_name)
+
+        cursor = db.conn.cursor()
+        cursor.execute(f"SELECT {RESERVATION_COLUMNS}, booking_ref FROM reservations")
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                store.insert_row(row[1:7], reservation_id=row[0], keep_sorted=False, booking_ref=row[7])
+        cursor.close()
+
+        db.close()
+
+        # The name index is sorted once instead of on every insert
+        store.name_index.sort()
+
+        # Loading is not a change, start the feed from here
+        store.changes.clear()
+        store.versions.clear()
+        store.pending.clear()
+        store.seq = store.horizon = store.seen_seq = 0
+
+        return store
+
+    def save_to_sqlite(self, db_name):
+        """
+        Write the changes made in this store back to a SQLite database
+
+        Only the reservations inserted, updated or deleted here since the
+        store was loaded or last saved are written, in one transaction, so
+        bookings other agents made in the file meanwhile are kept. Updates
+        and deletes go through Database.update_reservation and
+        delete_reservation, inserts through Database.insert_reservations, so
+        they are audited, capacity checked and offered to the waitlist as any
+        other write. Reservations made here get a new ID and booking
+        reference from the file.
+
+        Args:
+            db_name (str): Database file to write
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        from database import Database
+
+        db = Database(db_name)
+        try:
+            with self.lock:
+                inserted = []
+
+                with db.transaction(immediate=True):
+                    for reservation_id, op in self.pending.items():
+                        if op == "I":
+                            inserted.append(reservation_id)
+                            continue
+
+                        if op == "U":
+                            saved = db.update_reservation(reservation_id, *self.row(self.slot_by_id[reservation_id])[1:])
+                        else:
+                            saved = db.delete_reservation(reservation_id)
+                        if not saved:
+                            raise RuntimeError(db.last_error.message)
+
+                    refs = db.insert_reservations([self.row(self.slot_by_id[reservation_id])[1:]
+                                                   for reservation_id in inserted]) if inserted else []
+
+                    # IDs given by the file, read back by reference
+                    new_ids = {}
+                    for start in range(0, len(refs), 500):
+                        chunk = refs[start:start + 500]
+                        db.cursor.execute(f"SELECT booking_ref, id FROM reservations "
+                                          f"WHERE booking_ref IN ({', '.join('?' * len(chunk))})", chunk)
+                        new_ids.update(db.cursor.fetchall())
+
+                # Committed: the new reservations take their IDs from the file
+                self.rekey([(reservation_id, new_ids[ref], ref)
+                            for reservation_id, ref in zip(inserted, refs)])
+                self.pending.clear()
+            return True
+        except Exception as e:
+            print(f"Error saving snapshot: {e}")
+            return False
+        finally:
+            db.close()
+
+    def rekey(self, renamed):
+        """
+        Give reservations the IDs and booking references they got in the file
+
+        All of them are taken out before any is put back, as a new ID may
+        still belong to another reservation made here.
+
+        Args:
+            renamed (list): (ID in this store, ID in the file, booking
+                reference) tuples, in the order the file gave the IDs
+        """
+        rows = []
+        for reservation_id, new_id, booking_ref in renamed:
+            slot = self.slot_by_id.pop(reservation_id)
+            values = self.row(slot)[1:]
+
+            self.unindex(reservation_id, values)
+            self.alive[slot] = 0
+            self.dead_slots += 1
+            self.log_change("D", reservation_id)
+            rows.append((values, new_id, booking_ref))
+
+        for values, new_id, booking_ref in rows:
+            self.insert_row(values, reservation_id=new_id, booking_ref=booking_ref)
+        self.compact()
+
+    def live_slots(self):
+        """Iterate over the slots of reservations that were not deleted"""
+        alive = self.alive
+        return (slot for slot in range(len(alive)) if alive[slot])
+
+    def row(self, slot):
+        """Build the reservation tuple stored in a slot"""
+        return (self.ids[slot], self.names[slot], self.flight_numbers[slot], self.departures[slot],
+                self.destinations[slot], self.dates[slot], self.seat_numbers[slot])
+
+    def insert_row(self, values, reservation_id=None, keep_sorted=True, booking_ref=None):
+        """
+        Append a reservation and index it
+
+        Args:
+            values (tuple): (name, flight_number, departure, destination, date, seat_number)
+            reservation_id (int): ID to use, or None to allocate the next one
+            keep_sorted (bool): Insert into the name index in order; when False
+                the caller sorts the index after a bulk load
+            booking_ref (str): Booking reference of a loaded reservation;
+                reservations made here get theirs when saved
+
+        Returns:
+            int: ID of the reservation
+        """
+        name, flight_number, departure, destination, date, seat_number = values
+
+        if reservation_id is None:
+            reservation_id = self.next_id
+        self.next_id = max(self.next_id, reservation_id + 1)
+
+        self.slot_by_id[reservation_id] = len(self.ids)
+        self.ids.append(reservation_id)
+        self.alive.append(1)
+        self.names.append(name)
+        self.flight_numbers.append(flight_number)
+        self.departures.append(departure)
+        self.destinations.append(destination)
+        self.dates.append(date)
+        self.seat_numbers.append(seat_number)
+        self.booking_refs.append(booking_ref)
+
+        self.index(reservation_id, values, keep_sorted)
+        self.log_change("I", reservation_id)
+
+        return reservation_id
+
+    def count_bookings(self, bookings):
+        """Add bookings made today to the dashboard's daily count"""
+        self.daily_bookings[datetime.date.today().strftime("%Y-%m-%d")] += bookings
+
+    def index(self, reservation_id, values, keep_sorted=True):
+        """Add a reservation to the indexes and summaries"""
+        name, flight_number, departure, destination, date, seat_number = values
+
+        self.ids_by_flight[(flight_number, date)].add(reservation_id)
+        if keep_sorted:
+            bisect.insort(self.name_index, (name.lower(), reservation_id))
+        else:
+            self.name_index.append((name.lower(), reservation_id))
+
+        load = self.flight_load.setdefault((flight_number, date), [departure, destination, 0])
+        load[2] += 1
+        self.route_bookings[(departure, destination)] += 1
+
+    def unindex(self, reservation_id, values):
+        """Remove a reservation from the indexes and summaries"""
+        name, flight_number, departure, destination, date, seat_number = values
+
+        flight_ids = self.ids_by_flight[(flight_number, date)]
+        flight_ids.discard(reservation_id)
+        if not flight_ids:
+            del self.ids_by_flight[(flight_number, date)]
+
+        position = bisect.bisect_left(self.name_index, (name.lower(), reservation_id))
+        del self.name_index[position]
+
+        load = self.flight_load[(flight_number, date)]
+        load[2] -= 1
+        if load[2] <= 0:
+            del self.flight_load[(flight_number, date)]
+
+        self.route_bookings[(departure, destination)] -= 1
+        if self.route_bookings[(departure, destination)] <= 0:
+            del self.route_bookings[(departure, destination)]
+
+    def log_change(self, op, reservation_id):
+        """Append a record to the change feed and apply the retention"""
+        self.seq += 1
+        version = self.versions.get(reservation_id, 0) + 1
+        self.versions[reservation_id] = version
+
+        changed_at = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        self.changes.append((self.seq, op, reservation_id, version, changed_at))
+
+        # Trim in bulk so that appending stays O(1) on average
+        if len(self.changes) > 2 * self.changelog_retention:
+            dropped = len(self.changes) - self.changelog_retention
+            self.horizon = self.changes[dropped - 1][0]
+            del self.changes[:dropped]
+
+        if op == "D":
+            del self.versions[reservation_id]
+
+        # A reservation made here stays an insert, and deleting it leaves
+        # nothing to write
+        state = self.pending.get(reservation_id)
+        if op == "I" or state is None:
+            self.pending[reservation_id] = op
+        elif state == "I":
+            if op == "D":
+                del self.pending[reservation_id]
+        else:
+            self.pending[reservation_id] = op
+
+    def compact(self):
+        """Drop deleted slots from the column arrays once enough have piled up"""
+        if self.dead_slots < COMPACT_MIN_DEAD or self.dead_slots * 4 < len(self.ids):
+            return
+
+        slots = list(self.live_slots())
+
+        self.ids = array("q", (self.ids[slot] for slot in slots))
+        self.alive = bytearray(b"\x01" * len(slots))
+        for column in ("names", "flight_numbers", "departures", "destinations", "dates", "seat_numbers",
+                       "booking_refs"):
+            values = getattr(self, column)
+            setattr(self, column, [values[slot] for slot in slots])
+
+        self.slot_by_id = {reservation_id: slot for slot, reservation_id in enumerate(self.ids)}
+        self.dead_slots = 0
+
+    def add_reservation(self, name, flight_number, departure, destination, date, seat_number):
+        """Add a new reservation, see Database.add_reservation"""
+        with self.lock:
+            self.insert_row((name, flight_number, departure, destination, date, seat_number))
+            self.count_bookings(1)
+            return True
+
+    def add_reservations(self, reservations):
+        """Add several reservations atomically, see Database.add_reservations"""
+        reservations = [tuple(reservation) for reservation in reservations]
+
+        # Check everything first so that a bad row leaves the store untouched
+        if any(len(reservation) != 6 or None in reservation for reservation in reservations):
+            print("Error adding reservations: every reservation needs 6 values")
+            return False
+
+        with self.lock:
+            for reservation in reservations:
+                self.insert_row(reservation)
+            self.count_bookings(len(reservations))
+            return True
+
+    def get_all_reservations(self, include_archive=False):
+        """Get all reservations, see Database.get_all_reservations"""
+        with self.lock:
+            return [self.row(slot) for slot in self.live_slots()]
+
+    def get_reservation_by_id(self, reservation_id):
+        """Get a reservation by its ID, see Database.get_reservation_by_id"""
+        with self.lock:
+            slot = self.slot_by_id.get(int(reservation_id))
+            return None if slot is None else self.row(slot)
+
+    def get_reservations_page(self, after_id=0, limit=100, include_archive=False):
+        """Get one page of reservations ordered by ID, see Database.get_reservations_page"""
+        with self.lock:
+            page = []
+            slot = bisect.bisect_right(self.ids, after_id)
+
+            while slot < len(self.ids) and len(page) < limit:
+                if self.alive[slot]:
+                    page.append(self.row(slot))
+                slot += 1
+
+            return page
+
+    def update_reservation(self, reservation_id, name, flight_number, departure, destination, date, seat_number):
+        """Update reservation information, see Database.update_reservation"""
+        values = (name, flight_number, departure, destination, date, seat_number)
+
+        with self.lock:
+            reservation_id = int(reservation_id)
+            slot = self.slot_by_id.get(reservation_id)
+            if slot is None:
+                return True
+
+            self.unindex(reservation_id, self.row(slot)[1:])
+
+            self.names[slot] = name
+            self.flight_numbers[slot] = flight_number
+            self.departures[slot] = departure
+            self.destinations[slot] = destination
+            self.dates[slot] = date
+            self.seat_numbers[slot] = seat_number
+
+            self.index(reservation_id, values)
+            self.log_change("U", reservation_id)
+            return True
+
+    def delete_reservation(self, reservation_id):
+        """Delete a reservation, see Database.delete_reservation"""
+        with self.lock:
+            reservation_id = int(reservation_id)
+            slot = self.slot_by_id.pop(reservation_id, None)
+            if slot is None:
+                return True
+
+            self.unindex(reservation_id, self.row(slot)[1:])
+            self.alive[slot] = 0
+            self.dead_slots += 1
+
+            self.log_change("D", reservation_id)
+            self.compact()
+            return True
+
+    def search_reservations(self, search_term, include_archive=False):
+        """Search name, flight number and route, see Database.search_reservations"""
+        term = search_term.lower()
+
+        with self.lock:
+            return [
+                self.row(slot) for slot in self.live_slots()
+                if term in self.names[slot].lower()
+                or term in self.flight_numbers[slot].lower()
+                or term in self.departures[slot].lower()
+                or term in self.destinations[slot].lower()
+            ]
+
+    def find_by_name_prefix(self, prefix, limit=100):
+        """
+        Find reservations whose passenger name starts with a prefix
+
+        Uses the sorted name index, so the cost depends on the number of
+        matches rather than the number of reservations.
+
+        Args:
+            prefix (str): Start of the passenger name (case-insensitive)
+            limit (int): Maximum number of reservations to return
+
+        Returns:
+            list: Reservation tuples ordered by name
+        """
+        prefix = prefix.lower()
+
+        with self.lock:
+            position = bisect.bisect_left(self.name_index, (prefix, 0))
+            results = []
+
+            while position < len(self.name_index) and len(results) < limit:
+                name, reservation_id = self.name_index[position]
+                if not name.startswith(prefix):
+                    break
+                results.append(self.row(self.slot_by_id[reservation_id]))
+                position += 1
+
+            return results
+
+    def iter_reservations(self, batch_size=1000, include_archive=False):
+        """Stream all reservations in batches, see Database.iter_reservations"""
+        after_id = 0
+        while True:
+            batch = self.get_reservations_page(after_id, batch_size)
+            if not batch:
+                break
+            yield batch
+            after_id = batch[-1][0]
+
+    def count_reservations(self, include_archive=False):
+        """Count reservations; the memory engine has no archive"""
+        return len(self.slot_by_id)
+
+    def get_flight_passengers(self, flight_number, date):
+        """Get the reservations of one flight ordered by seat, see Database.get_flight_passengers"""
+        with self.lock:
+            rows = [self.row(slot) + (self.booking_refs[slot],)
+                    for slot in (self.slot_by_id[reservation_id]
+                                 for reservation_id in self.ids_by_flight.get((flight_number, date), ()))]
+
+        return sorted(rows, key=lambda row: seat_sort_key(row[6]))
+
+    def get_occupied_seats(self, flight_number, date):
+        """Get the seats taken on one flight, see Database.get_occupied_seats"""
+        with self.lock:
+            return [self.seat_numbers[self.slot_by_id[reservation_id]]
+                    for reservation_id in self.ids_by_flight.get((flight_number, date), ())]
+
+    def get_flights(self):
+        """Get every flight and date that has reservations, see Database.get_flights"""
+        with self.lock:
+            flights = [(flight_number, date, departure, destination, booked)
+                       for (flight_number, date), (departure, destination, booked) in self.flight_load.items()]
+
+        return sorted(flights, key=lambda flight: (flight[1], flight[0]))
+
+    def get_dashboard(self, today, limit=5):
+        """Get the home page figures, see Database.get_dashboard"""
+        with self.lock:
+            top_routes = [(departure, destination, bookings)
+                          for (departure, destination), bookings in self.route_bookings.most_common(limit)]
+
+            return {
+                "bookings_today": self.daily_bookings[today],
+                "total_bookings": len(self.slot_by_id),
+                "top_routes": top_routes,
+                "upcoming": [flight for flight in self.get_flights() if flight[1] >= today][:limit],
+            }
+
+    def latest_change(self):
+        """Get the sequence number of the most recent change"""
+        return self.seq
+
+    def changes_since(self, cursor, limit=1000):
+        """Get the changes made after a cursor, see Database.changes_since"""
+        with self.lock:
+            if cursor < self.horizon:
+                return None, self.seq
+
+            # Sequence numbers are consecutive, so the position is computed
+            start = max(0, cursor - self.horizon)
+            changes = self.changes[start:start + limit]
+
+        if changes:
+            cursor = changes[-1][0]
+
+        return changes, cursor
+
+    def data_changed(self):
+        """Check whether anything was written since the last call"""
+        changed = self.seq != self.seen_seq
+        self.seen_seq = self.seq
+
+        return changed
+
+    def clone(self):
+        """Return this store; it is shared safely between threads"""
+        return self
+
+    def close(self):
+        """Nothing to release for an in-memory store"""
@@ -0,0 +1,466 @@
+"""
+metrics.py - In-process application metrics and their export
+
+This module counts what the app does so it can be watched from outside:
+- Counter, Gauge and Histogram (fixed buckets) metrics, optionally with labels
+- Increments never take a lock: every thread adds to its own cell and the
+  cells are summed when the metrics are read
+- instrumented() wraps Database methods and page actions to count calls and
+  errors and record their duration
+- MetricsExporter writes every metric periodically to a Prometheus text
+  file (for the node_exporter textfile collector or any scraper) and to a
+  JSON snapshot, without extra dependencies
+
+Set FLIGHTS_METRICS_DIR to export from the app (see main.py).
+"""
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+
+# Upper bounds of the default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Seconds between two exports
+DEFAULT_EXPORT_INTERVAL = 15
+
+class Cells:
+    def __init__(self, size):
+        """
+        Per-thread accumulators that are summed on read
+
+        Each thread gets its own list on first use and is the only writer of
+        that list, so updates need no lock.
+
+        Args:
+            size (int): Number of values per cell
+        """
+        self.size = size
+        self.cells = []
+        self.local = threading.local()
+
+    def cell(self):
+        """Get the calling thread's cell, creating it on first use"""
+        try:
+            return self.local.cell
+        except AttributeError:
+            cell = self.local.cell = [0] * self.size
+            # list.append is atomic, so registering a cell needs no lock either
+            self.cells.append(cell)
+            return cell
+
+    def totals(self):
+        """
+        Sum the cells of every thread
+
+        Returns:
+            list: One total per value
+        """
+        totals = [0] * self.size
+        for cell in list(self.cells):
+            for index, value in enumerate(cell):
+                totals[index] += value
+
+        return totals
+
+class Metric:
+    # Prometheus metric type, set by subclasses
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        """
+        Initialize a metric family
+
+        Args:
+            name (str): Metric name, e.g. "flights_operations_total"
+            help_text (str): Description exported with the metric
+            labels (tuple): Label names, empty for a metric without labels
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Get the metric for one combination of label values
+
+        Resolve children once and keep them; the lookup takes a lock the
+        first time a combination is seen.
+
+        Args:
+            *values: One value per label name
+
+        Returns:
+            The child metric
+        """
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self.new_child())
+
+        return child
+
+    def new_child(self):
+        """Create the value holder of one label combination"""
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        List the children with their label dicts
+
+        Returns:
+            list: (labels dict, child) pairs
+        """
+        return [(dict(zip(self.label_names, values)), child)
+                for values, child in list(self.children.items())]
+
+class CounterValue:
+    def __init__(self):
+        """Value of one counter"""
+        self.cells = Cells(1)
+
+    def inc(self, amount=1):
+        """Add to the counter"""
+        self.cells.cell()[0] += amount
+
+    def get(self):
+        """Current total"""
+        return self.cells.totals()[0]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def new_child(self):
+        return CounterValue()
+
+    def inc(self, amount=1):
+        """Add to a counter without labels"""
+        self.labels().inc(amount)
+
+class GaugeValue:
+    def __init__(self):
+        """Value of one gauge, set directly or read from a function"""
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        """Set the gauge; a single assignment, so no lock is needed"""
+        self.value = value
+
+    def set_function(self, function):
+        """
+        Read the gauge from a function at export time
+
+        The function runs in the exporter thread, so it must not use objects
+        bound to another thread such as a sqlite3 connection.
+        """
+        self.function = function
+
+    def get(self):
+        """Current value"""
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+
+        return self.value
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def new_child(self):
+        return GaugeValue()
+
+    def set(self, value):
+        """Set a gauge without labels"""
+        self.labels().set(value)
+
+class HistogramValue:
+    def __init__(self, buckets):
+        """
+        Value of one histogram
+
+        Args:
+            buckets (tuple): Sorted upper bounds
+        """
+        self.buckets = buckets
+        # One count per bucket, one for +Inf, then the sum and the count
+        self.cells = Cells(len(buckets) + 3)
+
+    def observe(self, value):
+        """Record one observation"""
+        cell = self.cells.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def get(self):
+        """
+        Current distribution
+
+        Returns:
+            tuple: (cumulative counts per upper bound including +Inf, sum, count)
+        """
+        totals = self.cells.totals()
+        cumulative = []
+        running = 0
+        for count in totals[:-2]:
+            running += count
+            cumulative.append(running)
+
+        return cumulative, totals[-2], totals[-1]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Initialize a histogram family
+
+        Args:
+            name (str): Metric name
+            help_text (str): Description exported with the metric
+            labels (tuple): Label names
+            buckets (tuple): Upper bounds of the buckets
+        """
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def new_child(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value):
+        """Record one observation in a histogram without labels"""
+        self.labels().observe(value)
+
+class Registry:
+    def __init__(self):
+        """Collection of the metrics that are exported together"""
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Add a metric, or return the one already registered under its name
+
+        Args:
+            metric (Metric): New metric
+
+        Returns:
+            Metric: The registered metric
+        """
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        """Get or create a counter"""
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        """Get or create a gauge"""
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram"""
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def to_prometheus(self):
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Returns:
+            str: Text ending with a newline
+        """
+        lines = []
+
+        for metric in sorted(self.metrics.values(), key=lambda metric: metric.name):
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            for labels, child in metric.samples():
+                if metric.kind == "histogram":
+                    cumulative, total, count = child.get()
+                    bounds = [format_value(bound) for bound in metric.buckets] + ["+Inf"]
+                    for bound, bucket_count in zip(bounds, cumulative):
+                        lines.append(f"{metric.name}_bucket{format_labels(labels, le=bound)} {bucket_count}")
+                    lines.append(f"{metric.name}_sum{format_labels(labels)} {format_value(total)}")
+                    lines.append(f"{metric.name}_count{format_labels(labels)} {count}")
+                else:
+                    lines.append(f"{metric.name}{format_labels(labels)} {format_value(child.get())}")
+
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """
+        Snapshot of every metric
+
+        Returns:
+            dict: Metric name -> type, help and samples
+        """
+        snapshot = {}
+
+        for metric in self.metrics.values():
+            samples = []
+            for labels, child in metric.samples():
+                if metric.kind == "histogram":
+                    cumulative, total, count = child.get()
+                    bounds = [str(bound) for bound in metric.buckets] + ["+Inf"]
+                    samples.append({"labels": labels, "buckets": dict(zip(bounds, cumulative)),
+                                    "sum": total, "count": count})
+                else:
+                    samples.append({"labels": labels, "value": child.get()})
+
+            snapshot[metric.name] = {"type": metric.kind, "help": metric.help_text, "samples": samples}
+
+        return snapshot
+
+def format_labels(labels, **extra):
+    """
+    Render labels as {name="value",...}, escaping as Prometheus requires
+
+    Args:
+        labels (dict): Label values
+        **extra: Additional labels, e.g. le for histogram buckets
+
+    Returns:
+        str: Label set, or "" without labels
+    """
+    labels = {**labels, **extra}
+    if not labels:
+        return ""
+
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+def format_value(value):
+    """Render a number the way Prometheus expects"""
+    if isinstance(value, float):
+        if value != value:
+            return "NaN"
+        return repr(value)
+
+    return str(value)
+
+# Registry used by the app
+REGISTRY = Registry()
+
+OPERATIONS = REGISTRY.counter(
+    "flights_operations_total", "Calls of database methods and page actions", ("subsystem", "operation"))
+ERRORS = REGISTRY.counter(
+    "flights_operation_errors_total", "Calls that raised or reported failure", ("subsystem", "operation"))
+DURATION = REGISTRY.histogram(
+    "flights_operation_duration_seconds", "Duration of database methods and page actions",
+    ("subsystem", "operation"))
+
+def instrumented(subsystem, operation=None):
+    """
+    Decorator counting calls, errors and duration of a function
+
+    A call is an error if it raises or returns False, which is how the
+    Database methods report failure.
+
+    Args:
+        subsystem (str): "db" for Database methods, "ui" for page actions
+        operation (str): Name in the metrics, defaults to the function name
+
+    Returns:
+        The decorator
+    """
+    def decorate(function):
+        name = operation or function.__name__
+        calls = OPERATIONS.labels(subsystem, name)
+        errors = ERRORS.labels(subsystem, name)
+        duration = DURATION.labels(subsystem, name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                calls.inc()
+                duration.observe(time.perf_counter() - start)
+
+            if result is False:
+                errors.inc()
+            return result
+
+        return wrapper
+
+    return decorate
+
+def write_atomic(path, text):
+    """
+    Replace a file so readers never see it half written
+
+    Args:
+        path (str): Destination
+        text (str): New contents
+    """
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+class MetricsExporter:
+    def __init__(self, directory, interval=DEFAULT_EXPORT_INTERVAL, registry=REGISTRY, prefix="flights"):
+        """
+        Initialize the exporter
+
+        Args:
+            directory (str): Directory receiving <prefix>.prom and <prefix>.json
+            interval (float): Seconds between exports
+            registry (Registry): Metrics to export
+            prefix (str): File name without extension
+        """
+        self.directory = directory
+        self.interval = interval
+        self.registry = registry
+        self.text_path = os.path.join(directory, f"{prefix}.prom")
+        self.json_path = os.path.join(directory, f"{prefix}.json")
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.started_at = time.time()
+        registry.gauge("flights_start_time_seconds", "Unix time the app started").set(self.started_at)
+
+    def export(self):
+        """Write both files once"""
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self.text_path, self.registry.to_prometheus())
+        write_atomic(self.json_path, json.dumps(
+            {"timestamp": time.time(), "metrics": self.registry.to_dict()}, indent=1))
+
+    def run(self):
+        """Export every interval until stopped (runs in the exporter thread)"""
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"Error exporting metrics: {e}")
+
+    def start(self):
+        """Start exporting in a background thread"""
+        self.thread = threading.Thread(target=self.run, name="metrics-exporter", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the thread and write the final values"""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+        try:
+            self.export()
+        except Exception as e:
+            print(f"Error exporting metrics: {e}")
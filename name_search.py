@@ -0,0 +1,387 @@
+"""
+name_search.py - Typo-tolerant passenger name search
+
+This module finds reservations when the agent misspells a name
+("Mohamed" / "Muhammad", "Smyth" / "Smith"):
+- Every distinct passenger name is stored once in name_index and linked to
+  its words in name_word. Every distinct word is stored once with its
+  phonetic code in word_phonetic and its character trigrams in
+  word_trigram. The tables are indexed and kept current by
+  Database.insert_reservations and Database.update_reservation.
+- A search first finds the words that sound like or share enough trigrams
+  with each query word and ranks those few words by edit distance. It then
+  looks up the names containing the best words. Edit distances are only
+  computed for similar words, never for every passenger.
+
+Usage:
+    python name_search.py search "mohamed ali"
+    python name_search.py rebuild
+"""
+import argparse
+import time
+import unicodedata
+
+from storage import RESERVATION_FIELDS
+
+# Soundex digit of each consonant; vowels, H, W and Y have none
+SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+# Share of the query's trigrams a name must contain to be a candidate
+MIN_TRIGRAM_OVERLAP = 0.5
+
+# Candidate words per query word, and candidate names per search
+MAX_CANDIDATE_WORDS = 1000
+MAX_CANDIDATE_NAMES = 2000
+
+# Largest edit distance per query word still reported as a match
+MAX_DISTANCE_PER_WORD = 3
+
+# Distance given to words with the same phonetic code but more than one
+# edit apart, so "muhammad" ranks just behind a one-letter typo of "mohamed"
+PHONETIC_MATCH_DISTANCE = 1.5
+
+def fold_name(name):
+    """
+    Reduce a name to lowercase ASCII letters and single spaces
+
+    Args:
+        name (str): Raw name, e.g. "  José  O'Brien"
+
+    Returns:
+        str: Folded name, e.g. "jose obrien"
+    """
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(char for char in name if not unicodedata.combining(char)).casefold()
+    words = ("".join(char for char in word if char.isalpha()) for word in name.split())
+
+    return " ".join(word for word in words if word)
+
+def soundex(word):
+    """
+    American Soundex code of one word, e.g. "smyth" -> "S530"
+
+    Args:
+        word (str): Folded word
+
+    Returns:
+        str: Four-character code, or "" for a word without letters
+    """
+    word = word.upper()
+    if not word:
+        return ""
+
+    code = word[0]
+    previous = SOUNDEX_CODES.get(word[0], "")
+
+    for char in word[1:]:
+        digit = SOUNDEX_CODES.get(char, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code; vowels do
+        if char not in "HW":
+            previous = digit
+
+    return code.ljust(4, "0")
+
+def phonetic_codes(folded):
+    """
+    Phonetic codes of every word of a folded name
+
+    Args:
+        folded (str): Result of fold_name()
+
+    Returns:
+        set: Soundex codes
+    """
+    return {soundex(word) for word in folded.split()} - {""}
+
+def trigrams(folded):
+    """
+    Character trigrams of a folded name, with word boundaries marked
+
+    Args:
+        folded (str): Result of fold_name()
+
+    Returns:
+        set: Trigrams, e.g. "ann" -> {" an", "ann", "nn "}
+    """
+    grams = set()
+    for word in folded.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+
+    return grams
+
+def levenshtein(a, b, limit=None):
+    """
+    Edit distance between two strings
+
+    Args:
+        a (str): First string
+        b (str): Second string
+        limit (int): Stop early and return limit + 1 once the distance
+            is known to exceed it
+
+    Returns:
+        int: Number of insertions, deletions and substitutions
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+
+    return previous[-1]
+
+def word_distance(query_word, word):
+    """
+    Edit distance between two words, capped when they sound alike
+
+    Args:
+        query_word (str): Folded query word
+        word (str): Folded word of a name
+
+    Returns:
+        float: Distance
+    """
+    distance = levenshtein(query_word, word, MAX_DISTANCE_PER_WORD)
+    if distance > PHONETIC_MATCH_DISTANCE and soundex(query_word) == soundex(word):
+        return PHONETIC_MATCH_DISTANCE
+
+    return distance
+
+def index_names(cursor, names):
+    """
+    Add names to the name index, skipping names already indexed
+
+    Runs inside the caller's transaction.
+
+    Args:
+        cursor: Cursor of the database connection
+        names (iterable): Passenger names as stored in reservations
+    """
+    for name in set(names):
+        cursor.execute("INSERT OR IGNORE INTO name_index (name) VALUES (?)", (name,))
+        if cursor.rowcount != 1:
+            continue
+
+        name_id = cursor.lastrowid
+        for word in set(fold_name(name).split()):
+            cursor.execute("INSERT OR IGNORE INTO name_word (word, name_id) VALUES (?, ?)", (word, name_id))
+
+            # Codes and trigrams are stored once per distinct word
+            cursor.execute("INSERT OR IGNORE INTO word_phonetic (word, code) VALUES (?, ?)",
+                           (word, soundex(word)))
+            if cursor.rowcount == 1:
+                cursor.executemany("INSERT OR IGNORE INTO word_trigram (gram, word) VALUES (?, ?)",
+                                   [(gram, word) for gram in trigrams(word)])
+
+def rebuild_name_index(db, batch_size=10000):
+    """
+    Recreate the name index from the reservations table
+
+    Also removes entries left behind by names that no longer have
+    reservations.
+
+    Args:
+        db: Database instance
+        batch_size (int): Names read per batch
+
+    Returns:
+        int: Number of distinct names indexed
+    """
+    with db.transaction():
+        for table in ("word_trigram", "word_phonetic", "name_word", "name_index"):
+            db.cursor.execute(f"DELETE FROM {table}")
+
+        cursor = db.conn.cursor()
+        cursor.execute("SELECT DISTINCT name FROM reservations")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            index_names(db.cursor, (row[0] for row in rows))
+        cursor.close()
+
+        db.cursor.execute("SELECT COUNT(*) FROM name_index")
+        return db.cursor.fetchone()[0]
+
+def similar_words(db, query_word):
+    """
+    Find the indexed words close to one query word
+
+    Args:
+        db: Database instance
+        query_word (str): Folded query word
+
+    Returns:
+        dict: Word -> distance, for words within MAX_DISTANCE_PER_WORD
+    """
+    # Words that sound the same
+    db.cursor.execute("SELECT word FROM word_phonetic WHERE code = ? LIMIT ?",
+                      (soundex(query_word), MAX_CANDIDATE_WORDS))
+    candidates = {row[0] for row in db.cursor.fetchall()}
+
+    # Words sharing enough trigrams, which catches typos in the first letter
+    # that Soundex keeps apart
+    grams = sorted(trigrams(query_word))
+    db.cursor.execute(f"""
+    SELECT word
+    FROM word_trigram
+    WHERE gram IN ({", ".join("?" * len(grams))})
+    GROUP BY word
+    HAVING COUNT(*) >= ?
+    ORDER BY COUNT(*) DESC
+    LIMIT ?
+    """, grams + [max(1, int(len(grams) * MIN_TRIGRAM_OVERLAP)), MAX_CANDIDATE_WORDS])
+    candidates.update(row[0] for row in db.cursor.fetchall())
+
+    distances = {}
+    for word in candidates:
+        distance = word_distance(query_word, word)
+        if distance <= MAX_DISTANCE_PER_WORD:
+            distances[word] = distance
+
+    return distances
+
+def find_names(db, term, limit=20):
+    """
+    Find the passenger names closest to a possibly misspelled term
+
+    Every query word is matched with the closest word of a name, so "smyth"
+    finds "John Smith" and "ali mohamed" finds "Muhammad Ali". Names that
+    contain a close word for every query word are preferred.
+
+    Args:
+        db: Database instance
+        term (str): Name or part of a name as typed by the agent
+        limit (int): Number of names to return
+
+    Returns:
+        list: (distance, name) pairs, closest first
+    """
+    query_words = list(dict.fromkeys(fold_name(term).split()))
+    matches = [distances for distances in (similar_words(db, word) for word in query_words) if distances]
+    if not matches:
+        return []
+
+    def names_with(distances):
+        words = sorted(distances, key=distances.get)
+        return f"SELECT name_id FROM name_word WHERE word IN ({', '.join('?' * len(words))})", words
+
+    matched_words = sorted(set().union(*matches))
+    grams = sorted(set().union(*(trigrams(word) for word in query_words)))
+
+    # Names containing a match for every query word, otherwise for any. When
+    # there are too many, keep the names whose matching words share the most
+    # trigrams with the query rather than whichever the scan meets first.
+    for operator in ("INTERSECT", "UNION"):
+        parts = [names_with(distances) for distances in matches]
+        query = f" {operator} ".join(sql for sql, _ in parts)
+        params = [word for _, words in parts for word in words]
+
+        db.cursor.execute(f"""
+        WITH candidates (id) AS ({query})
+        SELECT n.name
+        FROM candidates AS c
+        JOIN name_index AS n ON n.id = c.id
+        JOIN name_word AS w ON w.name_id = c.id AND w.word IN ({", ".join("?" * len(matched_words))})
+        LEFT JOIN word_trigram AS t ON t.word = w.word AND t.gram IN ({", ".join("?" * len(grams))})
+        GROUP BY c.id
+        ORDER BY COUNT(t.gram) DESC, n.name
+        LIMIT ?
+        """, params + matched_words + grams + [MAX_CANDIDATE_NAMES])
+        names = [row[0] for row in db.cursor.fetchall()]
+
+        if names or len(matches) == 1:
+            break
+
+    # Score with the word distances already computed; a query word without
+    # a close word in the name costs more than any match
+    missing = MAX_DISTANCE_PER_WORD + 1
+    ranked = []
+    for name in names:
+        words = fold_name(name).split()
+        distance = sum(min(distances.get(word, missing) for word in words) for distances in matches)
+        distance += missing * (len(query_words) - len(matches))
+        ranked.append((distance, name))
+
+    ranked.sort()
+    return ranked[:limit]
+
+def fuzzy_search_reservations(db, term, limit=200):
+    """
+    Get the reservations of the passengers whose names best match a term
+
+    Args:
+        db: Database instance
+        term (str): Name as typed by the agent
+        limit (int): Maximum number of reservations
+
+    Returns:
+        list: Reservation tuples, best matching names first
+    """
+    names = [name for _, name in find_names(db, term)]
+    if not names:
+        return []
+
+    # The limit applies after ordering by the rank of the name, so the rows
+    # of the best names are the ones kept
+    db.cursor.execute(f"""
+    WITH ranked (name, rank) AS (VALUES {", ".join("(?, ?)" for _ in names)})
+    SELECT {", ".join(f"r.{field}" for field in RESERVATION_FIELDS)}
+    FROM ranked AS k
+    JOIN reservations AS r ON r.name = k.name
+    ORDER BY k.rank, r.id
+    LIMIT ?
+    """, [value for position, name in enumerate(names) for value in (name, position)] + [limit])
+
+    return db.cursor.fetchall()
+
+def main():
+    """Search names or rebuild the name index from the command line"""
+    # Imported here because database.py imports this module
+    from database import Database
+
+    parser = argparse.ArgumentParser(description="Typo-tolerant passenger name search")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    search_parser = subparsers.add_parser("search", help="Find names like a term")
+    search_parser.add_argument("term", help="Name as typed")
+    search_parser.add_argument("--limit", type=int, default=20, help="Names to show")
+    subparsers.add_parser("rebuild", help="Recreate the name index from the reservations")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    start = time.perf_counter()
+    if args.command == "rebuild":
+        count = rebuild_name_index(db)
+        print(f"Indexed {count:,} distinct names in {time.perf_counter() - start:.2f}s")
+    else:
+        for distance, name in find_names(db, args.term, args.limit):
+            print(f"{distance:5.1f}  {name}")
+        print(f"Searched in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
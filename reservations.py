@@ -3,20 +3,29 @@ reservations.py - View and manage reservations
 
 This module handles the view and management of existing reservations:
 - Displays list of reservations
-- Allows searching reservations
+- Allows searching reservations, falling back to a typo-tolerant name search
 - Supports editing and deleting reservations
+- Exports reservations and passenger manifests
 """
+import os
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+
+import exporters
+from metrics import instrumented
 
 class ReservationsPage:
+    # How often the table checks the database for changes while visible
+    POLL_INTERVAL_MS = 2000
+    
     def __init__(self, root, db, go_back, edit_reservation):
         """
         Initialize the reservations page
         
         Args:
             root: The main Tkinter window
-            db: Database instance
+            db: Reservation store (see storage.py)
             go_back: Function to return to home page
             edit_reservation: Function to show edit reservation page
         """
@@ -26,6 +35,10 @@ class ReservationsPage:
         self.edit_reservation = edit_reservation
         self.frame = tk.Frame(root)
         
+        # Changelog cursor of the rows shown in the table and pending poll job
+        self.change_cursor = 0
+        self.poll_job = None
+        
         # Create and place UI elements
         self.create_widgets()
     
@@ -36,6 +49,9 @@ class ReservationsPage:
         header_frame = tk.Frame(self.frame, bg="#0288d1", height=60)
         header_frame.pack(fill=tk.X)
         
+        # Kept so main.py can add the booking reference lookup
+        self.header_frame = header_frame
+        
         # Add plane icon and app name to header with a more professional look
         icon_text = "✈"  # Clean plane icon
         icon_label = tk.Label(
@@ -132,6 +148,18 @@ class ReservationsPage:
         )
         search_btn.pack(side=tk.LEFT)
         
+        # Archived reservations are only searched when asked for
+        self.include_archive_var = tk.BooleanVar(value=False)
+        include_archive_check = tk.Checkbutton(
+            search_frame,
+            text="Include archived",
+            variable=self.include_archive_var,
+            font=("Arial", 10),
+            bg="white",
+            command=self.search_reservations
+        )
+        include_archive_check.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Table view of reservations with shadow effect
         table_shadow_frame = tk.Frame(content_frame, bg="#dddddd")
         table_shadow_frame.pack(fill=tk.BOTH, expand=True, padx=40, pady=(0, 40))
@@ -201,6 +229,21 @@ class ReservationsPage:
         )
         edit_btn.pack(side=tk.RIGHT, padx=5)
         
+        # Export buttons
+        export_btn = ttk.Button(
+            action_frame,
+            text="Export...",
+            command=self.export_reservations
+        )
+        export_btn.pack(side=tk.LEFT, padx=5)
+        
+        manifest_btn = ttk.Button(
+            action_frame,
+            text="Flight Manifest...",
+            command=self.export_manifest
+        )
+        manifest_btn.pack(side=tk.LEFT, padx=5)
+        
         # Refresh button
         refresh_btn = ttk.Button(
             action_frame,
@@ -218,13 +261,52 @@ class ReservationsPage:
         for item in self.tree.get_children():
             self.tree.delete(item)
         
+        # Remember where the changelog is before reading the rows
+        self.change_cursor = self.db.latest_change()
+        
         # Get all reservations from database
-        reservations = self.db.get_all_reservations()
+        reservations = self.db.get_all_reservations(
+            include_archive=self.include_archive_var.get()
+        )
         
-        # Insert into treeview
+        # Insert into treeview, keyed by reservation ID for incremental updates
         for res in reservations:
-            self.tree.insert("", tk.END, values=res)
+            self.tree.insert("", tk.END, iid=str(res[0]), values=res)
     
+    def poll_changes(self):
+        """Apply changes made since the last load without reloading the table"""
+        self.poll_job = self.root.after(self.POLL_INTERVAL_MS, self.poll_changes)
+        
+        # Nothing committed anywhere since the last poll
+        if not self.db.data_changed():
+            return
+        
+        # Search results and archived rows are refreshed by searching again
+        if self.search_entry.get().strip() or self.include_archive_var.get():
+            return
+        
+        changes, self.change_cursor = self.db.changes_since(self.change_cursor)
+        
+        # The changelog was pruned past our cursor, start over
+        if changes is None:
+            self.load_reservations()
+            return
+        
+        # Only the final state of each changed reservation matters
+        changed_ids = {change[2] for change in changes}
+        for reservation_id in changed_ids:
+            iid = str(reservation_id)
+            res = self.db.get_reservation_by_id(reservation_id)
+            
+            if res is None:
+                if self.tree.exists(iid):
+                    self.tree.delete(iid)
+            elif self.tree.exists(iid):
+                self.tree.item(iid, values=res)
+            else:
+                self.tree.insert("", tk.END, iid=iid, values=res)
+    
+    @instrumented("ui", "reservations.search_reservations")
     def search_reservations(self):
         """Search reservations based on search entry"""
         search_term = self.search_entry.get().strip()
@@ -239,11 +321,19 @@ class ReservationsPage:
             self.tree.delete(item)
         
         # Search reservations
-        results = self.db.search_reservations(search_term)
+        results = self.db.search_reservations(
+            search_term,
+            include_archive=self.include_archive_var.get()
+        )
+        
+        # Nothing contains the term: it may be a misspelled name, so fall
+        # back to the typo-tolerant name index (live reservations only)
+        if not results and hasattr(self.db, "search_reservations_fuzzy"):
+            results = self.db.search_reservations_fuzzy(search_term)
         
         # Insert results into treeview
         for res in results:
-            self.tree.insert("", tk.END, values=res)
+            self.tree.insert("", tk.END, iid=str(res[0]), values=res)
     
     def on_reservation_selected(self, event):
         """Handle reservation selection event"""
@@ -266,6 +356,7 @@ class ReservationsPage:
         # Navigate to edit page
         self.edit_reservation(reservation_id)
     
+    @instrumented("ui", "reservations.delete_reservation")
     def delete_reservation(self):
         """Delete selected reservation"""
         selected_items = self.tree.selection()
@@ -289,17 +380,157 @@ class ReservationsPage:
             success = self.db.delete_reservation(reservation_id)
             
             if success:
-                messagebox.showinfo("Success", "Reservation deleted successfully")
+                message = "Reservation deleted successfully"
+                # Tell the agent when the freed seat went to a waitlisted passenger
+                promotion = getattr(self.db, "last_promotion", None)
+                if promotion:
+                    message += f"\n\nSeat {promotion[3]} was given to {promotion[2]} from the waitlist."
+                messagebox.showinfo("Success", message)
                 self.load_reservations()
             else:
                 messagebox.showerror("Error", "Failed to delete reservation")
     
+    @instrumented("ui", "reservations.export_reservations")
+    def export_reservations(self):
+        """Export all reservations to a CSV or JSON Lines file"""
+        path = filedialog.asksaveasfilename(
+            title="Export Reservations",
+            defaultextension=".csv",
+            filetypes=[("CSV file", "*.csv"), ("JSON Lines file", "*.jsonl")]
+        )
+        
+        if not path:
+            return
+        
+        export = exporters.export_jsonl if path.endswith(".jsonl") else exporters.export_csv
+        
+        # Tk variables may only be read on the main thread, not by the worker
+        include_archive = self.include_archive_var.get()
+        
+        self.run_export(
+            "Exporting Reservations",
+            path,
+            lambda db, **kwargs: export(db, path, include_archive=include_archive, **kwargs),
+            self.db.count_reservations(include_archive)
+        )
+    
+    @instrumented("ui", "reservations.export_manifest")
+    def export_manifest(self):
+        """Write the passenger manifest of the selected reservation's flight"""
+        selected_items = self.tree.selection()
+        
+        if not selected_items:
+            messagebox.showinfo("Info", "Please select a reservation on the flight to print")
+            return
+        
+        values = self.tree.item(selected_items[0])["values"]
+        flight_number, date = str(values[2]), str(values[5])
+        
+        path = filedialog.asksaveasfilename(
+            title="Save Passenger Manifest",
+            defaultextension=".txt",
+            initialfile=f"manifest-{flight_number}-{date}.txt",
+            filetypes=[("Text file", "*.txt")]
+        )
+        
+        if not path:
+            return
+        
+        self.run_export(
+            "Writing Manifest",
+            path,
+            lambda db, **kwargs: exporters.export_manifest(db, path, flight_number, date, **kwargs),
+            None
+        )
+    
+    def run_export(self, title, path, export, total):
+        """
+        Run an export in a worker thread with a progress dialog
+        
+        Args:
+            title (str): Dialog title
+            path (str): Output file, removed if the export is cancelled
+            export: Function taking (db, progress=..., cancel_event=...)
+            total (int): Expected number of rows, or None if unknown
+        """
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.geometry("360x130")
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        status_label = tk.Label(dialog, text="Starting...", font=("Arial", 11))
+        status_label.pack(pady=(15, 5))
+        
+        progress_bar = ttk.Progressbar(
+            dialog,
+            length=300,
+            mode="determinate" if total else "indeterminate",
+            maximum=total or 100
+        )
+        progress_bar.pack(pady=5)
+        if not total:
+            progress_bar.start()
+        
+        cancel_event = threading.Event()
+        state = {"written": 0, "done": False, "error": None}
+        
+        cancel_btn = ttk.Button(dialog, text="Cancel", command=cancel_event.set)
+        cancel_btn.pack(pady=5)
+        
+        def on_progress(written):
+            state["written"] = written
+        
+        def worker():
+            # SQLite connections cannot be shared between threads
+            db = self.db.clone()
+            try:
+                export(db, progress=on_progress, cancel_event=cancel_event)
+            except exporters.ExportCancelled:
+                state["error"] = "cancelled"
+            except Exception as e:
+                state["error"] = str(e)
+            finally:
+                db.close()
+                state["done"] = True
+        
+        def update_progress():
+            if not state["done"]:
+                status_label.config(text=f"{state['written']:,} rows written")
+                if total:
+                    progress_bar["value"] = state["written"]
+                dialog.after(100, update_progress)
+                return
+            
+            dialog.destroy()
+            
+            if state["error"] == "cancelled":
+                if os.path.exists(path):
+                    os.remove(path)
+                messagebox.showinfo("Info", "Export cancelled")
+            elif state["error"]:
+                messagebox.showerror("Error", f"Export failed: {state['error']}")
+            else:
+                messagebox.showinfo("Success", f"{state['written']:,} rows written to {path}")
+        
+        threading.Thread(target=worker, daemon=True).start()
+        update_progress()
+    
     def show(self):
         """Display the reservations page"""
         self.frame.pack(fill=tk.BOTH, expand=True)
         # Load reservations when page is shown
         self.load_reservations()
+        
+        # Keep the table current while the page is visible
+        if self.poll_job is None:
+            self.poll_job = self.root.after(self.POLL_INTERVAL_MS, self.poll_changes)
     
     def hide(self):
         """Hide the reservations page"""
         self.frame.pack_forget()
+        
+        # Stop polling while hidden
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+            self.poll_job = None
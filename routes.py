@@ -0,0 +1,352 @@
+"""
+routes.py - Connecting-itinerary search over the flight schedule
+
+This module finds ways to get from one place to another when there is no
+direct flight:
+- FlightGraph keeps the schedule in memory as an adjacency index: for every
+  departure airport, its flights sorted by departure time, and for every
+  route, its flights sorted by departure time
+- The index is built once and then updated from the flight_changes log, so
+  only flights added, changed or removed since the last search are reloaded
+- search() returns the fastest itineraries with up to two stops that respect
+  a minimum and maximum connection time, using a best-first search that
+  stops as soon as enough itineraries are found
+
+Times in the schedule must all be in the same time zone for connection
+times to be meaningful.
+
+Usage:
+    python routes.py Paris Sydney 2025-10-16
+    python routes.py Paris Sydney 2025-10-16 --max-stops 1 --min-connection 60
+"""
+import argparse
+import bisect
+import datetime
+import heapq
+import time
+from collections import namedtuple
+
+from database import Database
+
+# Shortest time allowed between landing and the next departure
+MIN_CONNECTION_MINUTES = 45
+
+# Longest layover considered
+MAX_CONNECTION_HOURS = 24
+
+# Partial itineraries examined before a search gives up
+MAX_EXPANSIONS = 50000
+
+# One scheduled flight; departs and arrives are datetimes (arrives may be None)
+Leg = namedtuple("Leg", "flight_id flight_number departure destination date departs arrives fare")
+
+# A complete journey; duration is a timedelta from first departure to last arrival
+Itinerary = namedtuple("Itinerary", "legs departs arrives duration stops fare")
+
+def airport_key(name):
+    """
+    Key used to match airport names, e.g. " new  YORK" -> "new york"
+
+    Args:
+        name (str): Airport or city name
+
+    Returns:
+        str: Normalized name
+    """
+    return " ".join(str(name).split()).casefold()
+
+def parse_time(value):
+    """
+    Parse a schedule time
+
+    Args:
+        value (str): 'YYYY-MM-DD HH:MM' or None
+
+    Returns:
+        datetime.datetime: Parsed time, or None if missing or malformed
+    """
+    if not value:
+        return None
+
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+class FlightGraph:
+    def __init__(self, db):
+        """
+        Initialize an empty graph; it is loaded on the first refresh()
+
+        Args:
+            db: Database providing get_schedule, get_flights_by_ids and
+                flight_changes_since
+        """
+        self.db = db
+        self.cursor = None
+
+        # flight ID -> Leg
+        self.legs = {}
+
+        # departure key -> sorted list of (departs, flight ID)
+        self.departures = {}
+
+        # (departure key, destination key) -> sorted list of (departs, flight ID)
+        self.routes = {}
+
+    def load(self):
+        """Build the index from the whole schedule"""
+        # Read the cursor first so changes made during the load are replayed
+        cursor = self.db.latest_flight_change()
+
+        self.legs.clear()
+        self.departures.clear()
+        self.routes.clear()
+
+        for row in self.db.get_schedule():
+            self.add_leg(row)
+
+        self.cursor = cursor
+
+    def refresh(self):
+        """
+        Bring the index up to date with the schedule
+
+        Returns:
+            int: Number of flights reloaded
+        """
+        if self.cursor is None:
+            self.load()
+            return len(self.legs)
+
+        changed = set()
+        while True:
+            flight_ids, self.cursor = self.db.flight_changes_since(self.cursor)
+            if not flight_ids:
+                break
+            changed.update(flight_ids)
+
+        if not changed:
+            return 0
+
+        for flight_id in changed:
+            self.remove_leg(flight_id)
+
+        for row in self.db.get_flights_by_ids(changed):
+            self.add_leg(row)
+
+        return len(changed)
+
+    def add_leg(self, row):
+        """
+        Index one flight
+
+        Args:
+            row (tuple): Flight tuple from Database.get_flight
+        """
+        flight_id, flight_number, departure, destination, date, departs_at, arrives_at, fare, _ = row
+
+        departs = parse_time(departs_at)
+        if departs is None:
+            return
+
+        leg = Leg(flight_id, flight_number, departure, destination, date,
+                  departs, parse_time(arrives_at), fare or 0)
+        self.legs[flight_id] = leg
+
+        origin = airport_key(departure)
+        entry = (departs, flight_id)
+        bisect.insort(self.departures.setdefault(origin, []), entry)
+        bisect.insort(self.routes.setdefault((origin, airport_key(destination)), []), entry)
+
+    def remove_leg(self, flight_id):
+        """
+        Remove one flight from the index
+
+        Args:
+            flight_id (int): Flight ID
+        """
+        leg = self.legs.pop(flight_id, None)
+        if leg is None:
+            return
+
+        origin = airport_key(leg.departure)
+        entry = (leg.departs, flight_id)
+
+        for index, key in ((self.departures, origin),
+                           (self.routes, (origin, airport_key(leg.destination)))):
+            entries = index[key]
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+            if not entries:
+                del index[key]
+
+    def legs_between(self, entries, earliest, latest):
+        """
+        Get the legs of a sorted index entry list departing in a time window
+
+        Args:
+            entries (list): Sorted (departs, flight ID) pairs
+            earliest (datetime.datetime): First departure time included
+            latest (datetime.datetime): Departures must be before this time
+
+        Returns:
+            list: Legs in departure order
+        """
+        start = bisect.bisect_left(entries, (earliest,))
+        end = bisect.bisect_left(entries, (latest,), start)
+
+        return [self.legs[flight_id] for _, flight_id in entries[start:end]]
+
+    def search(self, origin, destination, date, max_stops=2, min_connection=MIN_CONNECTION_MINUTES,
+               max_connection_hours=MAX_CONNECTION_HOURS, limit=10):
+        """
+        Find the fastest itineraries leaving on a date
+
+        Partial itineraries are expanded in order of elapsed time, so
+        complete itineraries are found fastest first and the search stops
+        after limit of them.
+
+        Args:
+            origin (str): Departure city
+            destination (str): Final destination
+            date (str): Date of the first flight (YYYY-MM-DD)
+            max_stops (int): Most connections allowed (0 for direct flights only)
+            min_connection (int): Shortest connection in minutes
+            max_connection_hours (int): Longest connection in hours
+            limit (int): Number of itineraries to return
+
+        Returns:
+            list: Itineraries, fastest first
+        """
+        origin = airport_key(origin)
+        destination = airport_key(destination)
+
+        try:
+            day = datetime.datetime.fromisoformat(date)
+        except ValueError:
+            return []
+
+        if origin == destination or origin not in self.departures:
+            return []
+
+        min_gap = datetime.timedelta(minutes=min_connection)
+        max_gap = datetime.timedelta(hours=max_connection_hours)
+
+        # Heap of (elapsed, tie breaker, legs); the tie breaker keeps tuples
+        # from comparing leg lists
+        heap = []
+        counter = 0
+
+        for leg in self.legs_between(self.departures[origin], day, day + datetime.timedelta(days=1)):
+            if leg.arrives is None and airport_key(leg.destination) != destination:
+                continue
+            elapsed = (leg.arrives or leg.departs) - leg.departs
+            heap.append((elapsed, counter, (leg,)))
+            counter += 1
+        heapq.heapify(heap)
+
+        results = []
+        expansions = 0
+
+        while heap and len(results) < limit and expansions < MAX_EXPANSIONS:
+            elapsed, _, path = heapq.heappop(heap)
+            expansions += 1
+            last = path[-1]
+            here = airport_key(last.destination)
+
+            if here == destination:
+                results.append(Itinerary(
+                    legs=list(path),
+                    departs=path[0].departs,
+                    arrives=last.arrives,
+                    duration=elapsed,
+                    stops=len(path) - 1,
+                    fare=sum(leg.fare for leg in path),
+                ))
+                continue
+
+            stops = len(path)
+            if stops > max_stops:
+                continue
+
+            # The last allowed flight must land at the destination, so only
+            # that route needs to be scanned
+            if stops == max_stops:
+                entries = self.routes.get((here, destination))
+            else:
+                entries = self.departures.get(here)
+            if not entries:
+                continue
+
+            visited = {airport_key(leg.departure) for leg in path}
+            for leg in self.legs_between(entries, last.arrives + min_gap, last.arrives + max_gap):
+                next_stop = airport_key(leg.destination)
+                if next_stop in visited:
+                    continue
+                if leg.arrives is None and next_stop != destination:
+                    continue
+
+                arrives = leg.arrives or leg.departs
+                heapq.heappush(heap, (arrives - path[0].departs, counter, path + (leg,)))
+                counter += 1
+
+        return results
+
+def format_itinerary(itinerary):
+    """
+    Describe an itinerary on one line
+
+    Args:
+        itinerary (Itinerary): Search result
+
+    Returns:
+        str: e.g. "FL101 Paris 08:00 -> Dubai 14:30 | FL102 ... (1 stop, 20h30m, 580.00)"
+    """
+    legs = " | ".join(
+        f"{leg.flight_number} {leg.departure} {leg.departs:%Y-%m-%d %H:%M} -> "
+        f"{leg.destination} {leg.arrives:%H:%M}" if leg.arrives else
+        f"{leg.flight_number} {leg.departure} {leg.departs:%Y-%m-%d %H:%M} -> {leg.destination}"
+        for leg in itinerary.legs
+    )
+    hours, minutes = divmod(int(itinerary.duration.total_seconds()) // 60, 60)
+    stops = "direct" if itinerary.stops == 0 else f"{itinerary.stops} stop{'s' if itinerary.stops > 1 else ''}"
+
+    return f"{legs} ({stops}, {hours}h{minutes:02d}m, {itinerary.fare:.2f})"
+
+def main():
+    """Search itineraries from the command line"""
+    parser = argparse.ArgumentParser(description="Find direct and connecting flights")
+    parser.add_argument("origin", help="Departure city")
+    parser.add_argument("destination", help="Final destination")
+    parser.add_argument("date", help="Date of the first flight (YYYY-MM-DD)")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--max-stops", type=int, default=2, help="Most connections allowed")
+    parser.add_argument("--min-connection", type=int, default=MIN_CONNECTION_MINUTES,
+                        help="Shortest connection in minutes")
+    parser.add_argument("--limit", type=int, default=10, help="Number of itineraries")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    graph = FlightGraph(db)
+
+    start = time.perf_counter()
+    graph.refresh()
+    loaded = time.perf_counter()
+    itineraries = graph.search(args.origin, args.destination, args.date, args.max_stops,
+                               args.min_connection, limit=args.limit)
+    searched = time.perf_counter()
+
+    for itinerary in itineraries:
+        print(format_itinerary(itinerary))
+    if not itineraries:
+        print("No itineraries found.")
+
+    print(f"Indexed {len(graph.legs)} flights in {(loaded - start) * 1000:.1f} ms, "
+          f"searched in {(searched - loaded) * 1000:.1f} ms")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
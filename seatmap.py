@@ -0,0 +1,382 @@
+"""
+seatmap.py - Cabin layouts, cached seat occupancy and the seat map widget
+
+This module lets agents pick a free seat instead of typing one blindly:
+- SeatLayout derives the rows and seat letters of a cabin from its capacity
+- OccupancyCache keeps the taken seats of recently viewed flights and drops
+  them when the reservation changelog moves, so each flight costs one
+  indexed query until the next write
+- SeatMap draws the cabin on a canvas once and afterwards only recolors the
+  seats whose state changed
+- allocate_block finds the best block of adjacent free seats for a group by
+  scanning one occupancy bitmap per row
+"""
+import tkinter as tk
+from collections import OrderedDict
+
+from database import DEFAULT_CAPACITY
+
+# Seat letters by largest capacity; spaces are aisles. The letter I is
+# skipped as on most aircraft.
+CABIN_CONFIGURATIONS = (
+    (100, "AB CD"),
+    (220, "ABC DEF"),
+    (None, "ABC DEFG HJK"),
+)
+
+# Flights whose occupancy is kept by OccupancyCache
+CACHED_FLIGHTS = 64
+
+# Size of the seat squares and the gaps between them, in pixels
+CELL_SIZE = 26
+CELL_GAP = 4
+AISLE_WIDTH = 18
+ROW_LABEL_WIDTH = 30
+
+# Fill, outline and text color of each seat state
+SEAT_COLORS = {
+    "free": ("white", "#0288d1", "#0288d1"),
+    "occupied": ("#bdbdbd", "#9e9e9e", "#757575"),
+    "selected": ("#0288d1", "#01579b", "white"),
+}
+
+class SeatLayout:
+    def __init__(self, capacity):
+        """
+        Derive the cabin layout of a flight
+
+        Args:
+            capacity (int): Number of seats
+        """
+        self.capacity = max(1, int(capacity))
+
+        for largest, configuration in CABIN_CONFIGURATIONS:
+            if largest is None or self.capacity <= largest:
+                break
+
+        self.configuration = configuration
+        self.letters = configuration.replace(" ", "")
+        self.rows = -(-self.capacity // len(self.letters))
+
+    def seats(self):
+        """
+        List the seats of the cabin in row order
+
+        Returns:
+            list: (row, letter, seat number) tuples; the last row may be partial
+        """
+        width = len(self.letters)
+
+        return [(index // width + 1, self.letters[index % width],
+                 f"{index // width + 1}{self.letters[index % width]}")
+                for index in range(self.capacity)]
+
+    def aisles(self):
+        """
+        Find the aisles of the cabin
+
+        Returns:
+            set: Positions i such that an aisle runs between letters i and i + 1
+        """
+        positions = set()
+        position = -1
+        for letter in self.configuration:
+            if letter == " ":
+                positions.add(position)
+            else:
+                position += 1
+
+        return positions
+
+    def row_bitmaps(self, occupied):
+        """
+        Encode occupancy as one integer per row
+
+        Bit i of a row is set when the seat with letter i is taken or does
+        not exist (past the capacity in the last row).
+
+        Args:
+            occupied (iterable): Seat numbers taken
+
+        Returns:
+            list: Bitmaps, index 0 for row 1
+        """
+        width = len(self.letters)
+        bitmaps = [0] * self.rows
+
+        # Seats missing from a partial last row count as taken
+        missing = self.rows * width - self.capacity
+        if missing:
+            bitmaps[-1] = ((1 << missing) - 1) << (width - missing)
+
+        positions = {letter: position for position, letter in enumerate(self.letters)}
+        for seat in occupied:
+            row, letter = seat[:-1], seat[-1:]
+            if row.isdigit() and 1 <= int(row) <= self.rows and letter in positions:
+                bitmaps[int(row) - 1] |= 1 << positions[letter]
+
+        return bitmaps
+
+def block_score(aisles, block):
+    """
+    Score a block of seats for a group, lower is better
+
+    A group split over several rows is always worse than one that sits in
+    a single row; within a row, every aisle between group members costs
+    more than sitting a few rows further back.
+
+    Args:
+        aisles (set): Aisle positions from layout.aisles()
+        block (list): (row, position) pairs in row order
+
+    Returns:
+        float: Score
+    """
+    rows = {row for row, _ in block}
+    splits = 0
+    for (row, position), (next_row, next_position) in zip(block, block[1:]):
+        if row == next_row and (next_position != position + 1 or position in aisles):
+            splits += 1
+
+    return (len(rows) - 1) * 100 + splits * 10 + min(rows) * 0.01
+
+def allocate_block(layout, occupied, count):
+    """
+    Find the best block of free seats for a group
+
+    Every run of count free seats in one row is considered first. If none
+    exists, the group is spread over consecutive rows, starting from each
+    row in turn.
+
+    Args:
+        layout (SeatLayout): Cabin
+        occupied (iterable): Seat numbers taken
+        count (int): Group size
+
+    Returns:
+        list: Seat numbers in row order, or None if there are not enough free seats
+    """
+    width = len(layout.letters)
+    bitmaps = layout.row_bitmaps(occupied)
+    aisles = layout.aisles()
+
+    best = None
+    best_score = None
+
+    # Runs within one row: a shifted mask of count bits must not hit a taken seat
+    if count <= width:
+        mask = (1 << count) - 1
+        for row, bitmap in enumerate(bitmaps, 1):
+            for start in range(width - count + 1):
+                if bitmap & (mask << start):
+                    continue
+                block = [(row, position) for position in range(start, start + count)]
+                score = block_score(aisles, block)
+                if best_score is None or score < best_score:
+                    best, best_score = block, score
+
+    # Spread over consecutive rows
+    if best is None:
+        free = [[position for position in range(width) if not bitmap >> position & 1]
+                for bitmap in bitmaps]
+        if sum(len(positions) for positions in free) < count:
+            return None
+
+        for first_row in range(len(bitmaps)):
+            block = []
+            for row in range(first_row, len(bitmaps)):
+                block.extend((row + 1, position) for position in free[row][:count - len(block)])
+                if len(block) == count:
+                    break
+            if len(block) < count:
+                break
+
+            score = block_score(aisles, block)
+            if best_score is None or score < best_score:
+                best, best_score = block, score
+
+    return [f"{row}{layout.letters[position]}" for row, position in best]
+
+def flight_layout(db, flight_number, date):
+    """
+    Get the cabin layout of a flight from the schedule
+
+    Args:
+        db: Reservation store
+        flight_number (str): Flight identifier
+        date (str): Flight date
+
+    Returns:
+        SeatLayout: Layout for the scheduled capacity, or the default capacity
+            if the flight is not scheduled or the store has no schedule
+    """
+    flight = db.get_flight(flight_number, date) if hasattr(db, "get_flight") else None
+
+    return SeatLayout(flight[8] if flight else DEFAULT_CAPACITY)
+
+class OccupancyCache:
+    def __init__(self, db, max_flights=CACHED_FLIGHTS):
+        """
+        Initialize the cache
+
+        Args:
+            db: Reservation store
+            max_flights (int): Number of flights kept, least recently used
+                flights are dropped first
+        """
+        self.db = db
+        self.max_flights = max_flights
+        self.flights = OrderedDict()
+        self.cursor = None
+
+    def occupied(self, flight_number, date):
+        """
+        Get the seats taken on a flight
+
+        Args:
+            flight_number (str): Flight identifier
+            date (str): Flight date
+
+        Returns:
+            frozenset: Seat numbers
+        """
+        # Any reservation write, from this app or another process, moves the
+        # changelog and makes the cached seats stale
+        latest = self.db.latest_change()
+        if latest != self.cursor:
+            self.flights.clear()
+            self.cursor = latest
+
+        key = (flight_number, date)
+        seats = self.flights.get(key)
+
+        if seats is None:
+            seats = frozenset(self.db.get_occupied_seats(flight_number, date))
+            self.flights[key] = seats
+            if len(self.flights) > self.max_flights:
+                self.flights.popitem(last=False)
+        else:
+            self.flights.move_to_end(key)
+
+        return seats
+
+class SeatMap:
+    def __init__(self, parent, layout, on_select=None):
+        """
+        Create the seat map of one cabin
+
+        Args:
+            parent: Tkinter container
+            layout (SeatLayout): Cabin to draw
+            on_select: Function called with the seat number when a free seat
+                is clicked
+        """
+        self.layout = layout
+        self.on_select = on_select
+
+        self.frame = tk.Frame(parent, bg="white")
+
+        # Canvas item IDs (square, label) and current state of every seat
+        self.cells = {}
+        self.states = {}
+        self.occupied = frozenset()
+        self.selected = None
+
+        self.create_widgets()
+
+    def create_widgets(self):
+        """Draw every seat once"""
+        # x position of every letter, leaving a gap at each aisle
+        columns = {}
+        x = ROW_LABEL_WIDTH
+        for letter in self.layout.configuration:
+            if letter == " ":
+                x += AISLE_WIDTH
+                continue
+            columns[letter] = x
+            x += CELL_SIZE + CELL_GAP
+
+        width = x + CELL_GAP
+        height = self.layout.rows * (CELL_SIZE + CELL_GAP) + CELL_GAP
+
+        self.canvas = tk.Canvas(
+            self.frame,
+            width=width,
+            height=min(height, 480),
+            bg="white",
+            highlightthickness=0,
+            scrollregion=(0, 0, width, height)
+        )
+        scrollbar = tk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        fill, outline, text = SEAT_COLORS["free"]
+        for row, letter, seat in self.layout.seats():
+            top = (row - 1) * (CELL_SIZE + CELL_GAP) + CELL_GAP
+
+            if letter == self.layout.letters[0]:
+                self.canvas.create_text(ROW_LABEL_WIDTH // 2, top + CELL_SIZE // 2,
+                                        text=str(row), fill="#757575", font=("Arial", 8))
+
+            left = columns[letter]
+            square = self.canvas.create_rectangle(left, top, left + CELL_SIZE, top + CELL_SIZE,
+                                                  fill=fill, outline=outline, tags=("seat", seat))
+            label = self.canvas.create_text(left + CELL_SIZE // 2, top + CELL_SIZE // 2, text=letter,
+                                            fill=text, font=("Arial", 8), tags=("seat", seat))
+            self.cells[seat] = (square, label)
+            self.states[seat] = "free"
+
+        self.canvas.tag_bind("seat", "<Button-1>", self.click)
+
+    def update(self, occupied, selected=None):
+        """
+        Show new occupancy, recoloring only seats whose state changed
+
+        Args:
+            occupied (frozenset): Seat numbers taken
+            selected (str): Seat chosen by the agent, if any
+
+        Returns:
+            int: Number of seats recolored
+        """
+        occupied = frozenset(occupied)
+        changed = occupied ^ self.occupied
+        changed |= {self.selected, selected}
+
+        self.occupied = occupied
+        self.selected = selected
+
+        recolored = 0
+        for seat in changed:
+            if seat not in self.cells:
+                continue
+
+            state = "selected" if seat == selected else "occupied" if seat in occupied else "free"
+            if self.states[seat] == state:
+                continue
+
+            fill, outline, text = SEAT_COLORS[state]
+            square, label = self.cells[seat]
+            self.canvas.itemconfigure(square, fill=fill, outline=outline)
+            self.canvas.itemconfigure(label, fill=text)
+            self.states[seat] = state
+            recolored += 1
+
+        return recolored
+
+    def click(self, event):
+        """Select the free seat under the mouse"""
+        item = self.canvas.find_withtag("current")
+        if not item:
+            return
+
+        seat = next((tag for tag in self.canvas.gettags(item[0]) if tag in self.cells), None)
+        if seat is None or seat in self.occupied:
+            return
+
+        self.update(self.occupied, seat)
+        if self.on_select:
+            self.on_select(seat)
@@ -0,0 +1,405 @@
+"""
+service.py - Local reservation service and its network client
+
+This module lets several desktop clients share one database without
+opening the SQLite file over a network file system:
+- ReservationService owns the database and serves the Database methods
+  over TCP or a Unix socket
+- RemoteDatabase is a drop-in replacement for Database that calls the
+  service instead of opening the file
+
+The protocol is one JSON object per line. A request is
+{"id": 1, "method": "add_reservation", "params": [...], "kwargs": {...}}
+("kwargs" is optional) and the reply is {"id": 1, "result": ...} or
+{"id": 1, "error": "..."}. Replies to write methods also carry "state": the
+last_error, last_booking_refs and last_promotion the Database set, which
+RemoteDatabase copies so pages read them as from a local Database.
+
+A client cannot hold the service's write lock across round trips, so
+RemoteDatabase has no transaction(); group bookings fall back to inserting
+the group in one add_reservations call (see group_booking.py). Clients may send
+several requests before reading the replies (pipelining); replies come back
+in request order. The "batch" method runs a list of calls in one transaction.
+
+Usage:
+    python service.py --unix /tmp/flights.sock
+    python service.py --host 127.0.0.1 --port 8765
+    FLIGHTS_SERVICE=unix:/tmp/flights.sock python main.py
+"""
+import argparse
+import asyncio
+import json
+import socket
+
+from database import Database, OperationError
+from storage import ReservationStore
+
+# Database methods the service exposes; everything else is refused
+REMOTE_METHODS = (
+    "add_reservation",
+    "add_reservations",
+    "get_all_reservations",
+    "get_reservation_by_id",
+    "get_reservations_page",
+    "update_reservation",
+    "delete_reservation",
+    "search_reservations",
+    "search_reservations_fuzzy",
+    "count_reservations",
+    "get_flight_passengers",
+    "get_occupied_seats",
+    "get_flights",
+    "get_dashboard",
+    "latest_change",
+    "changes_since",
+    "get_flight",
+    "get_flights_by_ids",
+    "get_schedule",
+    "latest_flight_change",
+    "flight_changes_since",
+    "add_to_waitlist",
+    "get_waitlist",
+    "remove_from_waitlist",
+    "get_reservation_by_ref",
+    "get_booking_ref",
+    "get_reservation_history",
+    "get_flight_availability",
+    "set_overbook_limit",
+    "get_route_availability",
+    "get_fare_inputs",
+)
+
+# Methods after which the service reports the outcome attributes of the Database
+WRITE_METHODS = frozenset((
+    "add_reservation",
+    "add_reservations",
+    "update_reservation",
+    "delete_reservation",
+    "add_to_waitlist",
+    "remove_from_waitlist",
+    "set_overbook_limit",
+    "batch",
+))
+
+# Longest request line accepted, in bytes
+MAX_LINE = 16 * 1024 * 1024
+
+# Unsent reply bytes allowed to queue up before the service waits for a client
+WRITE_BUFFER_LIMIT = 256 * 1024
+
+class RemoteError(Exception):
+    """Raised by RemoteDatabase when the service reports an error"""
+
+class ReservationService:
+    def __init__(self, db):
+        """
+        Initialize the service
+
+        Args:
+            db: Database instance owned by the service
+        """
+        self.db = db
+
+    def call(self, method, params, kwargs=None):
+        """
+        Run one request against the database
+
+        Args:
+            method (str): Name of a Database method, or "batch"
+            params (list): Positional arguments
+            kwargs (dict): Keyword arguments
+
+        Returns:
+            The method's result
+        """
+        if method == "batch":
+            return self.call_batch(params)
+
+        if method not in REMOTE_METHODS:
+            raise RemoteError(f"Unknown method: {method}")
+
+        return getattr(self.db, method)(*params, **(kwargs or {}))
+
+    def write_state(self):
+        """
+        Outcome of the last write, as set on the Database
+
+        Returns:
+            dict: last_error, last_booking_refs and last_promotion
+        """
+        return {
+            "last_error": self.db.last_error,
+            "last_booking_refs": self.db.last_booking_refs,
+            "last_promotion": self.db.last_promotion,
+        }
+
+    def call_batch(self, calls):
+        """
+        Run several calls in one transaction, all or nothing
+
+        Args:
+            calls (list): [method, params] or [method, params, kwargs] lists
+
+        Returns:
+            list: Result of each call
+        """
+        results = []
+
+        with self.db.transaction():
+            for method, params, *kwargs in calls:
+                if method == "batch":
+                    raise RemoteError("Batches cannot be nested")
+
+                result = self.call(method, params, *kwargs)
+
+                # Write methods report failure by returning False
+                if result is False:
+                    raise RemoteError(f"{method} failed, batch rolled back")
+                results.append(result)
+
+        return results
+
+    async def handle_client(self, reader, writer):
+        """Serve one client connection until it closes"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                writer.write(self.handle_line(line))
+
+                # Replies are sent as soon as possible; only wait for the client
+                # to read them when it falls behind on a pipelined stream
+                if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def handle_line(self, line):
+        """
+        Decode a request line, run it and encode the reply
+
+        Args:
+            line (bytes): One JSON request
+
+        Returns:
+            bytes: One JSON reply line
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            result = self.call(request["method"], request.get("params", []), request.get("kwargs"))
+            reply = {"id": request_id, "result": result}
+        except Exception as e:
+            reply = {"id": request_id, "error": str(e)}
+
+        # Requests are served one at a time, so this is still the outcome of
+        # this request's write
+        if request_id is not None and request.get("method") in WRITE_METHODS:
+            reply["state"] = self.write_state()
+
+        return json.dumps(reply, separators=(",", ":")).encode() + b"\n"
+
+    async def serve(self, host=None, port=None, unix_path=None):
+        """
+        Listen for clients until cancelled
+
+        Args:
+            host (str): TCP host to listen on
+            port (int): TCP port to listen on
+            unix_path (str): Unix socket path, used instead of TCP when given
+        """
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_client, unix_path, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+
+        async with server:
+            await server.serve_forever()
+
+class RemoteDatabase:
+    def __init__(self, address):
+        """
+        Connect to a reservation service
+
+        Args:
+            address (str): "unix:/path/to/socket" or "host:port"
+        """
+        self.address = address
+        self.db_name = None
+        self.next_id = 0
+
+        if address.startswith("unix:"):
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(address[len("unix:"):])
+        else:
+            host, port = address.rsplit(":", 1)
+            self.sock = socket.create_connection((host, int(port)))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.stream = self.sock.makefile("rwb")
+
+        # Last change cursor seen by data_changed()
+        self._last_change = None
+
+        # Outcome of the last write, copied from the service's replies
+        self.last_error = None
+        self.last_booking_refs = []
+        self.last_promotion = None
+
+    def __getattr__(self, method):
+        """Expose every remote method as a regular method"""
+        if method not in REMOTE_METHODS:
+            raise AttributeError(method)
+
+        return lambda *params, **kwargs: self.call(method, *params, **kwargs)
+
+    def send(self, method, params, kwargs=None):
+        """Write one request without waiting for the reply"""
+        self.next_id += 1
+        request = {"id": self.next_id, "method": method, "params": list(params)}
+        if kwargs:
+            request["kwargs"] = kwargs
+        self.stream.write(json.dumps(request, separators=(",", ":")).encode() + b"\n")
+
+    def receive(self):
+        """Read one reply and return its result"""
+        line = self.stream.readline()
+        if not line:
+            raise RemoteError("Connection to the reservation service closed")
+
+        reply = json.loads(line)
+
+        state = reply.get("state")
+        if state is not None:
+            error = state["last_error"]
+            self.last_error = OperationError(*error) if error else None
+            self.last_booking_refs = state["last_booking_refs"] or []
+            promotion = state["last_promotion"]
+            self.last_promotion = tuple(promotion) if promotion else None
+
+        if "error" in reply:
+            raise RemoteError(reply["error"])
+
+        return reply["result"]
+
+    def call(self, method, *params, **kwargs):
+        """
+        Call a method on the service and wait for the result
+
+        Args:
+            method (str): Database method name
+            *params: Positional arguments
+            **kwargs: Keyword arguments
+
+        Returns:
+            The method's result
+        """
+        self.send(method, params, kwargs)
+        self.stream.flush()
+
+        return self.receive()
+
+    def pipeline(self, calls):
+        """
+        Send several calls at once, then read all the replies
+
+        Each call is its own transaction; use batch() for all or nothing.
+
+        Args:
+            calls (list): (method, params) pairs
+
+        Returns:
+            list: Result of each call
+        """
+        for method, params in calls:
+            self.send(method, params)
+        self.stream.flush()
+
+        return [self.receive() for _ in calls]
+
+    def batch(self, calls):
+        """
+        Run several calls in one transaction on the service
+
+        Args:
+            calls (list): (method, params) pairs
+
+        Returns:
+            list: Result of each call
+        """
+        return self.call("batch", *[[method, list(params)] for method, params in calls])
+
+    def data_changed(self):
+        """
+        Check whether reservations changed since the last call
+
+        Returns:
+            bool: True if anything was written since the previous call
+        """
+        latest = self.latest_change()
+        changed = self._last_change is not None and latest != self._last_change
+        self._last_change = latest
+
+        return changed
+
+    def iter_reservations(self, batch_size=1000, include_archive=False):
+        """
+        Stream all reservations in batches, one page request per batch
+
+        Yields:
+            list: Next batch of reservation lists
+        """
+        after_id = 0
+        while True:
+            batch = self.get_reservations_page(after_id, batch_size, include_archive)
+            if not batch:
+                break
+            yield batch
+            after_id = batch[-1][0]
+
+    def clone(self):
+        """
+        Open another connection to the same service
+
+        Returns:
+            RemoteDatabase: New client, e.g. for use in a worker thread
+        """
+        return RemoteDatabase(self.address)
+
+    def close(self):
+        """Close the connection to the service"""
+        self.stream.close()
+        self.sock.close()
+
+# RemoteDatabase provides the interface through __getattr__
+ReservationStore.register(RemoteDatabase)
+
+def main():
+    """Run the reservation service"""
+    parser = argparse.ArgumentParser(description="Serve the reservations database to clients")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port")
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    service = ReservationService(db)
+
+    where = args.unix or f"{args.host}:{args.port}"
+    print(f"Reservation service for {args.db} listening on {where}")
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+storage.py - Storage engine interface for reservations
+
+This module defines what the pages expect from a reservation store, so the
+SQLite database can be swapped for another engine:
+- database.Database: SQLite file (the default)
+- memory_store.MemoryDatabase: in-memory indexed engine for kiosks and tests
+- service.RemoteDatabase: client of the reservation service
+
+Every method that returns reservations returns sequences in the order of
+RESERVATION_FIELDS.
+"""
+from abc import ABC, abstractmethod
+
+# Order of the values in every reservation row
+RESERVATION_FIELDS = ("id", "name", "flight_number", "departure", "destination", "date", "seat_number")
+
+class ReservationStore(ABC):
+    """Operations every storage engine provides"""
+
+    @abstractmethod
+    def add_reservation(self, name, flight_number, departure, destination, date, seat_number):
+        """Add a reservation, return True if successful"""
+
+    @abstractmethod
+    def add_reservations(self, reservations):
+        """Add several (name, flight_number, departure, destination, date, seat_number)
+        tuples atomically, return True if all were added"""
+
+    @abstractmethod
+    def get_all_reservations(self, include_archive=False):
+        """Return every reservation"""
+
+    @abstractmethod
+    def get_reservation_by_id(self, reservation_id):
+        """Return one reservation, or None"""
+
+    @abstractmethod
+    def get_reservations_page(self, after_id=0, limit=100, include_archive=False):
+        """Return up to limit reservations with an ID above after_id, ordered by ID"""
+
+    @abstractmethod
+    def update_reservation(self, reservation_id, name, flight_number, departure, destination, date, seat_number):
+        """Replace a reservation's details, return True if successful"""
+
+    @abstractmethod
+    def delete_reservation(self, reservation_id):
+        """Delete a reservation, return True if successful"""
+
+    @abstractmethod
+    def search_reservations(self, search_term, include_archive=False):
+        """Return reservations whose name, flight or route contains the term"""
+
+    @abstractmethod
+    def iter_reservations(self, batch_size=1000, include_archive=False):
+        """Yield every reservation in lists of at most batch_size"""
+
+    @abstractmethod
+    def count_reservations(self, include_archive=False):
+        """Return the number of reservations"""
+
+    @abstractmethod
+    def get_flight_passengers(self, flight_number, date):
+        """Return the reservations of one flight ordered by seat, each followed
+        by its booking reference (None if it has none yet)"""
+
+    @abstractmethod
+    def get_occupied_seats(self, flight_number, date):
+        """Return the seat numbers taken on one flight"""
+
+    @abstractmethod
+    def get_flights(self):
+        """Return (flight_number, date, departure, destination, booked) per flight"""
+
+    @abstractmethod
+    def get_dashboard(self, today, limit=5):
+        """Return the home page figures, see Database.get_dashboard"""
+
+    @abstractmethod
+    def latest_change(self):
+        """Return the cursor of the most recent change"""
+
+    @abstractmethod
+    def changes_since(self, cursor, limit=1000):
+        """Return (changes, cursor) for changes after the cursor"""
+
+    @abstractmethod
+    def data_changed(self):
+        """Return True if anything was written since the previous call"""
+
+    @abstractmethod
+    def clone(self):
+        """Return a store usable from another thread"""
+
+    @abstractmethod
+    def close(self):
+        """Release the store's resources"""
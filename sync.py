@@ -0,0 +1,447 @@
+"""
+sync.py - Incremental file-based sync of reservations between offices
+
+Each office runs its own flights.db. Instead of shipping whole database
+files, offices exchange changesets:
+- A changeset holds the latest state of every reservation changed since the
+  last export to that office, read from the audit trail (see audit.py), as
+  gzip-compressed JSON Lines. Its size depends on the number of changed
+  reservations, not on the size of the database.
+- Booking references are only unique within one office, so a reservation is
+  known everywhere by its home (the office that created it) and its
+  reference there. The sync_keys table maps the reservations received from
+  other offices to their local rows.
+- A received reservation whose reference is already used here by another
+  reservation is not applied; it is recorded in sync_conflicts for an agent
+  to resolve instead of overwriting an unrelated passenger
+- Applying a changeset is idempotent: every record carries the time and the
+  office of the change, and a record only replaces the local state if it is
+  newer (last writer wins, ties broken by office ID), so applying the same
+  file twice, or files in a different order, gives the same result
+- Changes applied from a changeset are recorded in the audit trail with the
+  actor "sync:<office>" and are never sent back to that office. Changes are
+  relayed to other offices, so offices can sync in a chain or a star.
+- Archiving is local housekeeping and is not synced
+
+Offices compare change times, so their clocks should be kept in sync (NTP).
+
+Usage:
+    python sync.py init paris                        # once, name this office
+    python sync.py export london to_london.jsonl.gz
+    python sync.py apply from_paris.jsonl.gz
+    python sync.py status
+    python sync.py conflicts
+"""
+import argparse
+import gzip
+import json
+import secrets
+import time
+
+from audit import reservation_image
+from database import Database, RESERVATION_COLUMNS
+from name_search import index_names
+
+# First line of every changeset
+CHANGESET_FORMAT = "flights-changeset"
+CHANGESET_VERSION = 2
+
+# Actor prefix of changes applied from a changeset
+SYNC_ACTOR_PREFIX = "sync:"
+
+# Reservation fields carried by a changeset; IDs are local to each office
+SYNC_FIELDS = ("name", "flight_number", "departure", "destination", "date", "seat_number")
+
+class SyncError(Exception):
+    """Raised when a changeset cannot be exported or applied; nothing was changed"""
+
+def site_id(db):
+    """
+    Get the ID of this office, creating a random one on first use
+
+    Args:
+        db: Database instance
+
+    Returns:
+        str: Office ID
+    """
+    site = db.get_meta("sync_site_id")
+    if site is None:
+        site = secrets.token_hex(4)
+        db.set_meta("sync_site_id", site)
+
+    return site
+
+def set_site_id(db, site):
+    """
+    Name this office; do it before the first sync, as other offices know
+    changes by the ID of the office they come from
+
+    Args:
+        db: Database instance
+        site (str): Office ID, e.g. "paris"
+    """
+    if not site or site.startswith(SYNC_ACTOR_PREFIX) or ":" in site:
+        raise SyncError(f"Invalid office ID: {site!r}")
+
+    db.set_meta("sync_site_id", site)
+
+def get_state(db, site):
+    """
+    Get the sync position with another office
+
+    Args:
+        db: Database instance
+        site (str): Other office's ID
+
+    Returns:
+        tuple: (last local audit seq exported to it, last of its seqs applied here)
+    """
+    db.cursor.execute('SELECT exported_seq, imported_seq FROM sync_state WHERE site_id = ?', (site,))
+    row = db.cursor.fetchone()
+
+    return row if row else (0, 0)
+
+def change_origin(actor, here):
+    """
+    Office where a change was made
+
+    Args:
+        actor (str): Actor of the audit entry
+        here (str): This office's ID
+
+    Returns:
+        str: Office ID
+    """
+    if actor.startswith(SYNC_ACTOR_PREFIX):
+        return actor[len(SYNC_ACTOR_PREFIX):]
+
+    return here
+
+def export_changes(db, peer, path, full=False, batch_size=10000):
+    """
+    Write the changes another office has not received yet
+
+    Args:
+        db: Database instance
+        peer (str): ID of the office the file is for
+        path (str): Changeset file to write (gzip)
+        full (bool): Export the whole audit trail instead of the changes
+            since the last export, e.g. if a file was lost
+        batch_size (int): Audit entries read at a time
+
+    Returns:
+        int: Number of reservations in the changeset
+    """
+    here = site_id(db)
+    if peer == here:
+        raise SyncError("Cannot export to this office itself")
+
+    exported_seq, _ = get_state(db, peer)
+    since = 0 if full else exported_seq
+
+    # Latest state of every changed reservation, in order of last change
+    latest = {}
+    last_seq = since
+
+    cursor = db.conn.cursor()
+    cursor.execute('''
+    SELECT a.seq, a.booking_ref, a.operation, a.actor, a.at, a.after, k.home, k.ref
+    FROM audit_log AS a
+    LEFT JOIN sync_keys AS k ON k.reservation_id = a.reservation_id
+    WHERE a.seq > ?
+    ORDER BY a.seq
+    ''', (since,))
+
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+
+        for seq, booking_ref, operation, actor, at, after, home, home_ref in rows:
+            last_seq = seq
+            if booking_ref is None or operation == "archive":
+                continue
+
+            # Reservations created here have no sync key
+            key = (home, home_ref) if home else (here, booking_ref)
+            latest.pop(key, None)
+
+            # The peer already has its own changes
+            origin = change_origin(actor, here)
+            if origin == peer:
+                continue
+
+            record = {"home": key[0], "ref": key[1], "at": at, "origin": origin}
+            if operation == "delete":
+                record["op"] = "delete"
+            else:
+                image = json.loads(after)
+                record["op"] = "upsert"
+                record["row"] = {field: image[field] for field in SYNC_FIELDS}
+            latest[key] = record
+
+    cursor.close()
+
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"format": CHANGESET_FORMAT, "version": CHANGESET_VERSION,
+                            "site": here, "to": peer, "from_seq": since, "to_seq": last_seq}) + "\n")
+        for record in latest.values():
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    # Only move the sync point once the file is complete
+    db.cursor.execute('''
+    INSERT INTO sync_state (site_id, exported_seq) VALUES (?, ?)
+    ON CONFLICT (site_id) DO UPDATE SET exported_seq = excluded.exported_seq
+    ''', (peer, last_seq))
+    db.commit()
+
+    return len(latest)
+
+def resolve(db, home, ref, here):
+    """
+    Find the local reservation a changeset record is about
+
+    Args:
+        db: Database instance
+        home (str): Office that created the reservation
+        ref (str): Its booking reference at that office
+        here (str): This office's ID
+
+    Returns:
+        int: Local reservation ID, also of a reservation deleted since, or
+            None if the reservation was never here
+    """
+    db.cursor.execute('SELECT reservation_id FROM sync_keys WHERE home = ? AND ref = ?', (home, ref))
+    row = db.cursor.fetchone()
+    if row:
+        return row[0]
+
+    if home != here:
+        return None
+
+    # Created here: the latest reservation with this reference that did not
+    # come from another office
+    db.cursor.execute('''
+    SELECT reservation_id FROM audit_log
+    WHERE booking_ref = ?
+      AND reservation_id NOT IN (SELECT reservation_id FROM sync_keys)
+    ORDER BY seq DESC LIMIT 1
+    ''', (ref,))
+    row = db.cursor.fetchone()
+
+    return row[0] if row else None
+
+def local_version(db, reservation_id, here):
+    """
+    Time and office of the last local change of a reservation
+
+    Args:
+        db: Database instance
+        reservation_id (int): Local reservation ID
+        here (str): This office's ID
+
+    Returns:
+        tuple: (time, office ID), or None if the reservation was never changed
+            since the audit trail exists
+    """
+    db.cursor.execute('''
+    SELECT at, actor FROM audit_log WHERE reservation_id = ? ORDER BY seq DESC LIMIT 1
+    ''', (reservation_id,))
+    row = db.cursor.fetchone()
+
+    return (row[0], change_origin(row[1], here)) if row else None
+
+def record_conflict(db, record, local_id):
+    """
+    Keep a record that would overwrite an unrelated reservation, inside the
+    caller's transaction
+
+    Args:
+        db: Database instance
+        record (dict): Changeset record
+        local_id (int): ID of the local reservation holding the reference
+    """
+    db.cursor.execute('''
+    INSERT INTO sync_conflicts (home, ref, origin, at, record, local_id)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (record["home"], record["ref"], record["origin"], record["at"],
+          json.dumps(record, separators=(",", ":")), local_id))
+
+def apply_record(db, record, reservation_id, here):
+    """
+    Write one changeset record, inside the caller's transaction
+
+    The waitlist is not promoted on a delete: the office that made the
+    change promoted its own waitlist and sends that booking too.
+
+    Args:
+        db: Database instance
+        record (dict): Changeset record
+        reservation_id (int): Local reservation from resolve(), or None
+        here (str): This office's ID
+
+    Returns:
+        str: "applied", "skipped" (nothing to delete) or "conflict" (the
+            booking reference is taken here by another reservation)
+    """
+    booking_ref = record["ref"]
+    actor = SYNC_ACTOR_PREFIX + record["origin"]
+
+    before = None
+    if reservation_id is not None:
+        db.cursor.execute(f'''
+        SELECT {RESERVATION_COLUMNS}, booking_ref FROM reservations WHERE id = ?
+        ''', (reservation_id,))
+        row = db.cursor.fetchone()
+        before = reservation_image(row) if row else None
+
+    if record["op"] == "delete":
+        if before is None:
+            return "skipped"
+        db.cursor.execute('DELETE FROM reservations WHERE id = ?', (before["id"],))
+        db.audit.record("delete", before=before, actor=actor, at=record["at"])
+        return "applied"
+
+    values = [record["row"][field] for field in SYNC_FIELDS]
+
+    if before is None:
+        # The reference may be used here by an unrelated reservation
+        db.cursor.execute('SELECT id FROM reservations WHERE booking_ref = ?', (booking_ref,))
+        taken = db.cursor.fetchone()
+        if taken:
+            record_conflict(db, record, taken[0])
+            return "conflict"
+
+        db.cursor.execute(f'''
+        INSERT INTO reservations ({", ".join(SYNC_FIELDS)}, booking_ref)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', values + [booking_ref])
+        new_id = db.cursor.lastrowid
+
+        if record["home"] != here:
+            db.cursor.execute('DELETE FROM sync_keys WHERE home = ? AND ref = ?', (record["home"], booking_ref))
+            db.cursor.execute('INSERT INTO sync_keys (reservation_id, home, ref) VALUES (?, ?, ?)',
+                              (new_id, record["home"], booking_ref))
+
+        after = dict(zip(SYNC_FIELDS, values), id=new_id, booking_ref=booking_ref)
+        db.audit.record("insert", after=after, actor=actor, at=record["at"])
+    else:
+        db.cursor.execute(f'''
+        UPDATE reservations SET {", ".join(f"{field} = ?" for field in SYNC_FIELDS)}
+        WHERE id = ?
+        ''', values + [before["id"]])
+        after = dict(before, **record["row"])
+        db.audit.record("update", before=before, after=after, actor=actor, at=record["at"])
+
+    index_names(db.cursor, [record["row"]["name"]])
+    return "applied"
+
+def apply_changes(db, path):
+    """
+    Apply a changeset from another office in one transaction
+
+    Args:
+        db: Database instance
+        path (str): Changeset file written by export_changes()
+
+    Returns:
+        tuple: (records applied, records skipped because the local state is
+            the same or newer, records kept in sync_conflicts)
+    """
+    here = site_id(db)
+    applied = skipped = conflicts = 0
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("format") != CHANGESET_FORMAT or header.get("version") != CHANGESET_VERSION:
+                raise SyncError(f"{path} is not a changeset")
+            if header["site"] == here:
+                raise SyncError(f"{path} was exported by this office")
+
+            with db.transaction(immediate=True):
+                for line in f:
+                    record = json.loads(line)
+
+                    reservation_id = resolve(db, record["home"], record["ref"], here)
+                    local = local_version(db, reservation_id, here) if reservation_id is not None else None
+                    if local is not None and (record["at"], record["origin"]) <= local:
+                        skipped += 1
+                        continue
+
+                    outcome = apply_record(db, record, reservation_id, here)
+                    if outcome == "applied":
+                        applied += 1
+                    elif outcome == "conflict":
+                        conflicts += 1
+                    else:
+                        skipped += 1
+
+                db.cursor.execute('''
+                INSERT INTO sync_state (site_id, imported_seq) VALUES (?, ?)
+                ON CONFLICT (site_id) DO UPDATE SET imported_seq = MAX(imported_seq, excluded.imported_seq)
+                ''', (header["site"], header["to_seq"]))
+    except (OSError, ValueError, KeyError) as e:
+        raise SyncError(f"Cannot apply {path}: {e}") from e
+
+    return applied, skipped, conflicts
+
+def main():
+    """Export, apply or inspect changesets from the command line"""
+    parser = argparse.ArgumentParser(description="Sync reservations between offices")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = subparsers.add_parser("init", help="Name this office")
+    init_parser.add_argument("site", help="Office ID, e.g. paris")
+
+    export_parser = subparsers.add_parser("export", help="Write the changes for another office")
+    export_parser.add_argument("peer", help="ID of the receiving office")
+    export_parser.add_argument("path", help="Changeset file to write (.jsonl.gz)")
+    export_parser.add_argument("--full", action="store_true",
+                               help="Export everything, not only the changes since the last export")
+
+    apply_parser = subparsers.add_parser("apply", help="Apply a changeset from another office")
+    apply_parser.add_argument("path", help="Changeset file")
+
+    subparsers.add_parser("status", help="Show the sync position with every office")
+    subparsers.add_parser("conflicts", help="List received reservations whose reference is taken here")
+    args = parser.parse_args()
+
+    db = Database(args.db)
+
+    try:
+        start = time.perf_counter()
+        if args.command == "init":
+            set_site_id(db, args.site)
+            print(f"This office is {args.site}")
+        elif args.command == "export":
+            count = export_changes(db, args.peer, args.path, args.full)
+            print(f"Exported {count} reservations to {args.path} in {time.perf_counter() - start:.2f}s")
+        elif args.command == "apply":
+            applied, skipped, conflicts = apply_changes(db, args.path)
+            print(f"Applied {applied} changes, skipped {skipped} in {time.perf_counter() - start:.2f}s")
+            if conflicts:
+                print(f"{conflicts} reservations conflict with local booking references, "
+                      "see python sync.py conflicts")
+        elif args.command == "conflicts":
+            db.cursor.execute('''
+            SELECT id, home, ref, origin, at, record, local_id FROM sync_conflicts ORDER BY id
+            ''')
+            for conflict_id, home, ref, origin, at, record, local_id in db.cursor.fetchall():
+                row = json.loads(record).get("row") or {}
+                print(f"{conflict_id}: {home}/{ref} ({row.get('name', 'deleted')}, changed at {origin} "
+                      f"{at[:19]}) - {ref} is reservation {local_id} here")
+        else:
+            print(f"This office: {site_id(db)}")
+            db.cursor.execute('SELECT site_id, exported_seq, imported_seq FROM sync_state ORDER BY site_id')
+            for site, exported_seq, imported_seq in db.cursor.fetchall():
+                print(f"{site}: exported up to entry {exported_seq}, applied its entries up to {imported_seq}")
+    except SyncError as e:
+        print(f"Error: {e}")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Shared fixtures for the test suite
+
+The app's modules live at the top of the repository, so it is put on the
+import path here. Every test gets its own database files in a temporary
+directory.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+# A date far enough ahead that no test depends on today
+FLIGHT_DATE = "2030-06-01"
+
+def open_database(directory, name="flights.db", **kwargs):
+    """Open a Database whose files all live in a directory"""
+    return Database(
+        os.path.join(directory, name),
+        archive_name=os.path.join(directory, "archive_" + name),
+        **kwargs
+    )
+
+@pytest.fixture
+def db(tmp_path):
+    """Empty database in a temporary directory"""
+    database = open_database(str(tmp_path))
+    yield database
+    database.close()
+
+def booking(name, seat, flight_number="FL100", departure="Paris", destination="London", date=FLIGHT_DATE):
+    """Reservation tuple as taken by add_reservations"""
+    return (name, flight_number, departure, destination, date, seat)
@@ -0,0 +1,27 @@
+"""Tests of moving past reservations into the archive database"""
+from archive import archive_reservations
+from conftest import booking
+
+def test_past_reservations_move_to_the_archive(db):
+    db.add_reservations([booking("Ann Lee", "1A", date="2020-01-01"),
+                         booking("Bo Chen", "1B", date="2020-02-01"),
+                         booking("Cy Diaz", "1C", date="2030-01-01")])
+    old_ref = db.get_booking_ref(db.get_all_reservations()[0][0])
+
+    assert archive_reservations(db, "2021-01-01", batch_size=1) == 2
+
+    assert [row[1] for row in db.get_all_reservations()] == ["Cy Diaz"]
+    assert [row[1] for row in db.get_all_reservations(include_archive=True)] == ["Cy Diaz", "Ann Lee", "Bo Chen"]
+    assert [row[1] for row in db.search_reservations("Ann", include_archive=True)] == ["Ann Lee"]
+    assert db.count_reservations() == 1
+
+    # The move is part of the reservation's history
+    history = db.get_reservation_history(booking_ref=old_ref)
+    assert [entry.operation for entry in history] == ["insert", "archive"]
+
+def test_running_again_moves_nothing(db):
+    db.add_reservation(*booking("Ann Lee", "1A", date="2020-01-01"))
+
+    assert archive_reservations(db, "2021-01-01") == 1
+    assert archive_reservations(db, "2021-01-01") == 0
+    assert len(db.get_all_reservations(include_archive=True)) == 1
@@ -0,0 +1,78 @@
+"""Tests of the hash-chained audit trail"""
+import pytest
+
+from audit import GENESIS_HASH, entry_hash, format_entry, get_history, verify_chain
+from conftest import booking
+
+@pytest.fixture
+def audited(db):
+    """Two reservations, one updated and one deleted: five entries"""
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+    db.update_reservation(1, *booking("Ann Lee", "2C"))
+    db.add_reservation(*booking("Cy Diaz", "1C"))
+    db.delete_reservation(2)
+
+    return db
+
+def rows(db):
+    db.cursor.execute("SELECT seq, reservation_id, booking_ref, operation, actor, at, before, after, hash "
+                      "FROM audit_log ORDER BY seq")
+    return db.cursor.fetchall()
+
+def test_every_entry_is_chained_to_the_previous_one(audited):
+    log = rows(audited)
+
+    assert [row[0] for row in log] == [1, 2, 3, 4, 5]
+    previous_hash = GENESIS_HASH
+    for row in log:
+        assert row[-1] == entry_hash(previous_hash, *row[:-1])
+        previous_hash = row[-1]
+
+    assert verify_chain(audited, batch_size=2) == (5, None)
+
+def test_edited_entry_breaks_the_chain(audited):
+    audited.cursor.execute("UPDATE audit_log SET actor = 'mallory' WHERE seq = 3")
+    audited.commit()
+
+    assert verify_chain(audited) == (2, 3)
+
+def test_deleted_entry_breaks_the_chain(audited):
+    audited.cursor.execute("DELETE FROM audit_log WHERE seq = 2")
+    audited.commit()
+
+    assert verify_chain(audited) == (1, 3)
+
+def test_history_of_one_reservation(audited):
+    history = get_history(audited, 1)
+
+    assert [entry.operation for entry in history] == ["insert", "update"]
+    assert history[1].before["seat_number"] == "1A"
+    assert history[1].after["seat_number"] == "2C"
+    assert format_entry(history[1]).endswith("update seat_number: 1A -> 2C")
+
+    # The deleted reservation is found by its booking reference
+    deleted = get_history(audited, 2)
+    assert [entry.operation for entry in deleted] == ["insert", "delete"]
+    assert deleted[1].after is None
+    assert get_history(audited, booking_ref=deleted[0].booking_ref) == deleted
+
+def test_rolled_back_transaction_leaves_no_entries(audited):
+    with pytest.raises(RuntimeError):
+        with audited.transaction():
+            audited.add_reservation(*booking("Di Eve", "3A"))
+            assert audited.audit.pending
+            raise RuntimeError("cancelled")
+
+    assert audited.audit.pending == []
+    assert len(rows(audited)) == 5
+
+    # The next change continues the chain where it was
+    audited.add_reservation(*booking("Ed Fox", "3B"))
+    assert verify_chain(audited) == (6, None)
+
+def test_failed_write_discards_its_entries(audited):
+    audited.add_flight("FL100", "Paris", "London", "2030-06-01", 100.0, capacity=2)
+
+    assert audited.add_reservations([booking("Di Eve", "3A"), booking("Ed Fox", "3B")]) is False
+    assert audited.audit.pending == []
+    assert len(rows(audited)) == 5
@@ -0,0 +1,64 @@
+"""Tests of online backups, their verification and restore"""
+import os
+import sqlite3
+
+from backup import BackupManager, verify_backup
+from conftest import booking, open_database
+
+def test_backup_is_verified_and_restores(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    db.close()
+
+    manager = BackupManager(str(tmp_path / "flights.db"), str(tmp_path / "backups"), pages_per_step=1, step_pause=0)
+    steps = []
+    path = manager.create_backup(progress=lambda copied, total: steps.append((copied, total)))
+
+    assert path is not None and verify_backup(path) is None
+    assert steps and steps[-1][0] == steps[-1][1]
+    assert manager.list_backups() == [path]
+
+    # Later changes are undone by the restore; the replaced file is kept
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Bo Chen", "1B"))
+    db.close()
+
+    assert manager.restore(path)
+
+    db = open_database(str(tmp_path))
+    assert [row[1] for row in db.get_all_reservations()] == ["Ann Lee"]
+    db.close()
+    assert os.path.exists(str(tmp_path / "flights.db.before-restore"))
+
+def test_damaged_backup_is_refused(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    db.close()
+
+    manager = BackupManager(str(tmp_path / "flights.db"), str(tmp_path / "backups"), step_pause=0)
+    path = manager.create_backup()
+
+    with open(path, "r+b") as f:
+        f.seek(200)
+        f.write(b"damaged")
+
+    assert verify_backup(path) == "checksum mismatch"
+    assert not manager.restore(path)
+
+    os.remove(path + ".sha256")
+    assert verify_backup(path) == "checksum file missing"
+
+def test_rotation_keeps_the_newest(tmp_path):
+    backup_dir = tmp_path / "backups"
+    backup_dir.mkdir()
+    for day in range(1, 5):
+        path = str(backup_dir / f"flights-2030010{day}-000000.db")
+        sqlite3.connect(path).close()
+
+    manager = BackupManager(str(tmp_path / "flights.db"), str(backup_dir), keep=2)
+    manager.rotate()
+
+    assert [os.path.basename(path) for path in manager.list_backups()] == [
+        "flights-20300104-000000.db",
+        "flights-20300103-000000.db",
+    ]
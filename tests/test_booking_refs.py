@@ -0,0 +1,38 @@
+"""Tests of booking reference generation and the backfill of old rows"""
+import database
+from archive import archive_reservations
+from audit import verify_chain
+from conftest import booking, open_database
+
+def test_archived_references_are_not_reused(tmp_path, monkeypatch):
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Ann Lee", "1A", date="2020-01-01"))
+    archived_ref = db.get_booking_ref(1)
+    assert archive_reservations(db, "2021-01-01") == 1
+    db.close()
+
+    # A new connection, which has not attached the archive yet, draws the
+    # archived code first
+    codes = iter([archived_ref, "NEWREF", "OTHER1"])
+    monkeypatch.setattr(database, "new_booking_ref", lambda: next(codes))
+    db = open_database(str(tmp_path))
+
+    assert db.add_reservation(*booking("Bo Chen", "1B"))
+    assert db.last_booking_refs == ["NEWREF"]
+    db.close()
+
+def test_backfilled_references_are_audited(db):
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+    db.cursor.execute("UPDATE reservations SET booking_ref = NULL WHERE id = 2")
+    db.commit()
+
+    assert db.backfill_booking_refs() == 1
+    assert db.backfill_booking_refs() == 0
+
+    ref = db.get_booking_ref(2)
+    assert ref
+    entry = db.get_reservation_history(2)[-1]
+    assert (entry.operation, entry.booking_ref) == ("update", ref)
+    assert entry.before["booking_ref"] is None
+    assert entry.after["booking_ref"] == ref
+    assert verify_chain(db) == (3, None)
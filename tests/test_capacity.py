@@ -0,0 +1,72 @@
+"""Tests of capacity enforcement, overbooking limits and the counter check"""
+import pytest
+
+from capacity import check_counters, find_drift, find_overbooked
+from conftest import FLIGHT_DATE, booking
+
+@pytest.fixture
+def scheduled(db):
+    """FL100 scheduled with three seats and FL200 with ten"""
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=3)
+    db.add_flight("FL200", "Paris", "London", FLIGHT_DATE, 100.0, capacity=10)
+
+    return db
+
+def test_booking_past_capacity_is_refused(scheduled):
+    db = scheduled
+    assert db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 4)])
+
+    assert db.add_reservation(*booking("Late Comer", "9A")) is False
+    assert db.last_error.kind == "capacity"
+    assert db.get_flight_availability("FL100", FLIGHT_DATE) == (3, 0, 3)
+
+def test_group_too_large_is_refused_as_a_whole(scheduled):
+    db = scheduled
+    db.add_reservation(*booking("Ann Lee", "1A"))
+
+    assert db.add_reservations([booking(f"Passenger {seat}", f"{seat}B") for seat in range(1, 4)]) is False
+    assert db.last_error.kind == "capacity"
+    assert db.count_reservations() == 1
+
+def test_unscheduled_flights_are_not_limited(db):
+    assert db.add_reservations([booking(f"Passenger {seat}", f"{seat}A", "FL999") for seat in range(1, 6)])
+    assert db.get_flight_availability("FL999", FLIGHT_DATE) is None
+
+def test_overbooking_limit_allows_extra_seats(scheduled):
+    db = scheduled
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 4)])
+
+    assert db.set_overbook_limit("FL100", FLIGHT_DATE, 1)
+    assert db.add_reservation(*booking("Extra One", "9A"))
+    assert db.add_reservation(*booking("Extra Two", "9B")) is False
+    assert db.set_overbook_limit("FL999", FLIGHT_DATE, 1) is False
+
+def test_moving_to_a_full_flight_is_refused(scheduled):
+    db = scheduled
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 4)])
+    db.add_reservation(*booking("Bo Chen", "1A", "FL200"))
+    moving = db.get_all_reservations()[-1]
+
+    assert db.update_reservation(moving[0], *booking("Bo Chen", "5A")) is False
+    assert db.last_error.kind == "capacity"
+    assert db.get_reservation_by_id(moving[0])[2] == "FL200"
+
+    # A seat change on the same flight needs no free place
+    assert db.update_reservation(moving[0], *booking("Bo Chen", "2A", "FL200"))
+
+def test_drifted_counters_are_found_and_repaired(scheduled):
+    db = scheduled
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 3)])
+    assert find_drift(db) == []
+
+    db.cursor.execute("UPDATE flight_load SET booked = 7 WHERE flight_number = 'FL100'")
+    db.conn.commit()
+
+    assert find_drift(db) == [("FL100", FLIGHT_DATE, 2, 7)]
+    assert find_overbooked(db) == [("FL100", FLIGHT_DATE, 3, 0, 7)]
+    assert check_counters(db) == [("FL100", FLIGHT_DATE, 2, 7)]
+    assert find_drift(db) != []
+
+    check_counters(db, repair=True)
+    assert find_drift(db) == []
+    assert db.get_flight_availability("FL100", FLIGHT_DATE) == (3, 0, 2)
@@ -0,0 +1,41 @@
+"""Tests of the trigger-maintained change log and the change feed"""
+from conftest import booking
+
+def test_writes_are_logged_in_order(db):
+    start = db.latest_change()
+
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    reservation_id = db.get_all_reservations()[0][0]
+    db.update_reservation(reservation_id, *booking("Ann Lee", "2A"))
+    db.delete_reservation(reservation_id)
+
+    changes, cursor = db.changes_since(start)
+
+    assert [(op, changed_id, version) for _, op, changed_id, version, _ in changes] == [
+        ("I", reservation_id, 1),
+        ("U", reservation_id, 2),
+        ("D", reservation_id, 3),
+    ]
+    assert cursor == db.latest_change()
+    assert db.changes_since(cursor) == ([], cursor)
+
+def test_changes_are_paged(db):
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 6)])
+
+    first, cursor = db.changes_since(0, limit=3)
+    rest, cursor = db.changes_since(cursor, limit=3)
+
+    assert len(first) == 3
+    assert len(rest) == 2
+    assert [change[0] for change in first + rest] == sorted(change[0] for change in first + rest)
+
+def test_cursor_behind_pruned_log_asks_for_reload(db):
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 11)])
+    for reservation_id, *values in db.get_all_reservations():
+        db.update_reservation(reservation_id, *values[:-1], values[-1].replace("A", "B"))
+
+    assert db.prune_changes(retention=5) > 0
+
+    changes, cursor = db.changes_since(0)
+    assert changes is None
+    assert cursor == db.latest_change()
@@ -0,0 +1,43 @@
+"""Tests of the connection profiles"""
+import pytest
+
+from conftest import open_database
+from db_profiles import DEFAULT_PROFILE, resolve_profile, write_config
+
+def pragma(db, name):
+    return db.cursor.execute(f"PRAGMA {name}").fetchone()[0]
+
+def test_default_keeps_the_rollback_journal_and_full_sync(tmp_path, monkeypatch):
+    monkeypatch.delenv("FLIGHTS_DB_PROFILE", raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    db = open_database(str(tmp_path))
+    assert db.profile == DEFAULT_PROFILE
+    assert pragma(db, "journal_mode") == "delete"
+    assert pragma(db, "synchronous") == 2
+    db.close()
+
+def test_wal_only_when_a_profile_asks_for_it(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FLIGHTS_DB_PROFILE", "balanced")
+
+    db = open_database(str(tmp_path))
+    assert pragma(db, "journal_mode") == "wal"
+    assert pragma(db, "synchronous") == 1
+    db.close()
+
+def test_resolution_order(tmp_path, monkeypatch):
+    config_file = str(tmp_path / "flights.ini")
+    monkeypatch.delenv("FLIGHTS_DB_PROFILE", raising=False)
+
+    assert resolve_profile(config_file=config_file) == DEFAULT_PROFILE
+
+    write_config("throughput", config_file)
+    assert resolve_profile(config_file=config_file) == "throughput"
+
+    monkeypatch.setenv("FLIGHTS_DB_PROFILE", "balanced")
+    assert resolve_profile(config_file=config_file) == "balanced"
+    assert resolve_profile("safe", config_file) == "safe"
+
+    with pytest.raises(ValueError):
+        resolve_profile("fastest", config_file)
@@ -0,0 +1,56 @@
+"""Tests of duplicate detection and applying a merge plan"""
+from conftest import booking
+from dedup import apply_plan, find_duplicates
+import dedup
+
+def test_exact_duplicates_are_grouped_under_the_oldest(db, monkeypatch):
+    # Several read batches, so groups span batches
+    monkeypatch.setattr(dedup, "BATCH_SIZE", 2)
+    db.add_reservations([
+        booking("Ann Lee", "1A"),
+        booking("Bo Chen", "1B"),
+        booking("  ann  LEE", "2A"),
+        booking("Bo Chen", "3B"),
+        booking("Ann Lee", "4A", date="01/06/2030"),
+        booking("Ann Lee", "5A", flight_number="FL200"),
+    ])
+
+    plan = find_duplicates(db)
+
+    assert [(group["keep"][0], [row[0] for row in group["remove"]]) for group in plan] == \
+        [(1, [3, 5]), (2, [4])]
+    assert plan[0]["keep"] == list(db.get_reservation_by_id(1))
+
+def test_near_duplicates_are_found_within_a_block(db):
+    db.add_reservations([
+        booking("John Smith", "1A"),
+        booking("Jon Smith", "1B"),
+        booking("Jon Smith", "1C", flight_number="FL200"),
+    ])
+
+    assert find_duplicates(db) == []
+
+    plan = find_duplicates(db, similarity=0.9)
+    assert [(group["reason"], group["keep"][0], [row[0] for row in group["remove"]]) for group in plan] == \
+        [("similar", 1, [2])]
+
+def test_apply_deletes_duplicates_with_their_planned_values(db):
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Ann Lee", "2A"), booking("Ann Lee", "3A")])
+    plan = find_duplicates(db)
+
+    # Edited after review, so it is kept
+    db.update_reservation(3, *booking("Ann Lee", "3C"))
+
+    assert apply_plan(db, plan) == (1, 1)
+    assert [row[0] for row in db.get_all_reservations()] == [1, 3]
+
+def test_group_is_skipped_when_the_kept_reservation_changed(db):
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Ann Lee", "2A"),
+                         booking("Bo Chen", "1B"), booking("Bo Chen", "2B")])
+    plan = find_duplicates(db)
+
+    db.delete_reservation(1)
+    db.update_reservation(3, *booking("Bo Chen", "1C"))
+
+    assert apply_plan(db, plan) == (0, 2)
+    assert [row[0] for row in db.get_all_reservations()] == [2, 3, 4]
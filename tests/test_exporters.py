@@ -0,0 +1,54 @@
+"""Tests of the streaming exporters and passenger manifests"""
+import csv
+import json
+import threading
+
+import pytest
+
+from archive import archive_reservations
+from conftest import FLIGHT_DATE, booking
+from exporters import ExportCancelled, export_csv, export_jsonl, export_manifest
+from memory_store import MemoryDatabase
+
+def test_csv_and_jsonl_hold_every_reservation(db, tmp_path):
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 6)])
+
+    assert export_csv(db, str(tmp_path / "out.csv"), batch_size=2) == 5
+    with open(tmp_path / "out.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert len(rows) == 6
+
+    assert export_jsonl(db, str(tmp_path / "out.jsonl"), batch_size=2) == 5
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["name"] for line in f] == [f"Passenger {seat}" for seat in range(1, 6)]
+
+def test_manifest_prints_booking_references_by_seat(db, tmp_path):
+    db.add_reservations([booking("Bo Chen", "10A"), booking("Ann Lee", "2A")])
+    refs = dict(zip(("Bo Chen", "Ann Lee"), db.last_booking_refs))
+
+    assert export_manifest(db, str(tmp_path / "manifest.txt"), "FL100", FLIGHT_DATE) == 2
+
+    lines = (tmp_path / "manifest.txt").read_text(encoding="utf-8").splitlines()
+    passengers = [line.split() for line in lines[5:7]]
+    assert passengers == [["2A", "Ann", "Lee", refs["Ann Lee"]], ["10A", "Bo", "Chen", refs["Bo Chen"]]]
+
+def test_manifest_from_the_memory_engine(tmp_path):
+    store = MemoryDatabase()
+    store.add_reservation(*booking("Ann Lee", "1A"))
+
+    assert export_manifest(store, str(tmp_path / "manifest.txt")) == 1
+
+def test_cancelled_export_stops(db, tmp_path):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    db.add_reservation(*booking("Ann Lee", "1A"))
+
+    with pytest.raises(ExportCancelled):
+        export_csv(db, str(tmp_path / "out.csv"), cancel_event=cancel_event)
+
+def test_count_includes_the_archive_when_asked(db):
+    db.add_reservations([booking("Ann Lee", "1A", date="2020-01-01"), booking("Bo Chen", "1B")])
+    archive_reservations(db, "2021-01-01")
+
+    assert db.count_reservations() == 1
+    assert db.count_reservations(include_archive=True) == 2
@@ -0,0 +1,91 @@
+"""Tests of fare rules, load factor bands and the fare cache"""
+import pytest
+
+from conftest import FLIGHT_DATE, booking
+from fares import FareEngine, FareError, compile_rules, fare_multiplier, load_factor, load_rules
+
+@pytest.mark.parametrize("factor, multiplier", [
+    (0.0, 0.9),
+    (0.4999, 0.9),
+    (0.5, 1.0),
+    (0.7999, 1.0),
+    (0.8, 1.25),
+    (0.95, 1.5),
+    (1.2, 1.5),
+])
+def test_band_starts_at_its_lowest_load_factor(factor, multiplier):
+    assert fare_multiplier(compile_rules(), factor, "adult") == multiplier
+
+def test_passenger_types_and_load_factor():
+    rules = compile_rules()
+
+    assert fare_multiplier(rules, 0.5, "child") == 0.75
+    assert load_factor(200, 50) == 0.25
+    assert load_factor(0, 0) == 1.0
+    with pytest.raises(FareError, match="Unknown passenger type"):
+        fare_multiplier(rules, 0.5, "pet")
+
+def test_invalid_rules_are_refused():
+    with pytest.raises(FareError, match="start at 0"):
+        compile_rules(bands=[(0.1, 1.0)])
+    with pytest.raises(FareError, match="negative"):
+        compile_rules({"adult": -1.0})
+
+def test_configuration_file_overrides_the_tables(tmp_path):
+    config_file = tmp_path / "flights.ini"
+    config_file.write_text("[fares]\nchild = 0.5\n\n[fare_bands]\n0.9 = 2.0\n")
+
+    rules = load_rules(str(config_file))
+
+    assert fare_multiplier(rules, 0.0, "child") == 0.45
+    assert fare_multiplier(rules, 0.9, "adult") == 2.0
+    assert fare_multiplier(rules, 0.85, "adult") == 1.25
+
+    config_file.write_text("[fares]\nchild = lots\n")
+    with pytest.raises(FareError):
+        load_rules(str(config_file))
+
+@pytest.fixture
+def engine(db):
+    """Engine on FL100, scheduled at 200.00 with ten seats, counting its reads"""
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 200.0, capacity=10)
+
+    reads = []
+    get_fare_inputs = db.get_fare_inputs
+    db.get_fare_inputs = lambda keys: reads.append(list(keys)) or get_fare_inputs(keys)
+
+    engine = FareEngine(db, rules=compile_rules())
+    engine.reads = reads
+    return engine
+
+def test_quote_is_cached_until_a_booking(engine):
+    db = engine.db
+    assert engine.quote("FL100", FLIGHT_DATE).price == 180.0
+    assert engine.quote("FL100", FLIGHT_DATE, "child").price == 135.0
+    assert len(engine.reads) == 1
+
+    # Half the seats booked moves the flight into the next band
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 6)])
+    quote = engine.quote("FL100", FLIGHT_DATE)
+    assert (quote.load_factor, quote.price) == (0.5, 200.0)
+    assert len(engine.reads) == 2
+
+    db.delete_reservation(1)
+    assert engine.quote("FL100", FLIGHT_DATE).price == 180.0
+
+def test_schedule_change_is_priced_in(engine):
+    engine.quote("FL100", FLIGHT_DATE)
+
+    engine.db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 300.0, capacity=10)
+
+    assert engine.quote("FL100", FLIGHT_DATE).price == 270.0
+
+def test_batch_reads_missing_flights_once(engine):
+    engine.db.add_flight("FL200", "Paris", "London", FLIGHT_DATE, 100.0, capacity=10)
+    engine.quote("FL100", FLIGHT_DATE)
+
+    quotes = engine.quote_batch([("FL100", FLIGHT_DATE, "adult"), ("FL200", FLIGHT_DATE, "infant"),
+                                 ("FL300", FLIGHT_DATE, "adult"), ("FL200", FLIGHT_DATE, "senior")])
+
+    assert [quote and quote.price for quote in quotes] == [180.0, 9.0, None, 81.0]
+    assert sorted(engine.reads[-1]) == [("FL200", FLIGHT_DATE), ("FL300", FLIGHT_DATE)]
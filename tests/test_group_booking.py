@@ -0,0 +1,46 @@
+"""Tests of booking a group on adjacent seats"""
+import pytest
+
+from conftest import FLIGHT_DATE, booking
+from group_booking import GroupBookingError, book_group
+from memory_store import MemoryDatabase
+
+def test_group_gets_adjacent_free_seats(db):
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=12)
+    db.add_reservation(*booking("Ann Lee", "1A"))
+
+    booked = book_group(db, ["Bo Chen", " ", "Cy Diaz"], "FL100", "Paris", "London", FLIGHT_DATE)
+
+    assert booked == [("Bo Chen", "1C"), ("Cy Diaz", "1D")]
+    assert sorted(db.get_occupied_seats("FL100", FLIGHT_DATE)) == ["1A", "1C", "1D"]
+
+def test_group_is_refused_as_a_whole(db):
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=4)
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+
+    with pytest.raises(GroupBookingError, match="Not enough free seats"):
+        book_group(db, ["Cy Diaz", "Di Eve", "Ed Fox"], "FL100", "Paris", "London", FLIGHT_DATE)
+
+    with pytest.raises(GroupBookingError, match="no passengers"):
+        book_group(db, ["  "], "FL100", "Paris", "London", FLIGHT_DATE)
+
+    assert db.count_reservations() == 2
+
+def test_group_past_capacity_is_refused(db):
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=4)
+    # Booked before the flight was scheduled, on a seat outside its cabin
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "20A")])
+
+    with pytest.raises(GroupBookingError, match="FL100"):
+        book_group(db, ["Cy Diaz", "Di Eve", "Ed Fox"], "FL100", "Paris", "London", FLIGHT_DATE)
+
+    assert db.count_reservations() == 2
+    assert db.last_error.kind == "capacity"
+
+def test_store_without_transactions():
+    store = MemoryDatabase()
+
+    booked = book_group(store, ["Ann Lee", "Bo Chen"], "FL100", "Paris", "London", FLIGHT_DATE)
+
+    assert [seat for _, seat in booked] == ["1A", "1B"]
+    assert store.count_reservations() == 2
@@ -0,0 +1,84 @@
+"""Tests of field validation and the bulk import pipeline"""
+import csv
+
+import pytest
+
+from conftest import FLIGHT_DATE, open_database
+from import_pipeline import import_file, parse_chunk, IMPORT_FIELDS
+from validation import validate_reservation, ValidationError
+
+HEADER = ",".join(IMPORT_FIELDS) + "\n"
+
+def test_fields_are_normalized():
+    assert validate_reservation("  JOHN   SMITH", "fl 100", "paris", "LONDON", "01/06/2030", " 12a") == \
+        ("John Smith", "FL100", "Paris", "London", "2030-06-01", "12A")
+
+    # Mixed case names are kept as typed
+    assert validate_reservation("Ann McDonald", "FL100", "Paris", "London", "1 Jun 2030", "1A")[0] == \
+        "Ann McDonald"
+
+@pytest.mark.parametrize("fields, error", [
+    (("", "FL100", "Paris", "London", FLIGHT_DATE, "1A"), "name is empty"),
+    (("Ann Lee", "F-100", "Paris", "London", FLIGHT_DATE, "1A"), "invalid flight number"),
+    (("Ann Lee", "FL100", "Paris", "paris", FLIGHT_DATE, "1A"), "departure and destination"),
+    (("Ann Lee", "FL100", "Paris", "London", "2030-13-01", "1A"), "invalid date"),
+    (("Ann Lee", "FL100", "Paris", "London", FLIGHT_DATE, "1Z"), "invalid seat"),
+])
+def test_malformed_fields_are_refused(fields, error):
+    with pytest.raises(ValidationError, match=error):
+        validate_reservation(*fields)
+
+def test_bad_line_is_rejected_and_the_rest_parsed():
+    lines = [
+        f"Ann Lee,FL100,Paris,London,{FLIGHT_DATE},1A\n",
+        f"Bo Chen,FL100,Paris,London,{FLIGHT_DATE},seat\n",
+        "\n",
+        f"Cy Diaz,FL100,Paris,London,{FLIGHT_DATE},1C\n",
+    ]
+
+    valid, rejects, _ = parse_chunk("csv", list(IMPORT_FIELDS), 2, lines)
+
+    assert [(line_number, row[0]) for line_number, _, row in valid] == [(2, "Ann Lee"), (5, "Cy Diaz")]
+    assert [(line_number, error) for line_number, error, _ in rejects] == \
+        [(3, "invalid seat 'SEAT'"), (4, "empty line")]
+
+def test_malformed_json_line_is_rejected():
+    lines = [
+        '{"name": "Ann Lee", "flight_number": "FL100", "departure": "Paris", '
+        f'"destination": "London", "date": "{FLIGHT_DATE}", "seat_number": "1A"}}\n',
+        '{"name": "Bo Chen",\n',
+    ]
+
+    valid, rejects, _ = parse_chunk("jsonl", None, 1, lines)
+
+    assert len(valid) == 1
+    assert [line_number for line_number, _, _ in rejects] == [2]
+
+def test_refused_row_is_isolated_within_a_transaction(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=2)
+    db.close()
+
+    source = tmp_path / "partner.csv"
+    source.write_text(HEADER + "".join(
+        f"Passenger {number},{flight},Paris,London,{FLIGHT_DATE},{number}A\n"
+        for number, flight in enumerate(["FL100", "FL200", "FL100", "FL100", "FL200"], 1)
+    ))
+    rejects_path = tmp_path / "rejects.csv"
+
+    # All five rows go to the writer as one transaction
+    stats = import_file(str(source), str(tmp_path / "flights.db"), workers=1,
+                        rejects_path=str(rejects_path))
+
+    assert (stats.rows_written, stats.rows_rejected) == (4, 1)
+
+    db = open_database(str(tmp_path))
+    assert [row[1] for row in db.get_all_reservations()] == \
+        ["Passenger 1", "Passenger 2", "Passenger 3", "Passenger 5"]
+    db.close()
+
+    with open(rejects_path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["line", "error", "input"]
+    assert [row[0] for row in rows[1:]] == ["5"]
+    assert rows[1][2].startswith("Passenger 4,")
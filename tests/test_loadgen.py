@@ -0,0 +1,28 @@
+"""Smoke test of the concurrent load generator"""
+import loadgen
+
+def test_small_run_completes_without_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(loadgen, "START_DELAY", 0.2)
+    reported = []
+
+    results = loadgen.run_load(concurrency=(1, 2), profiles=("safe", "balanced"), duration=0.3,
+                               seed_rows=50, directory=str(tmp_path), report=reported.append)
+
+    assert reported == results
+    assert [(result["profile"], result["journal_mode"], result["workers"]) for result in results] == [
+        ("safe", "delete", 1), ("safe", "delete", 2), ("balanced", "wal", 1), ("balanced", "wal", 2)]
+
+    for result in results:
+        assert result["operations"] > 0
+        assert result["p50"] <= result["p95"] <= result["p99"]
+        assert set(result["operation_p95"]) <= set(loadgen.DEFAULT_MIX)
+        assert (result["failed"], result["errors"]) == (0, 0)
+
+    # The databases were removed with their temporary directories
+    assert list(tmp_path.iterdir()) == []
+
+def test_failed_write_is_classified(db):
+    db.cursor.execute("DROP TABLE flights")
+
+    assert loadgen.attempt(db, "add_flight", ("FL100", "Paris", "London", "2030-06-01", 100.0)) == "error"
+    assert loadgen.attempt(db, "get_reservation_by_id", (1,)) == "ok"
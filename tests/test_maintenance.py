@@ -0,0 +1,62 @@
+"""Tests of the time-boxed maintenance slices"""
+import maintenance
+from conftest import booking
+from maintenance import MaintenanceScheduler
+
+def changelog(db):
+    db.cursor.execute('SELECT seq, op, reservation_id FROM reservation_changes ORDER BY seq')
+    return db.cursor.fetchall()
+
+def test_changelog_is_pruned_in_batches(db, monkeypatch):
+    db.changelog_retention = 5
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 21)])
+    for reservation_id, *values in db.get_all_reservations():
+        db.update_reservation(reservation_id, *values[:-1], values[-1].replace("A", "B"))
+
+    batches = []
+    delete_pruned_changes = db.delete_pruned_changes
+    def record_batch(horizon, after, limit):
+        removed, after = delete_pruned_changes(horizon, after, limit)
+        batches.append(removed)
+        return removed, after
+    db.delete_pruned_changes = record_batch
+
+    scheduler = MaintenanceScheduler(db, log=lambda message: None)
+    monkeypatch.setattr(maintenance, "FIRST_PRUNE_BATCH", 3)
+    scheduler.resize = lambda size, elapsed: size
+    scheduler.run_all()
+
+    assert len(batches) > 1 and max(batches) <= 3
+
+    # Only the latest record of each reservation is left, and the horizon moved
+    records = changelog(db)
+    assert len(records) == 20
+    assert len({reservation_id for _, _, reservation_id in records}) == 20
+    assert db.get_changelog_horizon() == db.latest_change() - 5
+    assert db.get_meta("maintenance_last_run") is not None
+
+def test_batches_stop_at_their_limit(db):
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 11)])
+    for reservation_id, *values in db.get_all_reservations():
+        db.delete_reservation(reservation_id)
+
+    horizon = db.advance_changelog_horizon(retention=0)
+    removed, after = db.delete_pruned_changes(horizon, 0, 4)
+    assert removed == 4 and after < horizon
+
+    total = removed
+    while after < horizon:
+        removed, after = db.delete_pruned_changes(horizon, after, 4)
+        assert removed <= 4
+        total += removed
+
+    assert total == 20
+    assert changelog(db) == []
+
+def test_chunks_follow_the_budget(db):
+    scheduler = MaintenanceScheduler(db, budget_ms=40, log=lambda message: None)
+
+    assert scheduler.resize(64, 0.060) == 32
+    assert scheduler.resize(64, 0.005) == 128
+    assert scheduler.resize(64, 0.020) == 64
+    assert scheduler.resize(1, 1.0) == 1
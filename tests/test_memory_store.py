@@ -0,0 +1,104 @@
+"""Tests of the in-memory engine's snapshot save and change feed"""
+from conftest import FLIGHT_DATE, booking, open_database
+from memory_store import MemoryDatabase
+
+def test_save_writes_references_names_and_audit(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+    ann, bo = db.get_all_reservations()
+    ann_ref = db.get_booking_ref(ann[0])
+    db.close()
+
+    store = MemoryDatabase.from_sqlite(str(tmp_path / "flights.db"))
+    store.add_reservation(*booking("Cy Diaz", "2A"))
+    store.update_reservation(ann[0], *booking("Ann Lee", "3C"))
+    store.delete_reservation(bo[0])
+    assert store.save_to_sqlite(str(tmp_path / "flights.db"))
+
+    db = open_database(str(tmp_path))
+    assert db.get_all_reservations() == store.get_all_reservations()
+
+    # Kept rows keep their reference; new rows get one and are searchable
+    new_id = store.get_all_reservations()[-1][0]
+    assert db.get_booking_ref(ann[0]) == ann_ref
+    assert db.get_booking_ref(new_id)
+    assert db.search_reservations_fuzzy("cy dias")[0][0] == new_id
+
+    assert [entry.operation for entry in db.get_reservation_history(ann[0])] == ["insert", "update"]
+    assert [entry.operation for entry in db.get_reservation_history(bo[0])] == ["insert", "delete"]
+    assert [entry.operation for entry in db.get_reservation_history(new_id)] == ["insert"]
+
+    # Saving again finds nothing to write
+    assert store.save_to_sqlite(str(tmp_path / "flights.db"))
+    assert len(db.get_reservation_history(ann[0])) == 2
+    db.close()
+
+def test_save_keeps_bookings_other_agents_made(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    db.close()
+
+    store = MemoryDatabase.from_sqlite(str(tmp_path / "flights.db"))
+    store.add_reservation(*booking("Cy Diaz", "2A"))
+    local_id = store.get_all_reservations()[-1][0]
+
+    # Another agent books the ID the store gave its new reservation
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Bo Chen", "1B"))
+    bo = db.get_all_reservations()[-1]
+    assert bo[0] == local_id
+    db.close()
+
+    assert store.save_to_sqlite(str(tmp_path / "flights.db"))
+
+    db = open_database(str(tmp_path))
+    assert [row[1] for row in db.get_all_reservations()] == ["Ann Lee", "Bo Chen", "Cy Diaz"]
+    assert db.get_reservation_by_id(bo[0]) == bo
+
+    # The store's reservation took the ID and reference the file gave it
+    cy = db.get_all_reservations()[-1]
+    assert store.get_reservation_by_id(local_id) is None
+    assert store.get_reservation_by_id(cy[0]) == cy
+    assert store.get_flight_passengers("FL100", FLIGHT_DATE)[-1][-1] == db.get_booking_ref(cy[0])
+    db.close()
+
+def test_save_refuses_bookings_past_capacity(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=1)
+    db.close()
+
+    store = MemoryDatabase.from_sqlite(str(tmp_path / "flights.db"))
+    store.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+
+    assert store.save_to_sqlite(str(tmp_path / "flights.db")) is False
+
+    db = open_database(str(tmp_path))
+    assert db.count_reservations() == 0
+    db.close()
+
+def test_change_feed_pages_and_trims():
+    store = MemoryDatabase(changelog_retention=5)
+    for seat in range(1, 24):
+        store.add_reservation(*booking(f"Passenger {seat}", f"{seat}A"))
+
+    assert len(store.changes) <= 10
+
+    changes, cursor = store.changes_since(store.horizon, limit=3)
+    assert [change[0] for change in changes] == [store.horizon + 1, store.horizon + 2, store.horizon + 3]
+    assert store.changes_since(cursor)[0][-1][0] == store.latest_change() == 23
+
+    assert store.changes_since(store.horizon - 1) == (None, 23)
+
+def test_flight_passengers_carry_booking_references(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    ref = db.last_booking_refs[0]
+    db.close()
+
+    store = MemoryDatabase.from_sqlite(str(tmp_path / "flights.db"))
+    store.add_reservation(*booking("Bo Chen", "1B"))
+
+    assert [(row[1], row[7]) for row in store.get_flight_passengers("FL100", FLIGHT_DATE)] == [
+        ("Ann Lee", ref),
+        ("Bo Chen", None),
+    ]
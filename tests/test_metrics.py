@@ -0,0 +1,74 @@
+"""Tests of the metrics types, their exposition and Database error reporting"""
+import threading
+
+from metrics import ERRORS, Cells, Registry
+
+def test_cells_sum_every_thread():
+    cells = Cells(2)
+
+    def add():
+        for _ in range(1000):
+            cell = cells.cell()
+            cell[0] += 1
+            cell[1] += 2
+
+    threads = [threading.Thread(target=add) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cells.cells) == 4
+    assert cells.totals() == [4000, 8000]
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "Latency", buckets=(1.0, 0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 0.7, 2.0, 3.0):
+        histogram.observe(value)
+
+    # A value on a bound falls in that bucket (le means "less or equal")
+    cumulative, total, count = histogram.labels().get()
+    assert cumulative == [2, 3, 4, 6]
+    assert (round(total, 6), count) == (6.15, 6)
+
+def test_prometheus_exposition():
+    registry = Registry()
+    calls = registry.counter("calls_total", "Calls", ("operation",))
+    calls.labels("book").inc()
+    calls.labels("book").inc(2)
+    calls.labels('say "hi"\n').inc()
+    registry.gauge("queue_depth", "Queue depth").set(1.5)
+    registry.histogram("wait_seconds", "Wait", buckets=(0.5,)).observe(0.25)
+
+    assert registry.to_prometheus() == (
+        '# HELP calls_total Calls\n'
+        '# TYPE calls_total counter\n'
+        'calls_total{operation="book"} 3\n'
+        'calls_total{operation="say \\"hi\\"\\n"} 1\n'
+        '# HELP queue_depth Queue depth\n'
+        '# TYPE queue_depth gauge\n'
+        'queue_depth 1.5\n'
+        '# HELP wait_seconds Wait\n'
+        '# TYPE wait_seconds histogram\n'
+        'wait_seconds_bucket{le="0.5"} 1\n'
+        'wait_seconds_bucket{le="+Inf"} 1\n'
+        'wait_seconds_sum 0.25\n'
+        'wait_seconds_count 1\n'
+    )
+
+def test_registering_a_name_twice_returns_the_first_metric():
+    registry = Registry()
+
+    assert registry.counter("calls_total", "Calls") is registry.counter("calls_total", "Other")
+
+def test_failed_write_is_recorded_and_counted_without_printing(db, capsys):
+    errors = ERRORS.labels("db", "add_flight")
+    before = errors.get()
+    db.cursor.execute("DROP TABLE flights")
+
+    assert db.add_flight("FL100", "Paris", "London", "2030-06-01", 100.0) is False
+
+    assert db.last_error.operation == "add_flight"
+    assert errors.get() == before + 1
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,58 @@
+"""Tests of the typo-tolerant passenger name search"""
+import pytest
+
+from conftest import booking
+from name_search import find_names, fold_name, levenshtein, rebuild_name_index, soundex
+
+@pytest.fixture
+def passengers(db):
+    """A few passengers whose names are easy to misspell"""
+    db.add_reservations([
+        booking("John Smith", "1A"),
+        booking("Muhammad Ali", "1B"),
+        booking("José O'Brien", "1C"),
+        booking("Anna Schmidt", "1D"),
+        booking("Peter Jones", "2A"),
+    ])
+
+    return db
+
+def test_helpers():
+    assert fold_name("  José  O'Brien") == "jose obrien"
+    assert soundex("smyth") == soundex("smith") == "S530"
+    assert soundex("muhammad") == soundex("mohamed") == "M530"
+    assert levenshtein("kitten", "sitting") == 3
+    assert levenshtein("abcdefgh", "a", limit=2) == 3
+
+@pytest.mark.parametrize("term, name", [
+    ("Smyth", "John Smith"),
+    ("mohamed", "Muhammad Ali"),
+    ("ali mohamed", "Muhammad Ali"),
+    ("jose obrian", "José O'Brien"),
+    # A typo in the first letter, which Soundex keeps apart
+    ("Xmith", "John Smith"),
+])
+def test_misspelled_names_are_found_first(passengers, term, name):
+    assert find_names(passengers, term)[0][1] == name
+
+def test_unrelated_term_finds_nothing(passengers):
+    assert find_names(passengers, "Zbigniew") == []
+    assert passengers.search_reservations_fuzzy("") == []
+
+def test_reservations_come_with_the_best_name_first(passengers):
+    passengers.add_reservation(*booking("Jon Smyth", "3A"))
+
+    rows = passengers.search_reservations_fuzzy("john smith")
+
+    assert [row[1] for row in rows] == ["John Smith", "Jon Smyth"]
+
+def test_renamed_passenger_is_indexed(passengers):
+    passengers.update_reservation(5, *booking("Peter Jonas", "2A"))
+
+    assert find_names(passengers, "jonas")[0] == (0, "Peter Jonas")
+
+def test_rebuild_drops_names_without_reservations(passengers):
+    passengers.delete_reservation(5)
+
+    assert rebuild_name_index(passengers) == 4
+    assert find_names(passengers, "Jones") == []
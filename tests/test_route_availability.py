@@ -0,0 +1,72 @@
+"""Tests of the trigger-maintained route availability and its upgrade"""
+from conftest import FLIGHT_DATE, booking, open_database
+from database import SCHEMA_VERSION
+
+def recomputed(db):
+    """route_availability as computed from the schedule and the reservations"""
+    db.cursor.execute('''
+    SELECT f.departure, f.destination, f.date, COUNT(*), SUM(f.capacity + f.overbook_limit),
+           SUM((SELECT COUNT(*) FROM reservations AS r
+                WHERE r.flight_number = f.flight_number AND r.date = f.date))
+    FROM flights AS f
+    GROUP BY f.departure, f.destination, f.date
+    ORDER BY 1, 2, 3
+    ''')
+    return db.cursor.fetchall()
+
+def stored(db):
+    """Contents of route_availability"""
+    db.cursor.execute('SELECT * FROM route_availability ORDER BY departure, destination, date')
+    return db.cursor.fetchall()
+
+def test_flights_and_bookings_update_the_day(db):
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=3)
+    db.add_flight("FL101", "Paris", "London", FLIGHT_DATE, 100.0, capacity=5)
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B", "FL101")])
+
+    assert db.get_route_availability("Paris", "London", FLIGHT_DATE, FLIGHT_DATE) == [(FLIGHT_DATE, 2, 8, 2)]
+
+    db.set_overbook_limit("FL100", FLIGHT_DATE, 2)
+    db.delete_reservation(db.get_all_reservations()[0][0])
+    assert db.get_route_availability("Paris", "London", FLIGHT_DATE, FLIGHT_DATE) == [(FLIGHT_DATE, 2, 10, 1)]
+    assert stored(db) == recomputed(db)
+
+def test_moving_a_booking_between_days(db):
+    db.add_flight("FL100", "Paris", "London", "2030-06-01", 100.0, capacity=3)
+    db.add_flight("FL100", "Paris", "London", "2030-06-02", 100.0, capacity=3)
+    db.add_reservation(*booking("Ann Lee", "1A", date="2030-06-01"))
+
+    db.update_reservation(db.get_all_reservations()[0][0], *booking("Ann Lee", "1A", date="2030-06-02"))
+
+    assert db.get_route_availability("Paris", "London", "2030-06-01", "2030-06-30") == [
+        ("2030-06-01", 1, 3, 0),
+        ("2030-06-02", 1, 3, 1),
+    ]
+    assert stored(db) == recomputed(db)
+
+def test_bookings_made_before_the_flight_was_scheduled_count(db):
+    db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=3)
+
+    assert db.get_route_availability("Paris", "London", FLIGHT_DATE, FLIGHT_DATE) == [(FLIGHT_DATE, 1, 3, 2)]
+
+    db.delete_flight("FL100", FLIGHT_DATE)
+    assert stored(db) == []
+
+def test_upgrade_fills_route_availability(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=3)
+    db.add_reservation(*booking("Ann Lee", "1A"))
+
+    # A file from before the table existed: empty table, version 12
+    db.cursor.execute('DELETE FROM route_availability')
+    db.cursor.execute('PRAGMA user_version = 12')
+    db.conn.commit()
+    db.close()
+
+    db = open_database(str(tmp_path))
+    assert stored(db) == recomputed(db) == [("Paris", "London", FLIGHT_DATE, 1, 3, 1)]
+
+    db.cursor.execute('PRAGMA user_version')
+    assert db.cursor.fetchone()[0] == SCHEMA_VERSION
+    db.close()
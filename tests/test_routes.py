@@ -0,0 +1,59 @@
+"""Tests of the connecting-itinerary search"""
+import pytest
+
+from conftest import FLIGHT_DATE
+from routes import FlightGraph
+
+def at(time):
+    """Schedule time on the flight date"""
+    return f"{FLIGHT_DATE} {time}"
+
+@pytest.fixture
+def graph(db):
+    """Paris to Sydney direct, via Dubai, and via Dubai and Singapore"""
+    db.add_flight("FL1", "Paris", "Sydney", FLIGHT_DATE, 1500.0, at("08:00"), "2030-06-02 12:00")
+    db.add_flight("FL2", "Paris", "Dubai", FLIGHT_DATE, 400.0, at("09:00"), at("15:00"))
+    db.add_flight("FL3", "Dubai", "Sydney", FLIGHT_DATE, 600.0, at("16:00"), "2030-06-02 06:00")
+    # Too tight a connection after FL2
+    db.add_flight("FL4", "Dubai", "Sydney", FLIGHT_DATE, 500.0, at("15:20"), "2030-06-02 04:00")
+    db.add_flight("FL5", "Dubai", "Singapore", FLIGHT_DATE, 300.0, at("16:30"), at("23:30"))
+    db.add_flight("FL6", "Singapore", "Sydney", "2030-06-02", 300.0, "2030-06-02 01:00", "2030-06-02 09:00")
+
+    graph = FlightGraph(db)
+    graph.refresh()
+    return graph
+
+def flight_numbers(itineraries):
+    return [[leg.flight_number for leg in itinerary.legs] for itinerary in itineraries]
+
+def test_itineraries_come_fastest_first(graph):
+    itineraries = graph.search(" paris", "SYDNEY", FLIGHT_DATE)
+
+    assert flight_numbers(itineraries) == [["FL2", "FL3"], ["FL2", "FL5", "FL6"], ["FL1"]]
+    assert [itinerary.stops for itinerary in itineraries] == [1, 2, 0]
+    assert itineraries[0].fare == 1000.0
+    assert str(itineraries[0].duration) == "21:00:00"
+
+def test_stops_and_connection_times_are_respected(graph):
+    assert flight_numbers(graph.search("Paris", "Sydney", FLIGHT_DATE, max_stops=0)) == [["FL1"]]
+    assert flight_numbers(graph.search("Paris", "Sydney", FLIGHT_DATE, max_stops=1)) == \
+        [["FL2", "FL3"], ["FL1"]]
+
+    # FL4 leaves 20 minutes after FL2 lands
+    assert ["FL2", "FL4"] in flight_numbers(graph.search("Paris", "Sydney", FLIGHT_DATE, min_connection=15))
+    assert ["FL2", "FL4"] not in flight_numbers(graph.search("Paris", "Sydney", FLIGHT_DATE))
+
+def test_no_itinerary_for_unknown_places_or_dates(graph):
+    assert graph.search("Paris", "Paris", FLIGHT_DATE) == []
+    assert graph.search("Lima", "Sydney", FLIGHT_DATE) == []
+    assert graph.search("Paris", "Sydney", "2030-06-05") == []
+    assert graph.search("Paris", "Sydney", "June") == []
+
+def test_refresh_reloads_only_changed_flights(db, graph):
+    db.delete_flight("FL3", FLIGHT_DATE)
+    db.add_flight("FL7", "Dubai", "Sydney", FLIGHT_DATE, 700.0, at("17:00"), "2030-06-02 05:00")
+
+    assert graph.refresh() == 2
+    assert graph.refresh() == 0
+    assert flight_numbers(graph.search("Paris", "Sydney", FLIGHT_DATE, max_stops=1)) == \
+        [["FL2", "FL7"], ["FL1"]]
@@ -0,0 +1,61 @@
+"""Tests of cabin layouts, the occupancy cache and group seat allocation"""
+from conftest import FLIGHT_DATE, booking
+from seatmap import OccupancyCache, SeatLayout, allocate_block, flight_layout
+
+def test_layout_follows_capacity():
+    small = SeatLayout(10)
+    assert (small.letters, small.rows) == ("ABCD", 3)
+    assert small.seats()[-1] == (3, "B", "3B")
+    assert small.aisles() == {1}
+
+    assert SeatLayout(300).letters == "ABCDEFGHJK"
+
+def test_partial_last_row_counts_as_taken():
+    layout = SeatLayout(10)
+
+    assert layout.row_bitmaps(["1A", "2D", "99A", "1Z"]) == [0b0001, 0b1000, 0b1100]
+
+def test_cache_is_dropped_when_reservations_change(db):
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    cache = OccupancyCache(db)
+    assert cache.occupied("FL100", FLIGHT_DATE) == {"1A"}
+
+    # Cached until the next write
+    queries = []
+    get_occupied_seats = db.get_occupied_seats
+    db.get_occupied_seats = lambda *flight: queries.append(flight) or get_occupied_seats(*flight)
+    assert cache.occupied("FL100", FLIGHT_DATE) == {"1A"}
+    assert queries == []
+
+    db.add_reservation(*booking("Bo Chen", "1B"))
+    assert cache.occupied("FL100", FLIGHT_DATE) == {"1A", "1B"}
+
+    db.update_reservation(1, *booking("Ann Lee", "2C"))
+    assert cache.occupied("FL100", FLIGHT_DATE) == {"1B", "2C"}
+    assert len(queries) == 2
+
+def test_least_recently_used_flight_is_dropped(db):
+    cache = OccupancyCache(db, max_flights=2)
+    cache.occupied("FL100", FLIGHT_DATE)
+    cache.occupied("FL200", FLIGHT_DATE)
+    cache.occupied("FL100", FLIGHT_DATE)
+    cache.occupied("FL300", FLIGHT_DATE)
+
+    assert list(cache.flights) == [("FL100", FLIGHT_DATE), ("FL300", FLIGHT_DATE)]
+
+def test_layout_of_a_scheduled_flight(db):
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=150)
+
+    assert flight_layout(db, "FL100", FLIGHT_DATE).letters == "ABCDEF"
+
+def test_group_sits_together_without_crossing_an_aisle():
+    layout = SeatLayout(12)
+
+    assert allocate_block(layout, {"1A"}, 2) == ["1C", "1D"]
+    assert allocate_block(layout, {"1A", "2A", "3A"}, 3) == ["1B", "1C", "1D"]
+
+def test_group_is_spread_over_rows_when_no_row_fits():
+    layout = SeatLayout(8)
+
+    assert allocate_block(layout, {"1A", "2D"}, 5) == ["1B", "1C", "1D", "2A", "2B"]
+    assert allocate_block(layout, {"1A", "1B", "2A", "2B"}, 5) is None
@@ -0,0 +1,82 @@
+"""Smoke test of the reservation service and the RemoteDatabase client"""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import FLIGHT_DATE, booking, open_database
+from database import OperationError
+from service import RemoteDatabase, RemoteError
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"),
+                                reason="the test service listens on a Unix socket")
+
+@pytest.fixture
+def remote(tmp_path):
+    """RemoteDatabase connected to a service running in another process"""
+    # The schedule is kept by the service host, not through the service
+    db = open_database(str(tmp_path))
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 120.0, capacity=2)
+    db.close()
+
+    socket_path = str(tmp_path / "flights.sock")
+    service = subprocess.Popen(
+        [sys.executable, os.path.join(REPOSITORY, "service.py"),
+         "--db", str(tmp_path / "flights.db"), "--unix", socket_path],
+        cwd=str(tmp_path), stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + 10
+    while not os.path.exists(socket_path):
+        assert service.poll() is None, "the service exited"
+        assert time.monotonic() < deadline, "the service did not start"
+        time.sleep(0.05)
+
+    client = RemoteDatabase("unix:" + socket_path)
+    yield client
+
+    client.close()
+    service.terminate()
+    service.wait(timeout=10)
+
+def test_reads_and_writes_go_through_the_service(remote):
+    assert remote.add_reservation(*booking("Ann Lee", "1A"))
+    assert len(remote.last_booking_refs) == 1
+
+    reservation = remote.get_reservation_by_ref(remote.last_booking_refs[0])
+    assert reservation[1:] == list(booking("Ann Lee", "1A"))
+
+    # Keyword arguments reach the service
+    assert remote.get_all_reservations(include_archive=False) == [reservation]
+    assert [row for batch in remote.iter_reservations(batch_size=1) for row in batch] == [reservation]
+
+def test_write_outcomes_are_copied_to_the_client(remote):
+    assert remote.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+    assert remote.last_error is None
+    assert len(remote.last_booking_refs) == 2
+
+    # A refused write reports its failure as a local Database would
+    assert remote.add_reservation(*booking("Cy Diaz", "1C")) is False
+    assert remote.last_error == OperationError("add_reservation", "capacity", remote.last_error.message)
+
+    # Cancelling frees a seat; the outcome of the next write replaces the error
+    assert remote.delete_reservation(remote.get_all_reservations()[0][0])
+    assert remote.last_error is None
+
+def test_batch_is_all_or_nothing(remote):
+    assert remote.batch([("add_reservation", booking("Ann Lee", "1A"))]) == [True]
+
+    # The second call has too many arguments, so the first is rolled back
+    with pytest.raises(RemoteError):
+        remote.batch([
+            ("add_reservation", booking("Bo Chen", "1B")),
+            ("delete_reservation", ["not an id", "extra argument"]),
+        ])
+
+    assert remote.count_reservations() == 1
+    assert remote.get_flights()[0][:2] == ["FL100", FLIGHT_DATE]
@@ -0,0 +1,16 @@
+"""Tests that the app's startup imports stay small"""
+import os
+import subprocess
+import sys
+
+# Modules the booking page only imports when a feature is used
+FEATURE_MODULES = ("availability", "fares", "group_booking", "routes", "seatmap", "validation")
+
+def test_pages_do_not_import_their_features():
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys, home, booking, reservations, edit_reservation, widgets; "
+            f"print(' '.join(m for m in {FEATURE_MODULES!r} if m in sys.modules))")
+
+    result = subprocess.run([sys.executable, "-c", code], cwd=repo, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == ""
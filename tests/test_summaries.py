@@ -0,0 +1,66 @@
+"""Tests of the trigger-maintained dashboard summaries and their upgrade"""
+import datetime
+
+from conftest import FLIGHT_DATE, booking, open_database
+from database import SCHEMA_VERSION
+
+def counted(db):
+    """Flight and route counts computed from the reservations themselves"""
+    db.cursor.execute('''
+    SELECT flight_number, date, departure, destination, COUNT(*)
+    FROM reservations GROUP BY flight_number, date ORDER BY date, flight_number
+    ''')
+    flights = db.cursor.fetchall()
+    db.cursor.execute('''
+    SELECT departure, destination, COUNT(*) FROM reservations
+    GROUP BY departure, destination ORDER BY COUNT(*) DESC
+    ''')
+    routes = db.cursor.fetchall()
+
+    return flights, routes
+
+def test_summaries_follow_inserts_updates_and_deletes(db):
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 4)])
+    db.add_reservation(*booking("Bo Chen", "1A", "FL200", "Rome", "Oslo"))
+
+    first, second = db.get_all_reservations()[:2]
+    db.update_reservation(first[0], *booking("Passenger 1", "2C", "FL200", "Rome", "Oslo"))
+    db.delete_reservation(second[0])
+
+    flights, routes = counted(db)
+    assert db.get_flights() == flights
+    assert db.count_reservations() == 3
+
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    dashboard = db.get_dashboard(today)
+    assert dashboard["total_bookings"] == 3
+    assert dashboard["bookings_today"] == 4
+    assert dashboard["top_routes"] == routes
+    assert dashboard["upcoming"] == flights
+
+def test_last_booking_removes_the_summary_rows(db):
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    db.delete_reservation(db.get_all_reservations()[0][0])
+
+    assert db.get_flights() == []
+    assert db.get_dashboard(FLIGHT_DATE)["top_routes"] == []
+
+def test_upgrade_fills_the_summaries(tmp_path):
+    db = open_database(str(tmp_path))
+    db.add_reservations([booking(f"Passenger {seat}", f"{seat}A") for seat in range(1, 4)])
+
+    # A file from before the summary tables: empty tables, old version
+    db.cursor.execute('DELETE FROM flight_load')
+    db.cursor.execute('DELETE FROM route_summary')
+    db.cursor.execute('PRAGMA user_version = 2')
+    db.conn.commit()
+    db.close()
+
+    db = open_database(str(tmp_path))
+    flights, routes = counted(db)
+    assert db.get_flights() == flights
+    assert db.get_dashboard(FLIGHT_DATE)["top_routes"] == routes
+
+    db.cursor.execute('PRAGMA user_version')
+    assert db.cursor.fetchone()[0] == SCHEMA_VERSION
+    db.close()
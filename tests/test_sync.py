@@ -0,0 +1,100 @@
+"""Tests of changeset sync between two offices"""
+import os
+
+import pytest
+
+from conftest import booking, open_database
+from sync import apply_changes, export_changes, set_site_id
+
+@pytest.fixture
+def offices(tmp_path):
+    """Databases of two offices, "paris" and "london", in their own directories"""
+    databases = []
+    for site in ("paris", "london"):
+        directory = tmp_path / site
+        directory.mkdir()
+        db = open_database(str(directory))
+        set_site_id(db, site)
+        databases.append(db)
+
+    yield databases
+
+    for db in databases:
+        db.close()
+
+def ship(source, target, tmp_path):
+    """Export the source's changes for the target and apply them there"""
+    path = os.path.join(str(tmp_path), "changes.jsonl.gz")
+    export_changes(source, target.get_meta("sync_site_id"), path)
+
+    return apply_changes(target, path)
+
+def rows_by_ref(db):
+    """Booking reference -> reservation values without the local ID"""
+    db.cursor.execute('''
+    SELECT booking_ref, name, flight_number, departure, destination, date, seat_number FROM reservations
+    ''')
+    return {row[0]: row[1:] for row in db.cursor.fetchall()}
+
+def test_new_updated_and_deleted_reservations_are_applied(offices, tmp_path):
+    paris, london = offices
+    paris.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+
+    assert ship(paris, london, tmp_path) == (2, 0, 0)
+    assert rows_by_ref(london) == rows_by_ref(paris)
+
+    ann, bo = paris.get_all_reservations()
+    paris.update_reservation(ann[0], *booking("Ann Lee", "4C"))
+    paris.delete_reservation(bo[0])
+
+    assert ship(paris, london, tmp_path) == (2, 0, 0)
+    assert rows_by_ref(london) == rows_by_ref(paris)
+
+def test_applying_twice_changes_nothing(offices, tmp_path):
+    paris, london = offices
+    paris.add_reservation(*booking("Ann Lee", "1A"))
+
+    path = os.path.join(str(tmp_path), "changes.jsonl.gz")
+    export_changes(paris, "london", path)
+
+    assert apply_changes(london, path) == (1, 0, 0)
+    assert apply_changes(london, path) == (0, 1, 0)
+    assert london.count_reservations() == 1
+
+def test_changes_are_not_sent_back(offices, tmp_path):
+    paris, london = offices
+    paris.add_reservation(*booking("Ann Lee", "1A"))
+    ship(paris, london, tmp_path)
+
+    assert ship(london, paris, tmp_path) == (0, 0, 0)
+    assert paris.count_reservations() == 1
+
+def test_update_made_elsewhere_reaches_the_home_office(offices, tmp_path):
+    paris, london = offices
+    paris.add_reservation(*booking("Ann Lee", "1A"))
+    ref = paris.last_booking_refs[0]
+    ship(paris, london, tmp_path)
+
+    received = london.get_reservation_by_ref(ref)
+    london.update_reservation(received[0], *booking("Ann Lee-Smith", "1A"))
+
+    assert ship(london, paris, tmp_path) == (1, 0, 0)
+    assert rows_by_ref(paris)[ref][0] == "Ann Lee-Smith"
+    assert paris.count_reservations() == 1
+
+def test_reference_used_by_another_reservation_is_a_conflict(offices, tmp_path):
+    paris, london = offices
+    paris.add_reservation(*booking("Ann Lee", "1A"))
+    ref = paris.last_booking_refs[0]
+
+    # London gave the same reference to one of its own passengers
+    london.add_reservation(*booking("Zoe Young", "9F", "FL900", "London", "Rome"))
+    london.cursor.execute('UPDATE reservations SET booking_ref = ?', (ref,))
+    london.conn.commit()
+    before = rows_by_ref(london)
+
+    assert ship(paris, london, tmp_path) == (0, 0, 1)
+    assert rows_by_ref(london) == before
+
+    london.cursor.execute('SELECT home, ref, local_id FROM sync_conflicts')
+    assert london.cursor.fetchall() == [("paris", ref, london.get_all_reservations()[0][0])]
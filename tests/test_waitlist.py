@@ -0,0 +1,83 @@
+"""Tests of waitlist promotion when a seat is freed"""
+import pytest
+
+from conftest import FLIGHT_DATE, booking
+
+def wait(db, name, priority=0):
+    """Put a passenger on the waitlist of FL100"""
+    assert db.add_to_waitlist(name, "FL100", "Paris", "London", FLIGHT_DATE, priority)
+
+@pytest.fixture
+def full_flight(db):
+    """FL100 scheduled with two seats, both booked"""
+    db.add_flight("FL100", "Paris", "London", FLIGHT_DATE, 100.0, capacity=2)
+    assert db.add_reservations([booking("Ann Lee", "1A"), booking("Bo Chen", "1B")])
+
+    return db
+
+def test_queue_is_ordered_by_priority_then_arrival(full_flight):
+    db = full_flight
+    wait(db, "Cy Diaz")
+    wait(db, "Di Evans", priority=1)
+    wait(db, "Ed Fox")
+
+    assert [name for _, name, _, _ in db.get_waitlist("FL100", FLIGHT_DATE)] == ["Di Evans", "Cy Diaz", "Ed Fox"]
+
+def test_cancellation_books_the_head_of_the_queue(full_flight):
+    db = full_flight
+    wait(db, "Cy Diaz")
+    wait(db, "Di Evans", priority=1)
+    cancelled = db.get_all_reservations()[1]
+
+    assert db.delete_reservation(cancelled[0])
+
+    waitlist_id, reservation_id, name, seat = db.last_promotion
+    assert (name, seat) == ("Di Evans", "1B")
+    assert db.get_reservation_by_id(reservation_id)[1:] == booking("Di Evans", "1B")
+    assert db.get_booking_ref(reservation_id)
+    assert [name for _, name, _, _ in db.get_waitlist("FL100", FLIGHT_DATE)] == ["Cy Diaz"]
+
+    db.cursor.execute('SELECT status, reservation_id FROM waitlist WHERE id = ?', (waitlist_id,))
+    assert db.cursor.fetchone() == ("promoted", reservation_id)
+    assert db.get_flight_availability("FL100", FLIGHT_DATE) == (2, 0, 2)
+
+def test_seat_change_on_a_full_flight_promotes_nobody(full_flight):
+    db = full_flight
+    wait(db, "Cy Diaz")
+    first = db.get_all_reservations()[0]
+
+    assert db.update_reservation(first[0], *booking("Ann Lee", "2A"))
+
+    assert db.last_promotion is None
+    assert len(db.get_waitlist("FL100", FLIGHT_DATE)) == 1
+    assert db.count_reservations() == 2
+
+def test_removed_passengers_are_not_promoted(full_flight):
+    db = full_flight
+    wait(db, "Cy Diaz")
+    waitlist_id = db.get_waitlist("FL100", FLIGHT_DATE)[0][0]
+    assert db.remove_from_waitlist(waitlist_id)
+
+    assert db.delete_reservation(db.get_all_reservations()[0][0])
+
+    assert db.last_promotion is None
+    assert db.count_reservations() == 1
+
+def test_seat_change_on_an_unscheduled_flight_promotes_nobody(db):
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    wait(db, "Cy Diaz")
+
+    assert db.update_reservation(1, *booking("Ann Lee", "1B"))
+
+    assert db.last_promotion is None
+    assert len(db.get_waitlist("FL100", FLIGHT_DATE)) == 1
+    assert db.count_reservations() == 1
+
+def test_leaving_an_unscheduled_flight_promotes_the_head(db):
+    db.add_reservation(*booking("Ann Lee", "1A"))
+    wait(db, "Cy Diaz")
+
+    assert db.update_reservation(1, *booking("Ann Lee", "1A", flight_number="FL200"))
+
+    assert db.last_promotion[2:] == ("Cy Diaz", "1A")
+    assert db.get_occupied_seats("FL100", FLIGHT_DATE) == ["1A"]
@@ -0,0 +1,135 @@
+"""
+validation.py - Normalize and validate reservation fields
+
+This module cleans up reservation data coming from outside the app:
+- Collapses whitespace and fixes capitalization of names and places
+- Accepts several common date formats and stores dates as YYYY-MM-DD
+- Checks that flight numbers and seats look like "FL100" and "12A"
+"""
+import datetime
+import re
+
+# Date formats accepted from partner files, tried in order
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%d.%m.%Y", "%d-%m-%Y", "%d %b %Y", "%d %B %Y")
+
+FLIGHT_NUMBER_PATTERN = re.compile(r"^[A-Z0-9]{2}\d{1,4}[A-Z]?$")
+SEAT_PATTERN = re.compile(r"^\d{1,3}[A-K]$")
+
+class ValidationError(ValueError):
+    """Raised when a reservation field cannot be normalized"""
+
+def normalize_text(value):
+    """
+    Collapse runs of whitespace and trim
+
+    Args:
+        value (str): Raw text
+
+    Returns:
+        str: Cleaned text
+    """
+    return " ".join(str(value).split())
+
+def normalize_name(name):
+    """
+    Normalize a passenger or place name, e.g. "  john   smith" -> "John Smith"
+
+    Args:
+        name (str): Raw name
+
+    Returns:
+        str: Normalized name
+    """
+    name = normalize_text(name)
+    if not name:
+        raise ValidationError("name is empty")
+
+    # Only fix names typed entirely in one case, keep "McDonald" as is
+    if name.islower() or name.isupper():
+        name = name.title()
+
+    return name
+
+def normalize_flight_number(flight_number):
+    """
+    Normalize a flight number, e.g. "fl 100" -> "FL100"
+
+    Args:
+        flight_number (str): Raw flight number
+
+    Returns:
+        str: Normalized flight number
+    """
+    flight_number = "".join(str(flight_number).split()).upper()
+    if not FLIGHT_NUMBER_PATTERN.match(flight_number):
+        raise ValidationError(f"invalid flight number '{flight_number}'")
+
+    return flight_number
+
+def normalize_date(date):
+    """
+    Convert a date in any accepted format to YYYY-MM-DD
+
+    Args:
+        date (str): Raw date
+
+    Returns:
+        str: ISO date
+    """
+    date = normalize_text(date)
+
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(date, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+
+    raise ValidationError(f"invalid date '{date}'")
+
+def normalize_seat(seat_number):
+    """
+    Normalize a seat, e.g. " 12a" -> "12A"
+
+    Args:
+        seat_number (str): Raw seat identifier
+
+    Returns:
+        str: Normalized seat
+    """
+    seat_number = "".join(str(seat_number).split()).upper()
+    if not SEAT_PATTERN.match(seat_number):
+        raise ValidationError(f"invalid seat '{seat_number}'")
+
+    return seat_number
+
+def validate_reservation(name, flight_number, departure, destination, date, seat_number):
+    """
+    Normalize every field of a reservation
+
+    Args:
+        name (str): Passenger name
+        flight_number (str): Flight identifier
+        departure (str): Departure location
+        destination (str): Destination location
+        date (str): Flight date
+        seat_number (str): Seat identifier
+
+    Returns:
+        tuple: Normalized (name, flight_number, departure, destination, date, seat_number)
+
+    Raises:
+        ValidationError: If a field is missing or malformed
+    """
+    departure = normalize_name(departure)
+    destination = normalize_name(destination)
+    if departure.lower() == destination.lower():
+        raise ValidationError("departure and destination are the same")
+
+    return (
+        normalize_name(name),
+        normalize_flight_number(flight_number),
+        departure,
+        destination,
+        normalize_date(date),
+        normalize_seat(seat_number),
+    )
@@ -0,0 +1,142 @@
+"""
+waitlist.py - Waitlist management and promotion benchmark
+
+Passengers can be put on the waitlist of a full flight. When a reservation
+is deleted, or moved to another flight, date or seat, Database offers the
+freed seat to the head of that flight's waitlist in the same transaction
+(see Database.promote_waitlist). The queue is ordered by priority tier,
+then by arrival.
+
+This module lists and edits waitlists from the command line and measures
+how fast seats are promoted during mass cancellations.
+
+Usage:
+    python waitlist.py add "Jane Doe" FL100 "New York" London 2025-10-15 --priority 1
+    python waitlist.py list FL100 2025-10-15
+    python waitlist.py benchmark --flights 20 --seats 180 --waiting 100
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from database import Database
+
+def benchmark_promotions(flights=20, seats=180, waiting=100, batch=True, profile=None):
+    """
+    Measure waitlist promotion when every reservation of full flights is cancelled
+
+    Args:
+        flights (int): Number of full flights
+        seats (int): Reservations per flight
+        waiting (int): Waitlisted passengers per flight, in random priority tiers
+        batch (bool): Cancel each flight in one transaction instead of
+            committing every cancellation
+        profile (str): Database performance profile
+
+    Returns:
+        dict: cancellations, promotions, seconds, per_second and in_order
+            (whether every flight was served by priority, then arrival)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        db = Database(os.path.join(directory, "waitlist_bench.db"), profile=profile)
+        rng = random.Random(42)
+
+        with db.transaction():
+            for flight in range(flights):
+                flight_number = f"WL{flight + 1}"
+                db.add_reservations([
+                    (f"Passenger {seat}", flight_number, "Paris", "London", "2030-01-01", f"{seat + 1}A")
+                    for seat in range(seats)
+                ])
+                for position in range(waiting):
+                    db.add_to_waitlist(f"Waiting {position}", flight_number, "Paris", "London",
+                                       "2030-01-01", rng.randint(0, 2))
+
+        reservation_ids = [row[0] for row in db.get_all_reservations()]
+        expected = {}
+        for flight in range(flights):
+            queue = db.get_waitlist(f"WL{flight + 1}", "2030-01-01")
+            expected[f"WL{flight + 1}"] = [entry[0] for entry in queue]
+
+        promoted = {flight_number: [] for flight_number in expected}
+        start = time.perf_counter()
+
+        def cancel(reservation_id):
+            db.delete_reservation(reservation_id)
+            if db.last_promotion:
+                row = db.get_reservation_by_id(db.last_promotion[1])
+                promoted[row[2]].append(db.last_promotion[0])
+
+        if batch:
+            for flight in range(flights):
+                with db.transaction():
+                    for reservation_id in reservation_ids[flight * seats:(flight + 1) * seats]:
+                        cancel(reservation_id)
+        else:
+            for reservation_id in reservation_ids:
+                cancel(reservation_id)
+
+        seconds = time.perf_counter() - start
+        promotions = sum(len(ids) for ids in promoted.values())
+
+        in_order = all(promoted[flight_number] == queue[:len(promoted[flight_number])]
+                       for flight_number, queue in expected.items())
+
+        db.close()
+
+    return {
+        "cancellations": len(reservation_ids),
+        "promotions": promotions,
+        "seconds": seconds,
+        "per_second": len(reservation_ids) / seconds if seconds else 0,
+        "in_order": in_order,
+    }
+
+def main():
+    """Manage waitlists or run the promotion benchmark from the command line"""
+    parser = argparse.ArgumentParser(description="Flight waitlists")
+    parser.add_argument("--db", default="flights.db", help="Database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = subparsers.add_parser("add", help="Put a passenger on a waitlist")
+    for field in ("name", "flight_number", "departure", "destination", "date"):
+        add_parser.add_argument(field)
+    add_parser.add_argument("--priority", type=int, default=0, help="Priority tier, higher first")
+
+    list_parser = subparsers.add_parser("list", help="Show the waitlist of a flight")
+    list_parser.add_argument("flight_number")
+    list_parser.add_argument("date")
+
+    bench_parser = subparsers.add_parser("benchmark", help="Measure promotion under mass cancellation")
+    bench_parser.add_argument("--flights", type=int, default=20, help="Full flights")
+    bench_parser.add_argument("--seats", type=int, default=180, help="Reservations per flight")
+    bench_parser.add_argument("--waiting", type=int, default=100, help="Waitlisted passengers per flight")
+    bench_parser.add_argument("--profile", help="Database performance profile")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        for batch in (False, True):
+            result = benchmark_promotions(args.flights, args.seats, args.waiting, batch, args.profile)
+            mode = "one transaction per flight" if batch else "commit per cancellation"
+            print(f"{mode}: {result['cancellations']} cancellations, {result['promotions']} promotions "
+                  f"in {result['seconds']:.2f}s ({result['per_second']:,.0f}/s), "
+                  f"{'in' if result['in_order'] else 'OUT OF'} priority order")
+        return
+
+    db = Database(args.db)
+
+    if args.command == "add":
+        if db.add_to_waitlist(args.name, args.flight_number, args.departure, args.destination,
+                              args.date, args.priority):
+            print(f"{args.name} added to the waitlist of {args.flight_number} on {args.date}")
+    else:
+        for position, (waitlist_id, name, priority, added_at) in enumerate(
+                db.get_waitlist(args.flight_number, args.date), 1):
+            print(f"{position:4}. {name} (priority {priority}, waiting since {added_at}, entry {waitlist_id})")
+
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+widgets.py - Widgets shared by several pages
+
+- RefLookup: booking reference field placed in the header of every page
+"""
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+class RefLookup:
+    def __init__(self, parent, db, open_reservation):
+        """
+        Create a booking reference lookup field
+
+        Args:
+            parent: Header frame of a page
+            db: Reservation store
+            open_reservation: Function called with the reservation ID found
+        """
+        self.db = db
+        self.open_reservation = open_reservation
+
+        self.frame = tk.Frame(parent, bg="#0288d1")
+
+        label = tk.Label(
+            self.frame,
+            text="Booking ref",
+            font=("Arial", 10),
+            bg="#0288d1",
+            fg="white"
+        )
+        label.pack(side=tk.LEFT, padx=(0, 5))
+
+        self.entry = tk.Entry(self.frame, font=("Arial", 11), width=9, bd=1, relief=tk.SOLID)
+        self.entry.pack(side=tk.LEFT)
+        self.entry.bind("<Return>", self.lookup)
+
+        go_btn = ttk.Button(self.frame, text="Go", style="Nav.TButton", width=3, command=self.lookup)
+        go_btn.pack(side=tk.LEFT, padx=(5, 0))
+
+    def lookup(self, event=None):
+        """Open the reservation with the entered booking reference"""
+        booking_ref = self.entry.get().strip()
+        if not booking_ref:
+            return
+
+        # Stores without booking references (see storage.py) cannot look one up
+        if not hasattr(self.db, "get_reservation_by_ref"):
+            messagebox.showerror("Error", "Booking references are not available with this storage engine.")
+            return
+
+        reservation = self.db.get_reservation_by_ref(booking_ref)
+        if reservation is None:
+            messagebox.showinfo("Not Found", f"No reservation with booking reference {booking_ref.upper()}")
+            return
+
+        self.entry.delete(0, tk.END)
+        self.open_reservation(reservation[0])